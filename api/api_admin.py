@@ -0,0 +1,74 @@
+from flask import jsonify, request, Response
+from auth import admin_permission
+from db_orm import get_db_pool_stats
+from util.xapi_profiler import profile_store, sampling_profiler
+from log_base import MyLog
+log = MyLog().my_logger()
+
+PROFILE_SORT_KEYS = ('cumulative', 'tottime', 'ncalls', 'calls', 'time')
+
+# 获取数据库连接池状态（管理员专用）
+@admin_permission
+def get_db_pool_status():
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_db_pool_stats()
+        })
+    except Exception as e:
+        log.error(f"获取连接池状态失败: {e}")
+        return jsonify({'success': False, 'error': '获取连接池状态失败'}), 500
+
+# 单请求 cProfile 结果列表（管理员专用）
+@admin_permission
+def list_profiles():
+    return jsonify({'success': True, 'data': profile_store.list()})
+
+# 获取单请求 cProfile 结果：默认返回文本摘要，format=pstats 时下载原始数据
+@admin_permission
+def get_profile(profile_id):
+    if request.args.get('format') == 'pstats':
+        data = profile_store.dump(profile_id)
+        if data is None:
+            return jsonify({'success': False, 'error': 'profile不存在或已过期'}), 404
+        return Response(data, mimetype='application/octet-stream', headers={
+            'Content-Disposition': f'attachment; filename=xapi_profile_{profile_id}.pstats'
+        })
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in PROFILE_SORT_KEYS:
+        return jsonify({'success': False, 'error': f'不支持的排序方式: {sort}'}), 400
+    limit = request.args.get('limit', 50, type=int)
+    summary = profile_store.summary(profile_id, sort, max(limit, 1))
+    if summary is None:
+        return jsonify({'success': False, 'error': 'profile不存在或已过期'}), 404
+    return Response(summary, mimetype='text/plain; charset=utf-8')
+
+# 采样分析器状态
+@admin_permission
+def get_sampling_profiler():
+    return jsonify({'success': True, 'data': sampling_profiler.status()})
+
+# 启动采样分析器，可选参数 interval（秒）、reset（是否清空已有数据）
+@admin_permission
+def start_sampling_profiler():
+    data = request.get_json(silent=True) or {}
+    interval = data.get('interval')
+    if interval is not None and not (isinstance(interval, (int, float)) and 0.001 <= interval <= 10):
+        return jsonify({'success': False, 'error': 'interval 需在 0.001 到 10 秒之间'}), 400
+    if data.get('reset'):
+        sampling_profiler.reset()
+    started = sampling_profiler.start(interval)
+    return jsonify({'success': True, 'started': started, 'data': sampling_profiler.status()})
+
+# 停止采样分析器
+@admin_permission
+def stop_sampling_profiler():
+    stopped = sampling_profiler.stop()
+    return jsonify({'success': True, 'stopped': stopped, 'data': sampling_profiler.status()})
+
+# 下载采样结果（折叠栈格式，可用 flamegraph.pl / speedscope 生成火焰图）
+@admin_permission
+def download_sampling_stacks():
+    return Response(sampling_profiler.collapsed(), mimetype='text/plain; charset=utf-8', headers={
+        'Content-Disposition': 'attachment; filename=xapi_stacks.collapsed'
+    })
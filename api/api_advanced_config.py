@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, g
 from db_orm import save_advanced_config, get_advanced_config, delete_advanced_config
 from auth import require_auth, project_owner_permission, project_write_permission, project_read_permission
+from util.xapi_pre_cache import pre_request_cache
 import json
 
 advanced_config_bp = Blueprint('advanced_config', __name__)
@@ -39,6 +40,7 @@ def save_config():
         success = save_advanced_config(project_id, request_info_id, is_global, body_info, query_info, request_name, private_request_id, host)
         
         if success:
+            pre_request_cache.invalidate_after_commit(project_id)
             return jsonify({'message': '配置保存成功'})
         else:
             return jsonify({'error': '配置保存失败'}), 500
@@ -157,6 +159,7 @@ def update_config(config_id):
         success = update_advanced_config(config_id, project_id, request_info_id, is_global, body_info, query_info,request_name= request_name,private_request_id=private_request_id, host=host)
         
         if success:
+            pre_request_cache.invalidate_after_commit(project_id)
             return jsonify({'message': '配置更新成功'})
         else:
             return jsonify({'error': '配置更新失败'}), 500
@@ -173,6 +176,7 @@ def delete_config(config_id):
         success = delete_advanced_config(config_id)
         
         if success:
+            pre_request_cache.invalidate_after_commit()
             return jsonify({'message': '配置删除成功'})
         else:
             return jsonify({'error': '配置删除失败'}), 500
@@ -0,0 +1,79 @@
+import time
+from flask import request, jsonify, Response, g
+from auth import generate_event_ticket
+from util import xapi_json
+from util.xapi_res import XAPI_ERROR_RES
+from util.xapi_events import get_event_broker, get_event_options, project_channel, project_history_channel, user_channel
+from db_orm import check_user_project_permission
+from log_base import MyLog
+log = MyLog().my_logger()
+
+def _format_event(event):
+    """SSE 报文：id/event/data，data 为单行 JSON"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {xapi_json.dumps(event['data'])}\n\n"
+
+def _event_stream(subscription, backlog, options):
+    """
+    事件流生成器
+    在请求上下文之外执行（视图返回后会话已释放），不能再访问 g 和 request
+    """
+    heartbeat_interval = options['heartbeat_interval']
+    deadline = time.monotonic() + options['max_stream_seconds']
+    replayed = {event['id'] for event in backlog}
+    yield f"retry: {options['retry_ms']}\n\n"
+    for event in backlog:
+        yield _format_event(event)
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        event = subscription.get(min(heartbeat_interval, remaining))
+        if event is None:
+            # 无事件时发送注释行，及时发现已断开的连接并避免被代理按空闲超时断开
+            yield ": ping\n\n"
+        elif event['id'] not in replayed:
+            yield _format_event(event)
+
+# 获取事件订阅票据（EventSource 无法设置 Authorization 头）
+def create_event_ticket():
+    ttl = get_event_options()['ticket_ttl']
+    ticket = generate_event_ticket(g.user_id, g.username, g.role, ttl)
+    return jsonify({'success': True, 'data': {'ticket': ticket, 'expires_in': ttl}})
+
+# 订阅事件：新的历史记录、定时监控执行进度、前置请求状态
+def stream_events():
+    """
+    GET /api/events?project_id=1&ticket=xxx
+    带 project_id 时订阅该项目和当前用户的事件，否则只订阅当前用户的事件；
+    其他成员的历史记录只推送给项目 owner 和管理员
+    断线重连时浏览器自动携带 Last-Event-ID，补发缓冲区中错过的事件
+    """
+    channels = [user_channel(g.user_id)]
+    project_id = request.args.get('project_id')
+    if project_id:
+        try:
+            project_id = int(project_id)
+        except ValueError:
+            return XAPI_ERROR_RES('项目ID无效', 400)
+        permission = 'owner' if g.role == 'admin' else check_user_project_permission(g.user_id, project_id)
+        if permission not in ['read', 'write', 'owner']:
+            return XAPI_ERROR_RES('无权限访问该项目', 403)
+        channels.append(project_channel(project_id))
+        if permission == 'owner':
+            channels.append(project_history_channel(project_id))
+
+    options = get_event_options()
+    broker = get_event_broker()
+    # 先订阅再取补发事件，避免两者之间发布的事件丢失，重复的事件在发送时跳过
+    subscription = broker.subscribe(channels)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    backlog = broker.replay(channels, last_event_id) if last_event_id else []
+    log.info(f"用户 {g.username} 订阅事件 - channels: {channels}")
+    response = Response(_event_stream(subscription, backlog, options), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # 关闭 nginx 等反向代理的响应缓冲，事件才能及时送达
+        'X-Accel-Buffering': 'no'
+    })
+    # 连接断开或到期时取消订阅（生成器尚未开始迭代时也会调用）
+    response.call_on_close(subscription.close)
+    return response
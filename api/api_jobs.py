@@ -0,0 +1,118 @@
+from flask import request, jsonify, g
+from auth import project_read_permission, project_write_permission
+from util.xapi_res import XAPI_ERROR_RES
+from util.xapi_events import publish_after_commit, project_channel
+from util.xapi_jobs import get_job_options, validate_job_payload, JOB_STATUSES
+from db_orm import (
+    create_background_job, get_background_job, get_background_jobs, cancel_background_job
+)
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 单次查询任务条数上限
+MAX_JOBS_LIMIT = 200
+
+def _request_project_id():
+    """与权限装饰器一致：GET 从查询参数、其他方法从请求体获取 project_id"""
+    if request.method == 'GET':
+        return request.args.get('project_id', type=int)
+    data = request.get_json(silent=True) or {}
+    try:
+        return int(data.get('project_id'))
+    except (TypeError, ValueError):
+        return None
+
+def _load_job(job_id, project_id, with_result=False):
+    """获取任务并确认属于当前项目，不属于时按不存在处理"""
+    job = get_background_job(job_id, with_result)
+    if not job or job['project_id'] != project_id:
+        return None
+    return job
+
+# 获取项目下的后台任务，可按 status、job_type 过滤
+@project_read_permission
+def list_jobs():
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    status = request.args.get('status')
+    if status and status not in JOB_STATUSES:
+        return XAPI_ERROR_RES(f"状态不支持，可选: {', '.join(JOB_STATUSES)}", 400)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_JOBS_LIMIT)
+    jobs = get_background_jobs(project_id, status, request.args.get('job_type'), limit)
+    return jsonify({'success': True, 'data': jobs})
+
+# 提交后台任务：job_type 为 collection（批量执行）或 import（批量导入请求），立即返回任务ID
+@project_write_permission
+def create_job():
+    data = request.get_json(silent=True) or {}
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    job_type = data.get('job_type')
+    try:
+        payload = validate_job_payload(job_type, project_id, data.get('payload') or {})
+    except ValueError as e:
+        return XAPI_ERROR_RES(str(e), 400)
+    try:
+        priority = int(data.get('priority', 0))
+    except (TypeError, ValueError):
+        return XAPI_ERROR_RES('priority 必须是整数', 400)
+    if priority < -10 or priority > 10:
+        return XAPI_ERROR_RES('priority 取值范围 -10-10', 400)
+
+    job_id = create_background_job(project_id, job_type, payload, g.user_id,
+                                   get_job_options()['max_attempts'], priority)
+    if not job_id:
+        return XAPI_ERROR_RES('创建后台任务失败', 500)
+    log.info(f"用户 {g.username} 提交后台任务 {job_id} - project: {project_id}, type: {job_type}")
+    publish_after_commit([project_channel(project_id)], 'job_progress',
+                         {'job_id': job_id, 'job_type': job_type, 'status': 'queued'})
+    return jsonify({'success': True, 'data': get_background_job(job_id)}), 202
+
+# 获取后台任务的状态和进度
+@project_read_permission
+def get_job_status(job_id):
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    job = _load_job(job_id, project_id)
+    if not job:
+        return XAPI_ERROR_RES('后台任务不存在', 404)
+    return jsonify({'success': True, 'data': job})
+
+# 获取后台任务的执行结果（取消的任务返回截至取消时的部分结果）
+@project_read_permission
+def get_job_result(job_id):
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    job = _load_job(job_id, project_id, with_result=True)
+    if not job:
+        return XAPI_ERROR_RES('后台任务不存在', 404)
+    if job['status'] in ('queued', 'running'):
+        return XAPI_ERROR_RES('任务尚未结束', 409)
+    return jsonify({'success': True, 'data': {
+        'id': job['id'],
+        'status': job['status'],
+        'error': job['error'],
+        'result': job['result']
+    }})
+
+# 取消后台任务：排队中的任务立即取消，执行中的任务在执行器下次续租时停止
+@project_write_permission
+def cancel_job(job_id):
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    job = _load_job(job_id, project_id)
+    if not job:
+        return XAPI_ERROR_RES('后台任务不存在', 404)
+    status = cancel_background_job(job_id)
+    if status is None:
+        return XAPI_ERROR_RES('任务已结束，无法取消', 400)
+    log.info(f"用户 {g.username} 取消后台任务 {job_id}")
+    if status == 'cancelled':
+        publish_after_commit([project_channel(project_id)], 'job_progress',
+                             {'job_id': job_id, 'job_type': job['job_type'], 'status': 'cancelled'})
+    return jsonify({'success': True, 'data': {'status': status, 'cancel_requested': True}})
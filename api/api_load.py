@@ -0,0 +1,241 @@
+import hmac
+from datetime import datetime, timedelta
+from flask import request, jsonify, g
+from auth import project_read_permission, project_write_permission, admin_permission, generate_worker_token
+from util.xapi_res import XAPI_ERROR_RES
+from util.xapi_events import publish_after_commit, project_channel
+from util.xapi_histogram import RequestStats, summarize_results
+from util.xapi_load import (
+    get_load_options, validate_load_spec, shard_plan, worker_request, LOAD_SHARDS, LOAD_REPORTS
+)
+from util.xapi_monitor import TIME_FORMAT
+from db_orm import (
+    register_load_worker, touch_load_worker, get_load_workers, create_load_job, get_load_jobs, get_load_job,
+    cancel_load_job, claim_load_shard, get_load_shard, report_load_shard,
+    get_request_ids_by_project, get_request_info_by_id, check_request_in_project
+)
+from api.api_server import prepare_saved_request
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 单次查询任务条数上限
+MAX_JOBS_LIMIT = 200
+
+def _request_project_id():
+    """与权限装饰器一致：GET 从查询参数、其他方法从请求体获取 project_id"""
+    if request.method == 'GET':
+        return request.args.get('project_id', type=int)
+    data = request.get_json(silent=True) or {}
+    try:
+        return int(data.get('project_id'))
+    except (TypeError, ValueError):
+        return None
+
+def _load_job(job_id, project_id):
+    """获取任务并确认属于当前项目，不属于时按不存在处理"""
+    job = get_load_job(job_id)
+    if not job or job['project_id'] != project_id:
+        return None
+    return job
+
+def _lease_expires_at(now):
+    return (now + timedelta(seconds=get_load_options()['lease_seconds'])).strftime(TIME_FORMAT)
+
+# ---------- 用户接口 ----------
+
+# 获取项目下的压测任务
+@project_read_permission
+def list_load_jobs():
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_JOBS_LIMIT)
+    return jsonify({'success': True, 'data': get_load_jobs(project_id, limit)})
+
+# 创建压测任务（load）或批量执行任务（collect），request_info_ids 为空时使用项目下全部请求
+@project_write_permission
+def create_load_job_api():
+    data = request.get_json(silent=True) or {}
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    name = (data.get('name') or '').strip()
+    if not name:
+        return XAPI_ERROR_RES('任务名称不能为空', 400)
+    kind = data.get('kind', 'load')
+    try:
+        spec = validate_load_spec(kind, data)
+    except ValueError as e:
+        return XAPI_ERROR_RES(str(e), 400)
+
+    options = get_load_options()
+    request_ids = data.get('request_info_ids')
+    if request_ids:
+        try:
+            request_ids = [int(request_id) for request_id in request_ids]
+        except (TypeError, ValueError):
+            return XAPI_ERROR_RES('请求ID无效', 400)
+        if any(not check_request_in_project(project_id, request_id) for request_id in request_ids):
+            return XAPI_ERROR_RES('请求不属于该项目', 400)
+    else:
+        request_ids = get_request_ids_by_project(project_id)
+    if not request_ids:
+        return XAPI_ERROR_RES('项目下没有可执行的请求', 400)
+    if len(request_ids) > options['max_requests_per_job']:
+        return XAPI_ERROR_RES(f"单个任务最多包含 {options['max_requests_per_job']} 个请求", 400)
+    spec['request_info_ids'] = request_ids
+
+    job_id = create_load_job(project_id, name[:255], kind, spec, spec['shards'], g.user_id)
+    if not job_id:
+        return XAPI_ERROR_RES('创建压测任务失败', 500)
+    log.info(f"用户 {g.username} 创建压测任务 {job_id} - project: {project_id}, kind: {kind}, shards: {spec['shards']}")
+    return jsonify({'success': True, 'data': get_load_job(job_id)})
+
+# 获取压测任务的分片状态和合并后的结果（raw=1 时附带原始直方图）
+@project_read_permission
+def get_load_job_detail(job_id):
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    job = _load_job(job_id, project_id)
+    if not job:
+        return XAPI_ERROR_RES('压测任务不存在', 404)
+    results = job.pop('results')
+    job['summary'] = summarize_results(results)
+    if request.args.get('raw') == '1':
+        job['results'] = results
+    return jsonify({'success': True, 'data': job})
+
+# 取消压测任务
+@project_write_permission
+def cancel_load_job_api(job_id):
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    if not _load_job(job_id, project_id):
+        return XAPI_ERROR_RES('压测任务不存在', 404)
+    if not cancel_load_job(job_id):
+        return XAPI_ERROR_RES('任务已结束，无法取消', 400)
+    return jsonify({'success': True})
+
+# 查看已注册的 worker
+@admin_permission
+def list_load_workers():
+    timeout = get_load_options()['worker_timeout']
+    online_since = (datetime.now() - timedelta(seconds=timeout)).strftime(TIME_FORMAT)
+    workers = get_load_workers()
+    for worker in workers:
+        worker['online'] = bool(worker['last_seen_at'] and worker['last_seen_at'] >= online_since)
+    return jsonify({'success': True, 'data': workers})
+
+# ---------- worker 接口 ----------
+
+# worker 注册：X-Worker-Token 为 load_workers.registration_token，返回后续接口使用的 worker token
+def register_worker():
+    options = get_load_options()
+    registration_token = options['registration_token']
+    provided = request.headers.get('X-Worker-Token', '')
+    if not registration_token or not hmac.compare_digest(provided.encode('utf-8'), registration_token.encode('utf-8')):
+        return XAPI_ERROR_RES('注册口令无效', 401)
+    data = request.get_json(silent=True) or {}
+    worker_key = (data.get('worker_key') or '').strip()
+    if not worker_key:
+        return XAPI_ERROR_RES('worker_key 不能为空', 400)
+    try:
+        capacity = max(int(data.get('capacity') or 1), 1)
+        pid = int(data['pid']) if data.get('pid') is not None else None
+    except (TypeError, ValueError):
+        return XAPI_ERROR_RES('capacity/pid 必须是整数', 400)
+    worker_id = register_load_worker(worker_key[:255], (data.get('name') or worker_key)[:255],
+                                     (data.get('hostname') or '')[:255], pid, capacity)
+    if not worker_id:
+        return XAPI_ERROR_RES('注册 worker 失败', 500)
+    log.info(f"压测 worker 注册 - id: {worker_id}, key: {worker_key}, capacity: {capacity}")
+    return jsonify({'success': True, 'data': {
+        'worker_id': worker_id,
+        'token': generate_worker_token(worker_id, options['token_ttl']),
+        'expires_in': options['token_ttl'],
+        'poll_interval': options['poll_interval'],
+        'report_interval': options['report_interval']
+    }})
+
+# worker 领取分片，没有可执行的分片时 data 为 null
+def claim_shard():
+    if not touch_load_worker(g.worker_id):
+        return XAPI_ERROR_RES('worker 未注册', 401)
+    options = get_load_options()
+    now = datetime.now()
+    shard = claim_load_shard(g.worker_id, now.strftime(TIME_FORMAT), _lease_expires_at(now), options['max_attempts'])
+    if shard:
+        log.info(f"worker {g.worker_id} 领取压测分片 - job: {shard['job']['id']}, shard: {shard['shard_index']}, "
+                 f"attempt: {shard['attempts']}")
+    return jsonify({'success': True, 'data': shard})
+
+def _worker_shard(shard_id):
+    """当前 worker 正在执行的分片，不存在或已被重新分配时返回 None"""
+    shard = get_load_shard(shard_id)
+    if not shard or shard['worker_id'] != g.worker_id or shard['status'] != 'running':
+        return None
+    return shard
+
+# 获取分片的执行计划：前置请求在服务端执行并替换变量，worker 只需按计划发送请求
+def get_shard_plan(shard_id):
+    shard = _worker_shard(shard_id)
+    if shard is None:
+        return XAPI_ERROR_RES('分片不存在或已重新分配', 409)
+    job = get_load_job(shard['job_id'], with_results=False)
+    spec = job['spec']
+    requests = []
+    try:
+        for request_info_id in spec['request_info_ids']:
+            request_info = get_request_info_by_id(request_info_id)
+            if not request_info:
+                continue
+            method, url, headers, request_body = prepare_saved_request(
+                job['project_id'], request_info, get_load_options()['pre_request_cache_ttl'])
+            requests.append(worker_request(request_info_id, method, url, headers, request_body))
+    except Exception as e:
+        log.error(f"准备压测请求失败 - job: {job['id']}, error: {e}")
+        return XAPI_ERROR_RES(f'准备请求失败: {e}', 500)
+    if not requests:
+        return XAPI_ERROR_RES('任务中的请求已全部删除', 410)
+    plan = shard_plan(job['kind'], spec, shard['shard_index'], len(requests))
+    plan.update({
+        'shard_id': shard_id,
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'requests': requests,
+        'report_interval': get_load_options()['report_interval']
+    })
+    return jsonify({'success': True, 'data': plan})
+
+# worker 上报增量结果（{请求ID: 直方图等统计}），final 为 true 时结束分片；返回 cancelled 时 worker 应停止执行
+def report_shard_results(shard_id):
+    data = request.get_json(silent=True) or {}
+    delta = data.get('results') or {}
+    try:
+        requests = sum(RequestStats.from_dict(stats).requests for stats in delta.values())
+    except (AttributeError, TypeError, ValueError) as e:
+        return XAPI_ERROR_RES(f'results 格式错误: {e}', 400)
+    final = bool(data.get('final'))
+    error = str(data['error'])[:1000] if data.get('error') else None
+    now = datetime.now()
+    try:
+        outcome = report_load_shard(shard_id, g.worker_id, delta, final, error,
+                                    now.strftime(TIME_FORMAT), _lease_expires_at(now))
+    except Exception as e:
+        # 暂时性错误不能按 409 返回，否则 worker 会放弃仍然持有的分片
+        return XAPI_ERROR_RES(f'上报结果失败: {e}', 500)
+    if outcome is None:
+        return XAPI_ERROR_RES('分片不存在或已重新分配', 409)
+    LOAD_REPORTS.inc('true' if final else 'false')
+    if final:
+        LOAD_SHARDS.inc(outcome['shard_status'])
+    publish_after_commit([project_channel(outcome['project_id'])], 'load_progress', {
+        'job_id': outcome['job_id'],
+        'shard_id': shard_id,
+        'shard_status': outcome['shard_status'],
+        'job_status': outcome['job_status'],
+        'requests': requests
+    })
+    return jsonify({'success': True, 'data': {'cancelled': outcome['cancelled']}})
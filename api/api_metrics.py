@@ -0,0 +1,31 @@
+from flask import request, Response
+from config import config
+from db_orm import get_db_pool_stats
+from util.xapi_metrics import registry
+from util.xapi_history_writer import history_writer
+from log_base import MyLog
+log = MyLog().my_logger()
+
+def _pool_gauge_values():
+    """连接池统计中的数值项，主库和从库分别以 engine 标签区分"""
+    values = {}
+    stats = get_db_pool_stats()
+    for engine, engine_stats in (('primary', stats), ('replica', stats.get('replica') or {})):
+        for key, value in engine_stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[(engine, key)] = value
+    return values
+
+registry.gauge('xapi_history_queue_depth', '历史记录后台写入队列长度', history_writer.depth)
+registry.gauge('xapi_db_pool', '数据库连接池统计', _pool_gauge_values, ('engine', 'stat'))
+
+# Prometheus 采集接口，配置 metrics.token 时要求 Authorization: Bearer <token>
+def metrics():
+    token = config.get('metrics.token')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('unauthorized\n', status=401, mimetype='text/plain')
+    try:
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        log.error(f"生成指标数据失败: {e}")
+        return Response('error\n', status=500, mimetype='text/plain')
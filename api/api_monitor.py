@@ -0,0 +1,152 @@
+from datetime import datetime
+from flask import request, jsonify, g
+from auth import project_read_permission, project_write_permission
+from util.xapi_res import XAPI_ERROR_RES
+from util.xapi_monitor import CronSchedule, next_run_time, validate_assertions, TIME_FORMAT
+from db_orm import (
+    create_monitor_job, update_monitor_job, delete_monitor_job, get_monitor_job, get_monitor_jobs,
+    get_monitor_runs, check_request_in_project
+)
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 单次查询执行结果条数上限
+MAX_RUNS_LIMIT = 500
+
+def _request_project_id():
+    """与权限装饰器一致：GET 从查询参数、其他方法从请求体获取 project_id"""
+    if request.method == 'GET':
+        return request.args.get('project_id', type=int)
+    data = request.get_json(silent=True) or {}
+    try:
+        return int(data.get('project_id'))
+    except (TypeError, ValueError):
+        return None
+
+def _load_job(monitor_id, project_id):
+    """获取任务并确认属于当前项目，不属于时按不存在处理"""
+    job = get_monitor_job(monitor_id)
+    if not job or job['project_id'] != project_id:
+        return None
+    return job
+
+def _validate_fields(data, project_id):
+    """校验创建/更新的字段，返回 (待保存字段, 错误信息)"""
+    fields = {}
+    if 'name' in data:
+        name = (data.get('name') or '').strip()
+        if not name:
+            return None, '监控名称不能为空'
+        fields['name'] = name[:255]
+    if 'cron' in data:
+        cron = (data.get('cron') or '').strip()
+        try:
+            CronSchedule(cron)
+        except ValueError as e:
+            return None, f'cron 表达式无效: {e}'
+        fields['cron'] = cron
+    if 'request_info_id' in data:
+        request_info_id = data.get('request_info_id')
+        if request_info_id:
+            try:
+                request_info_id = int(request_info_id)
+            except (TypeError, ValueError):
+                return None, '请求ID无效'
+            if not check_request_in_project(project_id, request_info_id):
+                return None, '请求不属于该项目'
+        fields['request_info_id'] = request_info_id or None
+    if 'assertions' in data:
+        assertions = data.get('assertions') or []
+        error = validate_assertions(assertions)
+        if error:
+            return None, error
+        fields['assertions'] = assertions
+    if 'enabled' in data:
+        fields['enabled'] = bool(data.get('enabled'))
+    return fields, None
+
+# 获取项目下的定时监控任务
+@project_read_permission
+def list_monitors():
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    return jsonify({'success': True, 'data': get_monitor_jobs(project_id)})
+
+# 创建定时监控任务，request_info_id 为空时执行整个项目的请求
+@project_write_permission
+def create_monitor():
+    data = request.get_json(silent=True) or {}
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    if not data.get('name') or not data.get('cron'):
+        return XAPI_ERROR_RES('监控名称和 cron 表达式不能为空', 400)
+    fields, error = _validate_fields(data, project_id)
+    if error:
+        return XAPI_ERROR_RES(error, 400)
+
+    enabled = fields.get('enabled', True)
+    job_id = create_monitor_job(
+        project_id, fields.get('request_info_id'), fields['name'], fields['cron'],
+        fields.get('assertions', []), enabled, g.user_id, next_run_time(fields['cron'])
+    )
+    if not job_id:
+        return XAPI_ERROR_RES('创建监控任务失败', 500)
+    log.info(f"用户 {g.username} 创建监控任务 {job_id} - project: {project_id}, cron: {fields['cron']}")
+    return jsonify({'success': True, 'data': get_monitor_job(job_id)})
+
+# 更新定时监控任务
+@project_write_permission
+def update_monitor(monitor_id):
+    data = request.get_json(silent=True) or {}
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    job = _load_job(monitor_id, project_id)
+    if not job:
+        return XAPI_ERROR_RES('监控任务不存在', 404)
+    fields, error = _validate_fields(data, project_id)
+    if error:
+        return XAPI_ERROR_RES(error, 400)
+    # 修改 cron 或重新启用时重新计算下次执行时间
+    if 'cron' in fields or (fields.get('enabled') and not job['enabled']):
+        fields['next_run_at'] = next_run_time(fields.get('cron', job['cron']))
+    if fields and not update_monitor_job(monitor_id, **fields):
+        return XAPI_ERROR_RES('更新监控任务失败', 500)
+    return jsonify({'success': True, 'data': get_monitor_job(monitor_id)})
+
+# 删除定时监控任务
+@project_write_permission
+def delete_monitor(monitor_id):
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    if not _load_job(monitor_id, project_id):
+        return XAPI_ERROR_RES('监控任务不存在', 404)
+    if not delete_monitor_job(monitor_id):
+        return XAPI_ERROR_RES('删除监控任务失败', 500)
+    return jsonify({'success': True})
+
+# 获取定时监控任务最近的执行结果
+@project_read_permission
+def list_monitor_runs(monitor_id):
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    if not _load_job(monitor_id, project_id):
+        return XAPI_ERROR_RES('监控任务不存在', 404)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_RUNS_LIMIT)
+    return jsonify({'success': True, 'data': get_monitor_runs(monitor_id, limit)})
+
+# 立即执行：把下次执行时间设为当前时间，由调度器在下一轮领取
+@project_write_permission
+def run_monitor_now(monitor_id):
+    project_id = _request_project_id()
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    if not _load_job(monitor_id, project_id):
+        return XAPI_ERROR_RES('监控任务不存在', 404)
+    if not update_monitor_job(monitor_id, next_run_at=datetime.now().strftime(TIME_FORMAT)):
+        return XAPI_ERROR_RES('触发监控任务失败', 500)
+    return jsonify({'success': True})
@@ -1,14 +1,25 @@
+import hashlib
 from flask import request, jsonify, g
 from auth import require_auth, project_owner_permission,project_read_permission,project_write_permission
 from util.xapi_res import XAPI_ERROR_RES,XAPI_SUCCESS_RES
 from db_orm import (
     create_project, get_user_projects, get_project_by_id,
     check_user_project_permission,
-    get_project_requests, add_project_request_relation,
-    get_project_members, remove_project_member, get_all_projects ,grant_project_permission
+    get_project_requests, add_project_request_relation, check_request_in_project,
+    get_project_members, remove_project_member, get_all_projects ,grant_project_permission,
+    get_request_summaries, get_request_info_by_id, get_project_version, get_project_request_changes
 )
+from util.xapi_conditional import etag_matches, not_modified, with_etag, content_etag_response
 from log_base import MyLog
 log = MyLog().my_logger()
+
+# 请求摘要分页大小上限
+MAX_SUMMARY_PAGE_SIZE = 200
+
+def _request_list_etag(project_id, version):
+    """项目请求列表的 ETag：项目版本号 + 请求路径和参数（同一版本下不同分页、过滤条件的结果不同）"""
+    digest = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:8]
+    return f'"p{project_id}-v{version}-{digest}"'
 # 获取用户的项目列表
 def get_projects():
     try:
@@ -21,10 +32,11 @@ def get_projects():
         else:
             projects = get_user_projects(current_user_id)
             
-        return jsonify({
+        # 项目列表与成员关系相关，按内容计算 ETag
+        return content_etag_response(jsonify({
             'success': True,
             'projects': projects
-        })
+        }))
     except Exception as e:
         print(f"Error getting projects: {e}")
         return jsonify({'error': '获取项目列表失败'}), 500
@@ -79,17 +91,85 @@ def get_project_detail(project_id):
 @project_read_permission
 def get_project_request_list(project_id):
     try:
+        # 先检查版本号，未变化时不再查询请求列表
+        version = get_project_version(project_id)
+        etag = _request_list_etag(project_id, version)
+        if etag_matches(etag):
+            return not_modified(etag)
         requests = get_project_requests(project_id)
-        return jsonify({
+        return with_etag(jsonify({
             'success': True,
-            'data': requests
-        })
+            'data': requests,
+            'version': version
+        }), etag)
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+# 分页获取项目的请求摘要（侧边栏使用，只返回 id/名称/方法/URL/时间）
+@project_read_permission
+def get_project_request_summary(project_id):
+    try:
+        keyword = request.args.get('q', '').strip()
+        method = request.args.get('method', '').strip()
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_SUMMARY_PAGE_SIZE)
+        version = get_project_version(project_id)
+        etag = _request_list_etag(project_id, version)
+        if etag_matches(etag):
+            return not_modified(etag)
+        summaries = get_request_summaries(project_id, keyword=keyword, method=method, offset=offset, limit=limit)
+        return with_etag(jsonify({
+            'success': True,
+            'data': summaries['items'],
+            'total': summaries['total'],
+            'offset': offset,
+            'limit': limit,
+            'version': version
+        }), etag)
+    except Exception as e:
+        log.error(f"获取请求摘要失败: {e}")
+        return XAPI_ERROR_RES('获取请求列表失败', 500)
+
+# 增量同步：返回 since 版本之后新增/修改（摘要）和删除（ID）的请求，full 为 true 时需要重新全量加载
+@project_read_permission
+def get_project_request_changes_api(project_id):
+    try:
+        since = request.args.get('since', type=int)
+        if since is None or since < 0:
+            return XAPI_ERROR_RES('since 参数无效', 400)
+        version = get_project_version(project_id)
+        etag = _request_list_etag(project_id, version)
+        if etag_matches(etag):
+            return not_modified(etag)
+        changes = get_project_request_changes(project_id, since)
+        return with_etag(jsonify({
+            'success': True,
+            'data': changes
+        }), _request_list_etag(project_id, changes['version']))
+    except Exception as e:
+        log.error(f"获取请求变更失败: {e}")
+        return XAPI_ERROR_RES('获取请求变更失败', 500)
+
+# 获取项目中单个请求的完整定义（打开请求时按需加载）
+@project_read_permission
+def get_project_request_detail(project_id, request_info_id):
+    try:
+        if not check_request_in_project(project_id, request_info_id):
+            return XAPI_ERROR_RES('请求不存在', 404)
+        request_info = get_request_info_by_id(request_info_id)
+        if not request_info:
+            return XAPI_ERROR_RES('请求不存在', 404)
+        return jsonify({
+            'success': True,
+            'data': request_info
+        })
+    except Exception as e:
+        log.error(f"获取请求详情失败: {e}")
+        return XAPI_ERROR_RES('获取请求详情失败', 500)
+
 # 获取项目成员列表
 @project_read_permission
 def get_project_members_list():
@@ -3,6 +3,7 @@ from auth import project_owner_permission,project_read_permission
 from db_orm import get_project_env, save_project_env, delete_project_env
 import json
 from util.xapi_res import XAPI_ERROR_RES, XAPI_SUCCESS_RES, XAPI_RES
+from util.xapi_outbound import outbound_limiters, validate_outbound
 from log_base import MyLog
 log = MyLog().my_logger()
 
@@ -39,11 +40,21 @@ def save_env(project_id):
     try:
         data = request.get_json()
         env_config = data.get('env', {})
+        if not isinstance(env_config, dict):
+            return XAPI_RES('环境配置必须是JSON对象', False, 400)
+        # outbound 为外部请求限流、超时、重试和熔断参数，格式错误时拒绝保存（否则会被静默忽略）
+        if 'outbound' in env_config:
+            try:
+                validate_outbound(env_config['outbound'])
+            except ValueError as e:
+                return XAPI_RES(str(e), False, 400)
         
         # 将环境配置转换为JSON字符串
         env_json = json.dumps(env_config, ensure_ascii=False)
         
         save_project_env(project_id, env_json)
+        # 环境配置中的 outbound 限流参数立即生效
+        outbound_limiters.invalidate(project_id)
         return XAPI_RES('环境配置保存成功',True, 200)
     except Exception as e:
         log.error(f'保存环境配置时出错：{e}')
@@ -54,6 +65,7 @@ def delete_env(project_id):
     """删除项目环境配置"""
     try:
         delete_project_env(project_id)
+        outbound_limiters.invalidate(project_id)
         return XAPI_RES('环境配置删除成功',True, 200)
     except Exception as e:
         log.error(f'删除环境配置时出错：{e}')
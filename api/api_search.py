@@ -0,0 +1,34 @@
+from flask import request, jsonify, g
+from auth import project_read_permission
+from util.xapi_res import XAPI_ERROR_RES
+from db_orm import search_project_requests
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 搜索结果条数上限
+MAX_SEARCH_LIMIT = 100
+
+# 项目内全文搜索请求和历史记录
+@project_read_permission
+def search():
+    project_id = request.args.get('project_id', type=int)
+    keyword = request.args.get('q', '').strip()
+    scope = request.args.get('scope', 'all')
+    limit = min(request.args.get('limit', 20, type=int), MAX_SEARCH_LIMIT)
+    
+    if not project_id:
+        return XAPI_ERROR_RES('项目ID不能为空', 400)
+    if not keyword:
+        return XAPI_ERROR_RES('搜索关键字不能为空', 400)
+    if scope not in ('all', 'requests', 'history'):
+        return XAPI_ERROR_RES(f'无效的搜索范围{scope}', 400)
+    
+    try:
+        results = search_project_requests(project_id, keyword, g.user_id, g.role, scope=scope, limit=limit)
+        return jsonify({
+            'success': True,
+            'data': results
+        })
+    except Exception as e:
+        log.error(f"搜索失败: {e}")
+        return XAPI_ERROR_RES('搜索失败', 500)
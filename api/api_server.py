@@ -1,13 +1,29 @@
 import os
+import re
 import json
 import time
+import logging
 from datetime import datetime
 import requests
-from urllib.parse import quote
-from flask import Flask, request, jsonify, Response, send_from_directory, g
-from util.xapi_res import XAPI_RES
+from urllib.parse import quote, urlsplit
+from flask import Flask, request, jsonify, Response, send_from_directory, g, has_request_context
+from config import config
+from util.xapi_res import XAPI_RES, XAPI_ERROR_RES
 from auth import project_read_permission, project_write_permission
 from util.xapi_replace import replace_variables, contains_xapi_variables
+from util.xapi_body import read_response_body, read_blob_range, get_blob_path
+from util import xapi_json
+from util.xapi_json import RawJSON, json_response
+from util.xapi_stream import StreamTee, stream_response_headers
+from util.xapi_history_writer import history_writer
+from util.xapi_access_log import add_upstream_time
+from util.xapi_metrics import PRE_REQUESTS, observe_upstream, host_label
+from util.xapi_pre_cache import pre_request_cache
+from util.xapi_outbound import (
+    outbound_limiters, circuit_breakers, OutboundLimitExceeded, CircuitOpen, OUTBOUND_RETRIES,
+    parse_timeout, parse_retries, request_timeout, retry_count, retry_delay
+)
+from util.xapi_events import publish, publish_after_commit, project_channel, project_history_channel, user_channel
 # 导入数据库操作模块
 from db_orm import (
     save_or_update_request_info,
@@ -17,12 +33,17 @@ from db_orm import (
     get_history_by_request_info_id,
     get_history_by_request_info_id_with_permission,
     get_request_info_by_id,
+    get_history_record,
+    check_request_in_project,
+    check_user_project_permission,
     add_project_request_relation,
     get_advanced_config,
     copy_request_info,
-    delete_request_info
+    delete_request_info,
+    get_pre_request_project_ids,
+    release_db_connection
 )
-from log_base import MyLog
+from log_base import MyLog, brief, should_sample
 log = MyLog().my_logger()
 
 
@@ -60,28 +81,29 @@ def execute_global_pre_request(project_id):
                 host = host.rstrip('/')
                 url = url if url.startswith('/') else '/' + url
                 url = host + url
-            log.info(f"global -- body_info：{type(body_info)},headers{type(request_info.get('headers', '{}'))},query_info{type(query_info)},url:{url}")
+            log.debug("global -- url: %s", brief(url))
             # 准备请求参数
             headers = request_info.get('headers', '{}')
             method = request_info['method']
             url_encoded, request_body =request_info_parser(url, body_info ,json.loads(query_info))
             try:
-                response = xapi_send_request(url_encoded, method, headers, request_body)
+                release_db_connection()
+                response = xapi_send_request(url_encoded, method, headers, request_body, project_id=project_id,
+                                             pre_request=True)
                 # 保存响应结果
                 response_headers = dict(response.headers)
-                try:
-                    response_body = response.json()
-                except:
-                    response_body = response.text
+                response_body = parse_pre_request_body(response)
                 
                 result["global"][str(config.get('id'))] = {
                     "header": response_headers,
                     "body": response_body
                 }
                 
+                PRE_REQUESTS.inc('global_ok')
                 log.info(f"全局前置请求成功 - request_id: {request_info_id}, status: {response.status_code}")
                 
             except Exception as e:
+                PRE_REQUESTS.inc('global_error')
                 log.error(f"全局前置请求失败 - request_id: {request_info_id}, error: {str(e)}")
                 result["global"][str(config.get('id'))] = {
                     "header": {},
@@ -94,6 +116,92 @@ def execute_global_pre_request(project_id):
         log.error(f"执行全局前置请求异常: {str(e)}")
         return {"global": {}}
 
+def _pre_requests_succeeded(results):
+    """前置请求全部成功时才缓存结果"""
+    for group in results.values():
+        for item in group.values():
+            body = item.get('body')
+            if isinstance(body, str) and body.startswith('请求失败'):
+                return False
+    return True
+
+def _event_channels(project_id, user_id=None, channel=project_channel):
+    """事件推送的频道：项目频道（channel 指定项目下的频道），以及请求内的当前用户频道"""
+    channels = []
+    if project_id:
+        try:
+            channels.append(channel(project_id))
+        except (TypeError, ValueError):
+            log.warning(f"project_id 无效，不推送项目事件: {project_id}")
+    if user_id is None and has_request_context():
+        user_id = g.get('user_id')
+    if user_id:
+        channels.append(user_channel(user_id))
+    return channels
+
+def _publish_pre_request_status(project_id, request_info_id, scope, status):
+    publish(_event_channels(project_id), 'pre_request', {
+        'project_id': project_id,
+        'request_info_id': request_info_id,
+        'scope': scope,
+        'status': status,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+
+def publish_history_event(history_id, project_id, request_info_id, response_status, response_time,
+                          execution_status, username=None, user_id=None):
+    """
+    推送新的历史记录摘要，请求内写入的记录在事务提交后推送
+    只推送给执行者本人和项目 owner/管理员，与历史记录的查看权限一致
+    """
+    publish_after_commit(_event_channels(project_id, user_id, project_history_channel), 'history', {
+        'id': history_id,
+        'project_id': project_id,
+        'request_info_id': request_info_id,
+        'response_status': response_status,
+        'response_time': response_time,
+        'execution_status': execution_status,
+        'username': username,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+
+def invalidate_pre_request_results(request_info_id):
+    """请求被修改或删除后，清除把它配置为前置请求的项目的缓存结果（事务提交后生效）"""
+    for project_id in get_pre_request_project_ids(request_info_id):
+        pre_request_cache.invalidate_after_commit(project_id)
+
+def _run_pre_request_scope(project_id, request_info_id, scope, key, cache_ttl, execute):
+    """执行一类前置请求并推送执行状态"""
+    _publish_pre_request_status(project_id, request_info_id, scope, 'running')
+    results = pre_request_cache.get_or_execute(key, cache_ttl, execute, _pre_requests_succeeded)
+    status = 'ok' if _pre_requests_succeeded(results or {}) else 'error'
+    _publish_pre_request_status(project_id, request_info_id, scope, status)
+    return results
+
+def run_pre_requests(project_id, request_info_id=None, cache_ttl=0):
+    """
+    执行全局前置请求，有 request_info_id 时再执行自定义前置请求
+    cache_ttl 秒内复用同一项目（及请求）的前置请求结果
+    """
+    results = {}
+    project_id = int(project_id)
+    log.info(f"执行全局前置请求 - project_id: {project_id}")
+    global_results = _run_pre_request_scope(
+        project_id, request_info_id, 'global', ('global', project_id), cache_ttl,
+        lambda: execute_global_pre_request(project_id)
+    )
+    if global_results:
+        results.update(global_results)
+    if request_info_id:
+        log.info(f"执行自定义前置请求 - project_id: {project_id}, request_id: {request_info_id}")
+        custom_results = _run_pre_request_scope(
+            project_id, request_info_id, 'custom', ('custom', project_id, int(request_info_id)), cache_ttl,
+            lambda: execute_custom_pre_request(project_id, request_info_id)
+        )
+        if custom_results:
+            results.update(custom_results)
+    return results
+
 # 自定义前置请求方法
 def execute_custom_pre_request(project_id, request_id):
     """
@@ -128,29 +236,30 @@ def execute_custom_pre_request(project_id, request_id):
                 host = host.rstrip('/')
                 url = url if url.startswith('/') else '/' + url
                 url = host + url
-            log.info(f"custom -- body_info：{type(body_info)},headers{type(request_info.get('headers', '{}'))},query_info{type(query_info)},url:{url}")
+            log.debug("custom -- url: %s", brief(url))
             # 准备请求参数
             headers = request_info.get('headers', '{}')
             method = request_info['method']
             url_encoded, request_body =request_info_parser(url, body_info ,json.loads(query_info))
             
             try:
-                response = xapi_send_request(url_encoded, method, headers, request_body)
+                release_db_connection()
+                response = xapi_send_request(url_encoded, method, headers, request_body, project_id=project_id,
+                                             pre_request=True)
                 # 保存响应结果
                 response_headers = dict(response.headers)
-                try:
-                    response_body = response.json()
-                except:
-                    response_body = response.text
+                response_body = parse_pre_request_body(response)
                 
                 result["custom"][str(config.get('id'))] = {
                     "header": response_headers,
                     "body": response_body
                 }
                 
+                PRE_REQUESTS.inc('custom_ok')
                 log.info(f"自定义前置请求成功 - request_id: {request_info_id}, status: {response.status_code}")
                 
             except Exception as e:
+                PRE_REQUESTS.inc('custom_error')
                 log.error(f"自定义前置请求失败 - request_id: {request_info_id}, error: {str(e)}")
                 result["custom"][str(config.get('id'))] = {
                     "header": {},
@@ -181,6 +290,13 @@ def send_request():
     user_id = g.user_id  # 新增用户ID参数
     project_id = data.get('project_id')
     username = g.username
+    is_stream = headers.get('Accept') == 'text/event-stream' or bool(data.get('stream'))
+    # 单个请求可指定超时和重试次数，未指定时使用项目环境配置（outbound）
+    try:
+        timeout = parse_timeout(data.get('timeout'))
+        retries = parse_retries(data.get('retries'))
+    except ValueError as e:
+        return XAPI_ERROR_RES(str(e), 400)
     
     # 检查URL的host是否为127.0.0.1，如果是则替换为客户端IP
     if '127.0.0.1' in url:
@@ -199,47 +315,41 @@ def send_request():
     if project_id and needs_pre_request:   
         log.info(f"检测到 $xapi 变量，开始执行前置请求 - project_id: {project_id}")
         
-        # 没有request_id，执行全局前置请求
-        log.info(f"执行全局前置请求 - project_id: {project_id}")
-        global_results = execute_global_pre_request(project_id)
-        if global_results:
-            pre_request_results.update(global_results) 
-            
-        if request_info_id:
-            # 有request_id，执行自定义前置请求
-            log.info(f"执行自定义前置请求 - project_id: {project_id}, request_id: {request_info_id}")
-            custom_results = execute_custom_pre_request(project_id, request_info_id)
-            if custom_results:
-                pre_request_results.update(custom_results)
+        pre_request_results = run_pre_requests(project_id, request_info_id, config.get('pre_request.cache_ttl', 0))
     elif project_id:
+        PRE_REQUESTS.inc('skipped')
         log.info(f"未检测到 $xapi 变量，跳过前置请求 - project_id: {project_id}")
 
     # 变量替换：在发送请求前替换 body 和 query 中的变量
     if pre_request_results:
-        log.info(f"开始变量替换，前置请求结果: {json.dumps(pre_request_results, ensure_ascii=False, indent=2)}")
+        # 前置请求结果体积大，只在 DEBUG 级别或被采样时输出
+        if log.isEnabledFor(logging.DEBUG) or should_sample():
+            log.info("开始变量替换，前置请求结果: %s", brief(pre_request_results))
         
         # 替换 body 中的变量
         original_body = body
         body = replace_variables(body, pre_request_results)
         if body != original_body:
-            log.info(f"Body 变量替换: {original_body} -> {body}")
+            log.debug("Body 变量替换: %s -> %s", brief(original_body), brief(body))
         
         # 替换 query 中的变量
         original_query = query
         query = replace_variables(query, pre_request_results)
         if query != original_query:
-            log.info(f"Query 变量替换: {json.dumps(original_query, ensure_ascii=False)} -> {json.dumps(query, ensure_ascii=False)}")
+            log.debug("Query 变量替换: %s -> %s", brief(original_query), brief(query))
         
         original_headers = headers
         headers = replace_variables(headers, pre_request_results)
         if headers != original_headers:
-            log.info(f"Headers 变量替换: {json.dumps(original_headers, ensure_ascii=False)} -> {json.dumps(headers, ensure_ascii=False)}")
+            log.debug("Headers 变量替换: %s -> %s", brief(original_headers), brief(headers))
         
     # 打印请求信息，便于调试
-    log.info(f"\nproject:{project_id},用户:{user_id},请求信息 - {datetime.now()},URL: {url}, Method: {method}, 请求名称: {request_name}")
-    print(f"Headers: {json.dumps(headers, ensure_ascii=False, indent=2)}")
-    print(f"Auth: {json.dumps(auth, ensure_ascii=False, indent=2)}")
-    print(f"Query: {json.dumps(query, ensure_ascii=False, indent=2)}\n")
+    log.info("project:%s,用户:%s,请求信息 - URL: %s, Method: %s, 请求名称: %s", project_id, user_id, brief(url), method, request_name)
+    # 认证信息只输出字段名，避免凭证写入日志
+    log.debug("Headers: %s, Auth: %s, Query: %s", brief(headers), brief(list(auth.keys()) if isinstance(auth, dict) else None), brief(query))
+    
+    # 发起外部请求前归还数据库连接，避免上游耗时期间占用连接池
+    release_db_connection()
     
     # 记录开始时间
     start_time = time.time()
@@ -247,29 +357,39 @@ def send_request():
     try:
         url_encoded, request_body =request_info_parser(url, body ,query)
         # 发送请求
-        response = xapi_send_request(url_encoded, method, headers, request_body)
+        response = xapi_send_request(url_encoded, method, headers, request_body, project_id=project_id,
+                                     timeout=timeout, retries=retries, stream=is_stream)
         
         # 计算响应时间（毫秒）
         response_time = int((time.time() - start_time) * 1000)
             # 处理流式响应
-        if headers.get('Accept') == 'text/event-stream' or 'stream' in data and data['stream']:
-            # 对于流式响应，直接转发数据
-            def generate():
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        yield chunk
-            
-            # 保存到历史记录（只保存前一部分数据用于历史记录）
-            response_preview = next(response.iter_lines(), b'').decode('utf-8', errors='ignore')
+        if is_stream:
+            # 对于流式响应，边转发边复制到有界缓冲区，流结束后由后台线程写入历史记录
+            response_status = response.status_code
+            response_headers = dict(response.headers)
             
-            # 只有存在request_info_id时才记录历史
-            if request_info_id:
-                history_id = save_to_history(
+            def on_stream_complete(tee):
+                # 只有存在request_info_id时才记录历史
+                if not request_info_id:
+                    return
+                stream_metrics = tee.metrics()
+                if tee.error:
+                    execution_status = "异常"
+                else:
+                    execution_status = "成功" if response_status < 400 else "失败"
+                stream_details = {
+                    "contentType": response_headers.get('Content-Type'),
+                    "contentLength": response_headers.get('Content-Length'),
+                    "statusCode": response_status,
+                    "stream": stream_metrics,
+                    "outbound": response.xapi_outbound
+                }
+                history_writer.submit(
                     request_info_id=request_info_id,
-                    response_status=response.status_code,
-                    response_headers=dict(response.headers),
-                    response_body=response_preview,
-                    response_time=response_time,
+                    response_status=response_status,
+                    response_headers=response_headers,
+                    response_body=tee.captured_text(),
+                    response_time=tee.duration_ms,
                     url=url,
                     method=method,
                     auth=auth,
@@ -277,41 +397,54 @@ def send_request():
                     query=query,
                     request_headers=headers,
                     request_body=body,
-                    execution_status="成功" if response.status_code < 400 else "失败",
-                    execution_message=f"HTTP {response.status_code} - {response_time}ms",
-                    execution_details={
-                        "contentType": response.headers.get('Content-Type'),
-                        "contentLength": response.headers.get('Content-Length'),
-                        "statusCode": response.status_code
-                    }
+                    execution_status=execution_status,
+                    execution_message=f"HTTP {response_status} - 首包 {tee.first_chunk_ms}ms, 总耗时 {tee.duration_ms}ms, {tee.chunk_count} chunks, {tee.total_bytes} bytes",
+                    execution_details=stream_details,
+                    pre_request_results=pre_request_results,
+                    username=username,
+                    on_saved=lambda history_id: publish_history_event(
+                        history_id, project_id, request_info_id, response_status, tee.duration_ms,
+                        execution_status, username, user_id
+                    )
                 )
             
-            return Response(generate(), 
-                        status=response.status_code,
-                        headers=dict(response.headers))
+            return Response(StreamTee(response, start_time, on_complete=on_stream_complete),
+                        status=response_status,
+                        headers=stream_response_headers(response))
         # 打印响应信息
-        log.info(f"\n响应信息- 状态码: {response.status_code},响应时间: {response_time} ms,响应头: {json.dumps(dict(response.headers), ensure_ascii=False, indent=2)}")
+        log.info("响应信息- 状态码: %s,响应时间: %s ms", response.status_code, response_time)
+        log.debug("响应头: %s", brief(dict(response.headers)))
+        
+        # 分块读取响应体，超过上限的部分落盘，只保留预览
+        response_data = read_response_body(response)
+        response_text = response_data.text()
+        body_blob = response_data.blob_info()
         
         # 尝试解析响应体为JSON
         try:
+            if body_blob:
+                # 大响应体只返回预览文本，完整内容通过 /api/history/<history_id>/body 分段读取
+                response_body = response_text
+                response_body_str = response_text
             # 先检查响应内容是否为空
-            if response.text.strip():
-                response_body = response.json()
-                response_body_str = json.dumps(response_body)
+            elif response_text.strip():
+                # 只解析一次用于校验，原始字节直接透传给前端，原文写入历史记录
+                body_bytes = response_data.utf8_content()
+                xapi_json.loads(body_bytes)
+                response_body = RawJSON(body_bytes)
+                response_body_str = response_text
             else:
                 response_body = ""
                 response_body_str = ""
-                print(f"响应体: (空响应)\n")
+                log.debug("响应体: (空响应)")
         except json.JSONDecodeError as e:
-            response_body = response.text
+            response_body = response_text
             response_body_str = response_body
-            print(f"响应体: {response.text}\n")
-            log.warning(f"响应体不是有效的JSON格式: {str(e)}")
+            log.debug("响应体不是有效的JSON格式: %s, 响应体: %s", e, brief(response_text))
         except Exception as e:
-            response_body = response.text
+            response_body = response_text
             response_body_str = response_body
-            print(f"响应体: {response.text}\n")
-            log.warning(f"解析响应体时发生错误: {str(e)}")
+            log.warning("解析响应体时发生错误: %s, 响应体: %s", e, brief(response_text))
         
         # 设置执行状态信息
         status = "成功" if response.status_code < 400 else "失败"
@@ -319,10 +452,14 @@ def send_request():
         details = {
             "contentType": response.headers.get('Content-Type'),
             "contentLength": response.headers.get('Content-Length'),
-            "statusCode": response.status_code
+            "statusCode": response.status_code,
+            "outbound": response.xapi_outbound
         }
+        if body_blob:
+            details["responseBlob"] = body_blob
         
         # 只有存在request_info_id时才记录历史
+        history_id = None
         if request_info_id:
             history_id = save_to_history(
                 request_info_id=request_info_id,
@@ -343,9 +480,16 @@ def send_request():
                 pre_request_results=pre_request_results,
                 username=username
             )
+            if history_id:
+                publish_history_event(history_id, project_id, request_info_id, response.status_code,
+                                      response_time, status, username, user_id)
+        elif body_blob:
+            # 没有历史记录引用的大响应体无法再被读取，直接删除
+            os.remove(get_blob_path(body_blob['id']))
+            body_blob = None
         
         # 返回响应（包含请求信息以便前端保存）
-        return jsonify({
+        return json_response({
             'status': response.status_code,
             'headers': dict(response.headers),
             'request_info': {
@@ -363,6 +507,8 @@ def send_request():
             'execution_details': details,
             'body': response_body,
             'responseTime': response_time,
+            'history_id': history_id,
+            'body_blob': body_blob,
             'pre_request_results': pre_request_results  # 添加前置请求结果
         })
         
@@ -370,15 +516,19 @@ def send_request():
         # 记录异常状态
         error_message = str(e)
         log.info(f"请求异常: {error_message}")
+        error_details = {"exception": error_message}
+        if getattr(e, 'xapi_outbound', None):
+            error_details["outbound"] = e.xapi_outbound
         
         # 只有存在request_info_id时才记录历史（失败状态）
         if request_info_id:
+            error_time = int((time.time() - start_time) * 1000)
             history_id = save_to_history(
                 request_info_id=request_info_id,
                 response_status=500,
                 response_headers={},
                 response_body=json.dumps({"error": error_message}),
-                response_time=int((time.time() - start_time) * 1000),
+                response_time=error_time,
                 url=url,
                 method=method,
                 auth=auth,
@@ -388,13 +538,25 @@ def send_request():
                 request_body=body,
                 execution_status="异常",
                 execution_message=error_message,
-                execution_details={"exception": error_message}
+                execution_details=error_details
             )
+            if history_id:
+                publish_history_event(history_id, project_id, request_info_id, 500, error_time,
+                                      "异常", username, user_id)
             
+        if isinstance(e, OutboundLimitExceeded):
+            status_code = 429
+        elif isinstance(e, CircuitOpen):
+            status_code = 503
+        elif isinstance(e, requests.Timeout):
+            status_code = 504
+        else:
+            status_code = 500
         return jsonify({
             'error': error_message,
+            'execution_details': error_details,
             'pre_request_results': pre_request_results  # 即使异常也返回前置请求结果
-        }), 500
+        }), status_code
 @project_write_permission
 def save_request_info():
     data = request.json
@@ -425,6 +587,7 @@ def save_request_info():
     
     if not info_id:
         return jsonify({'error': 'Failed to save request info'}), 500
+    invalidate_pre_request_results(info_id)
     
     # 如果提供了project_id，建立项目与请求的关联
     try:
@@ -479,13 +642,80 @@ def get_request_history(request_info_id):
         user_role = g.role
         
         # 根据用户权限获取历史记录
-        history = get_history_by_request_info_id_with_permission(request_info_id, user_id, user_role)
-        return jsonify(history)
+        history = get_history_by_request_info_id_with_permission(request_info_id, user_id, user_role, raw_body=True)
+        return json_response(history)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 路由：分段读取落盘的大响应体
+@project_read_permission
+def get_history_body(history_id):
+    """
+    读取历史记录引用的响应体 blob
+    支持 Range: bytes=start-end 请求头，或 offset/length 查询参数
+    """
+    try:
+        project_id = request.args.get('project_id', type=int)
+        history = get_history_record(history_id)
+        if not history or not check_request_in_project(project_id, history['request_info_id']):
+            return XAPI_ERROR_RES('历史记录不存在', 404)
+        
+        # 与历史查询一致：管理员和项目Owner可查看全部记录，其他用户只能查看自己的记录
+        if g.role != 'admin' and history['username'] != g.username:
+            if check_user_project_permission(g.user_id, project_id) != 'owner':
+                return XAPI_ERROR_RES('无权限访问该记录', 403)
+        
+        body_blob = history['execution_details'].get('responseBlob')
+        if not body_blob:
+            return XAPI_ERROR_RES('该记录没有落盘的响应体', 404)
+        
+        offset = request.args.get('offset', 0, type=int)
+        length = request.args.get('length', None, type=int)
+        if offset < 0 or (length is not None and length <= 0):
+            return XAPI_ERROR_RES('offset/length 无效', 400)
+        range_header = request.headers.get('Range', '')
+        match = re.match(r'^bytes=(\d+)-(\d*)$', range_header.strip())
+        if match:
+            offset = int(match.group(1))
+            length = int(match.group(2)) - offset + 1 if match.group(2) else None
+        
+        data, total = read_blob_range(body_blob['id'], offset, length)
+        if data is None:
+            return XAPI_ERROR_RES('响应体文件已不存在', 410)
+        # 区间倒置或起点超出文件大小时返回 416
+        if (length is not None and length <= 0) or ((match or offset) and offset >= total):
+            error, status = XAPI_ERROR_RES('请求的区间无效', 416)
+            error.headers['Content-Range'] = f"bytes */{total}"
+            return error, status
+        
+        content_type = history['response_headers'].get('Content-Type', 'application/octet-stream')
+        end = offset + len(data) - 1 if data else offset
+        # 未带 Range 且返回了整个文件时按完整响应返回 200
+        partial = bool(match) or len(data) < total
+        headers = {
+            'Content-Type': content_type,
+            'Accept-Ranges': 'bytes',
+            'X-Body-Truncated': 'true' if body_blob.get('truncated') else 'false'
+        }
+        if partial:
+            headers['Content-Range'] = f"bytes {offset}-{end}/{total}"
+        return Response(data, status=206 if partial else 200, headers=headers)
+    except Exception as e:
+        log.error(f"读取响应体失败: {e}")
+        return XAPI_ERROR_RES('读取响应体失败', 500)
+
+def parse_pre_request_body(response):
+    """读取前置请求响应体，优先解析为JSON；过大的响应体只保留预览文本"""
+    response_data = read_response_body(response)
+    if response_data.spilled:
+        os.remove(get_blob_path(response_data.blob_id))
+        return response_data.text()
+    try:
+        return xapi_json.loads(response_data.utf8_content())
+    except:
+        return response_data.text()
+
 def request_info_parser(url,body_info,query_info):
-    print(f"Type-body: {type(body_info)},Type-query: {type(query_info)}")
     url_encoded=url
     request_body = None
     try:
@@ -508,7 +738,7 @@ def request_info_parser(url,body_info,query_info):
                 separator = '&' if '?' in url else '?'
                 url_encoded = url + separator + '&'.join(query_params)
         
-        log.info(f"最终请求URL: {url_encoded}")
+        log.debug("最终请求URL: %s", brief(url_encoded))
                 # 处理请求体编码    
         if body_info:
             # 如果body是字符串且包含中文，确保使用UTF-8编码
@@ -520,32 +750,167 @@ def request_info_parser(url,body_info,query_info):
         log.error(f"请求失败: {e}")
     return url_encoded, request_body
 
-def xapi_send_request(url_encoded, method, headers, request_body):
-    log.info(f"最终请求request_body: {request_body}")
-    #print(f"Body: {json.dumps(request_body, ensure_ascii=False, indent=2)}\n")
+def prepare_saved_request(project_id, request_info, cache_ttl=0):
+    """
+    与 send_request 相同地执行前置请求并替换变量
+    返回 (method, url_encoded, headers, request_body)
+    """
+    url = request_info['url']
+    method = request_info['method']
+    headers = dict(request_info.get('headers') or {})
+    body = request_info.get('body') or ''
+    query = request_info.get('query') or {}
+    if contains_xapi_variables(body) or contains_xapi_variables(query) or contains_xapi_variables(headers):
+        pre_request_results = run_pre_requests(project_id, request_info['id'], cache_ttl)
+        if pre_request_results:
+            body = replace_variables(body, pre_request_results)
+            query = replace_variables(query, pre_request_results)
+            headers = replace_variables(headers, pre_request_results)
+    url_encoded, request_body = request_info_parser(url, body, query)
+    return method, url_encoded, headers, request_body
+
+def execute_saved_request(project_id, request_info, cache_ttl=0, max_body_bytes=0):
+    """
+    在请求上下文之外执行已保存的请求（定时监控、后台任务使用）
+    不写历史记录，返回状态码、耗时、响应头、响应体和超时/重试等执行信息
+    落盘的大响应体不超过 max_body_bytes 时读取完整内容，否则 text 只是预览，body_complete 为 False
+    """
+    method, url_encoded, headers, request_body = prepare_saved_request(project_id, request_info, cache_ttl)
+    start_time = time.time()
+    response = xapi_send_request(url_encoded, method, headers, request_body, project_id=project_id)
+    if response is None:
+        raise ValueError(f"不支持的请求方法: {method}")
+    try:
+        response_data = read_response_body(response)
+    finally:
+        response.close()
+    text, body_complete = None, not response_data.spilled
+    if response_data.spilled:
+        blob_path = get_blob_path(response_data.blob_id)
+        if blob_path and os.path.exists(blob_path):
+            if not response_data.truncated and response_data.size <= max_body_bytes:
+                with open(blob_path, 'rb') as f:
+                    text = f.read().decode(response_data.encoding, errors='replace')
+                body_complete = True
+            os.remove(blob_path)
+    return {
+        'status': response.status_code,
+        'response_time': int((time.time() - start_time) * 1000),
+        'headers': dict(response.headers),
+        'size': response_data.size,
+        'text': text if text is not None else response_data.text(),
+        'body_complete': body_complete,
+        'outbound': response.xapi_outbound
+    }
+
+def xapi_send_request(url_encoded, method, headers, request_body, project_id=None, timeout=None, retries=None,
+                      pre_request=False, stream=False):
+    """
+    发送外部请求
+    按项目环境配置（outbound）限流并设置连接/读取超时；连接失败、超时或返回 retry_on_status 时，幂等方法和前置请求按随机退避重试；
+    同一 host 连续失败时熔断，熔断期间直接失败。timeout/retries 为单个请求的覆盖值（见 parse_timeout/parse_retries）。
+    限流、超时、重试和熔断信息保存在 response.xapi_outbound 中（请求失败时在异常的 xapi_outbound 中），供写入执行详情
+    """
+    log.debug("最终请求request_body: %s", brief(request_body))
+    parts = urlsplit(url_encoded)
+    host = parts.netloc or 'unknown'
+    limiter, settings = outbound_limiters.policy(project_id, host, parts.hostname)
+    request_timeouts = request_timeout(settings, timeout, stream)
+    max_retries = retry_count(settings, method, retries, pre_request)
+    breaker = circuit_breakers.get(host)
+    outbound = {'timeout': {'connect': request_timeouts[0], 'read': request_timeouts[1]}, 'attempts': []}
+    while True:
+        response, error = None, None
+        record = {'attempt': len(outbound['attempts']) + 1}
+        outbound['attempts'].append(record)
+        # 先检查熔断再排队限流，熔断期间的请求不占用令牌和并发名额
+        try:
+            outbound['circuit'] = breaker.before_request(settings)
+        except CircuitOpen as e:
+            record['error'] = f"CircuitOpen: {e}"
+            e.xapi_outbound = outbound
+            raise
+        try:
+            permit = limiter.acquire()
+        except Exception as e:
+            breaker.cancel()
+            e.xapi_outbound = outbound
+            raise
+        try:
+            started_at = time.perf_counter()
+            outcome = 'error'
+            try:
+                response = _xapi_dispatch_request(url_encoded, method, headers, request_body, request_timeouts)
+                if response is not None:
+                    outcome = f'{response.status_code // 100}xx'
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                outcome = 'timeout' if isinstance(e, requests.Timeout) else 'error'
+            finally:
+                # 只统计到收到响应头为止，流式/分块读取响应体的时间不计入
+                elapsed = time.perf_counter() - started_at
+                add_upstream_time(elapsed * 1000)
+                observe_upstream(host, elapsed, outcome)
+        except Exception as e:
+            # 其他异常（如 URL 格式错误）与上游是否可用无关，不计入熔断
+            breaker.cancel()
+            e.xapi_outbound = outbound
+            raise
+        finally:
+            # 并发名额在收到响应头后释放，读取响应体不占用名额
+            permit.release()
+            limit = permit.details()
+            if limit:
+                record['limit'] = limit
+        record['elapsedMs'] = int(elapsed * 1000)
+        if error is not None:
+            record['error'] = f"{type(error).__name__}: {error}"[:300]
+        elif response is not None:
+            record['status'] = response.status_code
+        # 只有连接失败、超时和 retry_on_status 计为失败：被测接口按预期返回的 500 等不应使整个 host 熔断
+        failed = error is not None or (response is not None and response.status_code in settings['retry_on_status'])
+        breaker.record(not failed, settings)
+        if not failed or len(outbound['attempts']) > max_retries:
+            break
+        delay = retry_delay(settings, len(outbound['attempts']))
+        record['backoffMs'] = int(delay * 1000)
+        OUTBOUND_RETRIES.inc(host_label(host))
+        log.warning(f"外部请求失败，{delay:.2f} 秒后重试 - {method} {host}, attempt: {record['attempt']}, "
+                    f"{record.get('error') or record.get('status')}")
+        if response is not None:
+            response.close()
+        time.sleep(delay)
+    if error is not None:
+        error.xapi_outbound = outbound
+        raise error
+    if response is not None:
+        response.xapi_outbound = outbound
+    return response
+
+def _xapi_dispatch_request(url_encoded, method, headers, request_body, timeout=None):
     if method == 'GET':
-        response = requests.get(url_encoded, headers=headers, stream=True)
+        response = requests.get(url_encoded, headers=headers, stream=True, timeout=timeout)
     elif method == 'POST':
         # 检查Content-Type是否设置
         if 'Content-Type' not in headers and request_body:
             log.warn("警告: 未设置Content-Type，可能导致415错误")
             log.warn("自动添加Content-Type: application/json")
             headers['Content-Type'] = 'application/json'
-        response = requests.post(url_encoded, headers=headers, data=request_body, stream=True)
+        response = requests.post(url_encoded, headers=headers, data=request_body, stream=True, timeout=timeout)
     elif method == 'PUT':
         if 'Content-Type' not in headers and request_body:
             log.warn("警告: 未设置Content-Type，可能导致415错误")
             log.warn("自动添加Content-Type: application/json")
             headers['Content-Type'] = 'application/json'
-        response = requests.put(url_encoded, headers=headers, data=request_body, stream=True)
+        response = requests.put(url_encoded, headers=headers, data=request_body, stream=True, timeout=timeout)
     elif method == 'DELETE':
-        response = requests.delete(url_encoded, headers=headers, stream=True)
+        response = requests.delete(url_encoded, headers=headers, stream=True, timeout=timeout)
     elif method == 'PATCH':
         if 'Content-Type' not in headers and request_body:
             log.warn("警告: 未设置Content-Type，可能导致415错误")
             log.warn("自动添加Content-Type: application/json")
             headers['Content-Type'] = 'application/json'
-        response = requests.patch(url_encoded, headers=headers, data=request_body, stream=True)
+        response = requests.patch(url_encoded, headers=headers, data=request_body, stream=True, timeout=timeout)
     else:
         response = None
     return response
@@ -588,6 +953,7 @@ def delete_request():
         
         success = delete_request_info(request_id, project_id)
         if success:
+            invalidate_pre_request_results(request_id)
             return XAPI_RES("删除成功", True, 200)
         else:
             return XAPI_RES("删除失败", False, 500)
@@ -160,7 +160,7 @@ def verify_token_api():
     
     # 验证token
     payload = verify_token(token)
-    if not payload:
+    if not payload or payload.get('scope'):
         return jsonify({'success': False, 'error': 'Token无效或已过期'}), 401
     exp_timestamp = payload.get('exp')
     exp_time = datetime.fromtimestamp(exp_timestamp)
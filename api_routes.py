@@ -1,25 +1,42 @@
 # api_routes.py
 from flask import Flask
-from auth import require_auth
+from auth import require_auth, require_event_auth, require_worker_auth
 
 def register_api_routes(app: Flask):
     """
     注册所有API路由
     """
     from api.api_server import (
-        send_request, save_request_info, get_request_info, get_request_history,copy_request, delete_request   )
+        send_request, save_request_info, get_request_info, get_request_history,copy_request, delete_request,
+        get_history_body   )
     from api.api_user import (
         register, login, get_user_info,
         get_all_users, verify_token_api
     )
     from api.api_project import (
         get_projects, create_new_project, get_project_detail,
-        get_project_request_list,
+        get_project_request_list, get_project_request_summary, get_project_request_detail,
+        get_project_request_changes_api,
         get_project_members_list, add_project_member, remove_project_member_api
     )
     from api.api_project_env import (
         get_env, save_env, delete_env
     )
+    from api.api_admin import (
+        get_db_pool_status, list_profiles, get_profile, get_sampling_profiler,
+        start_sampling_profiler, stop_sampling_profiler, download_sampling_stacks
+    )
+    from api.api_search import search
+    from api.api_monitor import (
+        list_monitors, create_monitor, update_monitor, delete_monitor, list_monitor_runs, run_monitor_now
+    )
+    from api.api_events import create_event_ticket, stream_events
+    from api.api_load import (
+        list_load_jobs, create_load_job_api, get_load_job_detail, cancel_load_job_api, list_load_workers,
+        register_worker, claim_shard, get_shard_plan, report_shard_results
+    )
+    from api.api_jobs import list_jobs, create_job, get_job_status, get_job_result, cancel_job
+    from api.api_metrics import metrics
     
     # 注册API路由
     app.add_url_rule('/api/send-request', 'send_request', require_auth(send_request), methods=['POST'])
@@ -29,6 +46,7 @@ def register_api_routes(app: Flask):
     # 项目相关
     app.add_url_rule('/api/request-info', 'get_request_info', require_auth(get_request_info), methods=['GET'])
     app.add_url_rule('/api/history/<int:request_info_id>', 'get_request_history', require_auth(get_request_history), methods=['GET'])
+    app.add_url_rule('/api/history/<int:history_id>/body', 'get_history_body', require_auth(get_history_body), methods=['GET'])
     app.add_url_rule('/api/register', 'register', register, methods=['POST'])
     app.add_url_rule('/api/login', 'login', login, methods=['POST'])
     app.add_url_rule('/api/verify_token', 'verify_token_api', verify_token_api, methods=['GET'])
@@ -47,6 +65,9 @@ def register_api_routes(app: Flask):
     app.add_url_rule('/api/projects', 'create_new_project', require_auth(create_new_project), methods=['POST'])
     app.add_url_rule('/api/projects/<int:project_id>', 'get_project_detail', require_auth(get_project_detail), methods=['GET'])
     app.add_url_rule('/api/projects/<int:project_id>/requests', 'get_project_request_list', require_auth(get_project_request_list), methods=['GET'])
+    app.add_url_rule('/api/projects/<int:project_id>/requests/summary', 'get_project_request_summary', require_auth(get_project_request_summary), methods=['GET'])
+    app.add_url_rule('/api/projects/<int:project_id>/requests/changes', 'get_project_request_changes_api', require_auth(get_project_request_changes_api), methods=['GET'])
+    app.add_url_rule('/api/projects/<int:project_id>/requests/<int:request_info_id>', 'get_project_request_detail', require_auth(get_project_request_detail), methods=['GET'])
     app.add_url_rule('/api/projects/members', 'get_project_members_list', require_auth(get_project_members_list), methods=['GET'])
     app.add_url_rule('/api/projects/members', 'add_project_member', require_auth(add_project_member), methods=['POST'])
     app.add_url_rule('/api/projects/members', 'remove_project_member_api', require_auth(remove_project_member_api), methods=['DELETE'])
@@ -55,3 +76,48 @@ def register_api_routes(app: Flask):
     app.add_url_rule('/api/project_env/<int:project_id>', 'get_env', require_auth(get_env), methods=['GET'])
     app.add_url_rule('/api/project_env/<int:project_id>', 'save_env', require_auth(save_env), methods=['POST'])
     app.add_url_rule('/api/project_env/<int:project_id>', 'delete_env', require_auth(delete_env), methods=['DELETE'])
+
+    # 搜索路由
+    app.add_url_rule('/api/search', 'search', require_auth(search), methods=['GET'])
+
+    # 事件推送路由（SSE）
+    app.add_url_rule('/api/events/ticket', 'create_event_ticket', require_auth(create_event_ticket), methods=['POST'])
+    app.add_url_rule('/api/events', 'stream_events', require_event_auth(stream_events), methods=['GET'])
+
+    # 定时监控路由
+    app.add_url_rule('/api/monitors', 'list_monitors', require_auth(list_monitors), methods=['GET'])
+    app.add_url_rule('/api/monitors', 'create_monitor', require_auth(create_monitor), methods=['POST'])
+    app.add_url_rule('/api/monitors/<int:monitor_id>', 'update_monitor', require_auth(update_monitor), methods=['PUT'])
+    app.add_url_rule('/api/monitors/<int:monitor_id>', 'delete_monitor', require_auth(delete_monitor), methods=['DELETE'])
+    app.add_url_rule('/api/monitors/<int:monitor_id>/runs', 'list_monitor_runs', require_auth(list_monitor_runs), methods=['GET'])
+    app.add_url_rule('/api/monitors/<int:monitor_id>/run', 'run_monitor_now', require_auth(run_monitor_now), methods=['POST'])
+
+    # 分布式压测路由
+    app.add_url_rule('/api/load-jobs', 'list_load_jobs', require_auth(list_load_jobs), methods=['GET'])
+    app.add_url_rule('/api/load-jobs', 'create_load_job_api', require_auth(create_load_job_api), methods=['POST'])
+    app.add_url_rule('/api/load-jobs/<int:job_id>', 'get_load_job_detail', require_auth(get_load_job_detail), methods=['GET'])
+    app.add_url_rule('/api/load-jobs/<int:job_id>/cancel', 'cancel_load_job_api', require_auth(cancel_load_job_api), methods=['POST'])
+    app.add_url_rule('/api/admin/load-workers', 'list_load_workers', require_auth(list_load_workers), methods=['GET'])
+    # 压测 worker 接口（注册使用 load_workers.registration_token，其余使用注册时签发的 worker token）
+    app.add_url_rule('/api/load/workers/register', 'register_worker', register_worker, methods=['POST'])
+    app.add_url_rule('/api/load/workers/claim', 'claim_shard', require_worker_auth(claim_shard), methods=['POST'])
+    app.add_url_rule('/api/load/shards/<int:shard_id>/plan', 'get_shard_plan', require_worker_auth(get_shard_plan), methods=['GET'])
+    app.add_url_rule('/api/load/shards/<int:shard_id>/results', 'report_shard_results', require_worker_auth(report_shard_results), methods=['POST'])
+
+    # 后台任务路由
+    app.add_url_rule('/api/jobs', 'list_jobs', require_auth(list_jobs), methods=['GET'])
+    app.add_url_rule('/api/jobs', 'create_job', require_auth(create_job), methods=['POST'])
+    app.add_url_rule('/api/jobs/<int:job_id>', 'get_job_status', require_auth(get_job_status), methods=['GET'])
+    app.add_url_rule('/api/jobs/<int:job_id>/result', 'get_job_result', require_auth(get_job_result), methods=['GET'])
+    app.add_url_rule('/api/jobs/<int:job_id>/cancel', 'cancel_job', require_auth(cancel_job), methods=['POST'])
+
+    # 系统管理路由
+    app.add_url_rule('/api/admin/db-pool', 'get_db_pool_status', require_auth(get_db_pool_status), methods=['GET'])
+    app.add_url_rule('/api/admin/profiles', 'list_profiles', require_auth(list_profiles), methods=['GET'])
+    app.add_url_rule('/api/admin/profiles/<profile_id>', 'get_profile', require_auth(get_profile), methods=['GET'])
+    app.add_url_rule('/api/admin/profiler', 'get_sampling_profiler', require_auth(get_sampling_profiler), methods=['GET'])
+    app.add_url_rule('/api/admin/profiler/start', 'start_sampling_profiler', require_auth(start_sampling_profiler), methods=['POST'])
+    app.add_url_rule('/api/admin/profiler/stop', 'stop_sampling_profiler', require_auth(stop_sampling_profiler), methods=['POST'])
+    app.add_url_rule('/api/admin/profiler/stacks', 'download_sampling_stacks', require_auth(download_sampling_stacks), methods=['GET'])
+    # 运行指标（Prometheus 采集，不走用户登录认证）
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
@@ -4,7 +4,7 @@ import datetime
 from functools import wraps
 from flask import request, jsonify, current_app, g
 from db_orm import get_user_by_id, check_user_project_permission
-from config import JWT_SECRET_KEY
+from config import config
 from log_base import MyLog
 log = MyLog().my_logger()
 
@@ -27,7 +27,7 @@ def generate_token(user_id, username, role):
             'iat': datetime.datetime.utcnow()  # 签发时间
         }
         
-        token = jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+        token = jwt.encode(payload, config.jwt_secret_key, algorithm=JWT_ALGORITHM)
         return token
     except Exception as e:
         log.error(f"Token generation error: {e}")
@@ -39,7 +39,7 @@ def verify_token(token):
     """
     try:
         # 解码token
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, config.jwt_secret_key, algorithms=[JWT_ALGORITHM])
         
         # 打印用户信息和过期时间
         username = payload.get('username')
@@ -55,6 +55,72 @@ def verify_token(token):
         print(f"Token验证失败: {e}")
         return None
 
+def generate_event_ticket(user_id, username, role, ttl):
+    """
+    生成事件订阅票据
+    EventSource 无法设置请求头，只能把凭证放在地址中，因此使用短期有效、仅能用于订阅事件的票据代替登录 token
+    """
+    now = datetime.datetime.utcnow()
+    payload = {
+        'user_id': user_id,
+        'username': username,
+        'role': role,
+        'scope': 'events',
+        'exp': now + datetime.timedelta(seconds=ttl),
+        'iat': now
+    }
+    return jwt.encode(payload, config.jwt_secret_key, algorithm=JWT_ALGORITHM)
+
+def require_event_auth(f):
+    """
+    事件订阅鉴权装饰器
+    支持 Authorization 头中的登录 token，或 ticket 查询参数中的事件订阅票据
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        ticket = request.args.get('ticket')
+        if not ticket:
+            return require_auth(f)(*args, **kwargs)
+        payload = verify_token(ticket)
+        if not payload or payload.get('scope') != 'events':
+            return jsonify({'success': False, 'error': '订阅票据无效或已过期'}), 401
+        g.user_id = payload.get('user_id')
+        g.username = payload.get('username')
+        g.role = payload.get('role')
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+def generate_worker_token(worker_id, ttl):
+    """生成压测 worker 的访问 token，只能用于 worker 接口（领取分片、上报结果）"""
+    now = datetime.datetime.utcnow()
+    payload = {
+        'worker_id': worker_id,
+        'scope': 'load_worker',
+        'exp': now + datetime.timedelta(seconds=ttl),
+        'iat': now
+    }
+    return jwt.encode(payload, config.jwt_secret_key, algorithm=JWT_ALGORITHM)
+
+def require_worker_auth(f):
+    """
+    压测 worker 鉴权装饰器
+    Authorization 头中为注册时签发的 worker token，worker ID 保存在 g.worker_id
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        auth_header = request.headers.get('Authorization', '')
+        token_type, _, token = auth_header.partition(' ')
+        if token_type.lower() != 'bearer' or not token:
+            return jsonify({'success': False, 'error': '缺少认证'}), 401
+        payload = verify_token(token)
+        if not payload or payload.get('scope') != 'load_worker':
+            return jsonify({'success': False, 'error': 'Worker token无效或已过期'}), 401
+        g.worker_id = payload.get('worker_id')
+        return f(*args, **kwargs)
+
+    return decorated_function
+
 def require_auth(f):
     """
     鉴权装饰器
@@ -79,6 +145,9 @@ def require_auth(f):
         payload = verify_token(token)
         if not payload:
             return jsonify({'success': False, 'error': 'Token无效或已过期'}), 401
+        # 限定用途的票据（如事件订阅票据）不能作为登录 token 使用
+        if payload.get('scope'):
+            return jsonify({'success': False, 'error': 'Token无效或已过期'}), 401
         
         # 将用户信息添加到请求上下文中
         # request.user_id = payload.get('user_id')
@@ -224,3 +293,16 @@ def project_read_permission(f):
         return f(*args, **kwargs)
     
     return decorated_function
+
+def admin_permission(f):
+    """
+    系统管理员权限装饰器
+    仅允许 admin 角色访问
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if g.role != 'admin':
+            return jsonify({'success': False, 'error': '无权限操作'}), 403
+        return f(*args, **kwargs)
+    
+    return decorated_function
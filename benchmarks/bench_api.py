@@ -0,0 +1,141 @@
+"""
+接口基准测试
+
+启动本地模拟上游服务，在独立的 SQLite 数据库上通过 Flask test_client 并发调用接口，
+输出吞吐量、延迟分位数和内存占用，结果保存为 JSON 便于跨提交对比。
+
+    python benchmarks/bench_api.py --requests 500 --concurrency 8 --latency-ms 20 --payload-bytes 4096
+    python benchmarks/compare.py benchmarks/results/old.json benchmarks/results/new.json
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import prepare_environment, run_load, save_results, print_results
+from mock_upstream import MockUpstream
+
+SCENARIOS = ('send_request', 'send_request_pre', 'history', 'project_requests', 'project_request_summary', 'auth_decorators')
+
+class BenchContext:
+    """基准测试数据：管理员 token、项目、请求和前置请求配置"""
+
+    def __init__(self, app, upstream, history_rows):
+        self.app = app
+        self.upstream = upstream
+        client = app.test_client()
+        client.post('/api/register', json={'username': 'admin', 'password': 'bench-pass'})
+        login = client.post('/api/login', json={'username': 'admin', 'password': 'bench-pass'}).get_json()
+        if not login or not login.get('token'):
+            raise RuntimeError(f'登录失败: {login}')
+        self.headers = {'Authorization': f"Bearer {login['token']}"}
+        self.project_id = self._check(client.post('/api/projects', json={'name': 'bench', 'description': ''},
+                                                  headers=self.headers))['project_id']
+        self.request_info_id = self._check(client.post('/api/save-request-info', json={
+            'project_id': self.project_id, 'request_name': 'bench-order',
+            'url': f'{upstream.base_url}/orders/1', 'method': 'GET'
+        }, headers=self.headers))['request_info_id']
+        pre_request_id = self._check(client.post('/api/save-request-info', json={
+            'project_id': self.project_id, 'request_name': 'bench-login',
+            'url': f'{upstream.base_url}/login', 'method': 'GET'
+        }, headers=self.headers))['request_info_id']
+        self._check(client.post('/api/advanced-config', json={
+            'project_id': self.project_id, 'request_info_id': pre_request_id, 'is_global': 1,
+            'query_info': '{}', 'body_info': ''
+        }, headers=self.headers))
+        configs = self._check(client.get(f'/api/advanced-config/list?project_id={self.project_id}',
+                                         headers=self.headers))['configs']
+        self.pre_config_id = configs[0]['id']
+        for _ in range(history_rows):
+            self.send(client)
+
+    @staticmethod
+    def _check(response):
+        data = response.get_json()
+        if response.status_code != 200:
+            raise RuntimeError(f'准备测试数据失败: {response.status_code} {data}')
+        return data
+
+    def send(self, client, with_pre_request=False):
+        payload = {
+            'project_id': self.project_id,
+            'request_info_id': self.request_info_id,
+            'url': f'{self.upstream.base_url}/orders/1',
+            'method': 'GET',
+            'headers': {}
+        }
+        if with_pre_request:
+            payload['method'] = 'POST'
+            payload['headers'] = {'Content-Type': 'application/json',
+                                  'X-Token': f'$xapi.global.{self.pre_config_id}.body.token'}
+            payload['body'] = json.dumps({'token': f'$xapi.global.{self.pre_config_id}.body.token'})
+        return client.post('/api/send-request', json=payload, headers=self.headers).status_code == 200
+
+def build_tasks(ctx):
+    from flask import jsonify
+    from auth import require_auth, project_read_permission
+
+    @require_auth
+    @project_read_permission
+    def noop():
+        return jsonify({'success': True})
+
+    def auth_decorators(_):
+        with ctx.app.test_request_context(f'/?project_id={ctx.project_id}', headers=ctx.headers):
+            result = noop()
+            return not isinstance(result, tuple)
+
+    return {
+        'send_request': lambda client: ctx.send(client),
+        'send_request_pre': lambda client: ctx.send(client, with_pre_request=True),
+        'history': lambda client: client.get(f'/api/history/{ctx.request_info_id}?project_id={ctx.project_id}',
+                                             headers=ctx.headers).status_code == 200,
+        'project_requests': lambda client: client.get(f'/api/projects/{ctx.project_id}/requests',
+                                                      headers=ctx.headers).status_code == 200,
+        'project_request_summary': lambda client: client.get(f'/api/projects/{ctx.project_id}/requests/summary?limit=50',
+                                                             headers=ctx.headers).status_code == 200,
+        'auth_decorators': auth_decorators
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='xapi 接口基准测试')
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的请求数')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=10, help='每个场景的预热请求数（不计入结果）')
+    parser.add_argument('--latency-ms', type=float, default=0, help='模拟上游延迟')
+    parser.add_argument('--payload-bytes', type=int, default=1024, help='模拟上游响应大小')
+    parser.add_argument('--history-rows', type=int, default=100, help='预先写入的历史记录数')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='逗号分隔的场景列表')
+    parser.add_argument('--work-dir', help='数据库、日志等临时文件目录，默认新建临时目录')
+    parser.add_argument('--trace-memory', action='store_true', help='使用 tracemalloc 统计 Python 内存峰值（有额外开销）')
+    parser.add_argument('--output', help='结果文件路径，默认写入 benchmarks/results/')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"未知场景: {', '.join(sorted(unknown))}")
+    output = os.path.abspath(args.output) if args.output else None
+
+    prepare_environment(args.work_dir or tempfile.mkdtemp(prefix='xapi-bench-'))
+    import main as xapi_main
+    from db_orm import init_db
+    init_db()
+    app = xapi_main.app
+
+    with MockUpstream(args.latency_ms, args.payload_bytes) as upstream:
+        ctx = BenchContext(app, upstream, args.history_rows)
+        tasks = build_tasks(ctx)
+        results = {}
+        for name in scenarios:
+            results[name] = run_load(tasks[name], args.requests, args.concurrency, args.warmup,
+                                     trace_memory=args.trace_memory, make_state=app.test_client)
+
+    print_results(results)
+    params = {key: value for key, value in vars(args).items() if key not in ('output', 'work_dir')}
+    print(f"结果已保存: {save_results('api', params, results, output)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+db_orm 基准测试
+
+在 seed_db.py 生成的数据库上逐个测量 db_orm 公开函数（列表、权限检查、历史记录读取、写入、搜索等）的耗时，
+同时统计每次调用执行的 SQL 语句数。
+
+    python benchmarks/seed_db.py --history-per-request 400
+    python benchmarks/bench_db.py --iterations 200
+    python benchmarks/bench_db.py --db postgresql --pg-database xapi_bench
+
+删除类函数（delete_request_info、remove_project_member 等）会改变数据分布，不在测量范围内。
+"""
+import os
+import sys
+import json
+import random
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import prepare_environment, add_database_arguments, database_overrides, run_load, save_results, print_results
+from seed_db import DEFAULT_WORK_DIR, SEED_PASSWORD
+
+class BenchData:
+    """从已生成的数据库中随机选取测试对象"""
+
+    def __init__(self, seed):
+        from sqlalchemy import func
+        from db_orm import get_db_session, db_manager
+        from model.models import UserProjectPermission, ProjectRequestRelation, RequestHistory
+        self.rng = random.Random(seed)
+        session = get_db_session()
+        try:
+            memberships = session.query(UserProjectPermission.user_id, UserProjectPermission.project_id).all()
+            relations = session.query(ProjectRequestRelation.project_id, ProjectRequestRelation.request_info_id).all()
+            max_history = session.query(func.max(RequestHistory.id)).scalar()
+        finally:
+            db_manager.close_session(session)
+        if not memberships or not relations or not max_history:
+            raise RuntimeError('数据库中没有测试数据，请先运行 benchmarks/seed_db.py')
+        self.requests_by_project = {}
+        for project_id, request_info_id in relations:
+            self.requests_by_project.setdefault(project_id, []).append(request_info_id)
+        self.memberships = [(user_id, project_id) for user_id, project_id in memberships if project_id in self.requests_by_project]
+        self.max_history = max_history
+
+    def member(self):
+        """随机 (user_id, project_id, request_info_id)，用户是项目成员且请求属于项目"""
+        user_id, project_id = self.rng.choice(self.memberships)
+        return user_id, project_id, self.rng.choice(self.requests_by_project[project_id])
+
+    def history_id(self):
+        return self.rng.randint(1, self.max_history)
+
+def build_scenarios(data):
+    import db_orm
+
+    def with_member(call):
+        def task(_):
+            return call(*data.member())
+        return task
+
+    def save_history(user_id, project_id, request_info_id):
+        return db_orm.save_to_history(
+            request_info_id, 200, {'Content-Type': 'application/json'}, json.dumps({'code': 0, 'data': 'x' * 1024}),
+            35, url='https://api.example.com/v1/bench', method='GET', execution_status='成功',
+            execution_message='HTTP 200', execution_details={'contentType': 'application/json', 'statusCode': 200},
+            username='admin'
+        ) is not None
+
+    def update_request(user_id, project_id, request_info_id):
+        info = db_orm.get_request_info_by_id(request_info_id)
+        return db_orm.save_or_update_request_info(
+            info['url'], info['method'], info['headers'], info['body'], info['query'],
+            request_name=info.get('request_name'), request_info_id=request_info_id
+        ) is not None
+
+    return {
+        # 列表
+        'get_all_projects': lambda _: db_orm.get_all_projects(),
+        'get_user_projects': with_member(lambda u, p, r: db_orm.get_user_projects(u)),
+        'get_project_by_id': with_member(lambda u, p, r: db_orm.get_project_by_id(p)),
+        'get_project_members': with_member(lambda u, p, r: db_orm.get_project_members(p)),
+        'get_requests_by_project_id': with_member(lambda u, p, r: db_orm.get_requests_by_project_id(p)),
+        'get_request_ids_by_project': with_member(lambda u, p, r: db_orm.get_request_ids_by_project(p)),
+        'get_request_info_by_id': with_member(lambda u, p, r: db_orm.get_request_info_by_id(r)),
+        'get_all_users_list': lambda _: db_orm.get_all_users_list(),
+        'get_advanced_config': with_member(lambda u, p, r: db_orm.get_advanced_config(p, is_global=True)),
+        'get_project_env': with_member(lambda u, p, r: db_orm.get_project_env(p)),
+        # 权限检查
+        'verify_user': lambda _: db_orm.verify_user('admin', SEED_PASSWORD) is not None,
+        'get_user_by_username': lambda _: db_orm.get_user_by_username('admin') is not None,
+        'check_user_project_permission': with_member(lambda u, p, r: db_orm.check_user_project_permission(u, p)),
+        'check_request_in_project': with_member(lambda u, p, r: db_orm.check_request_in_project(p, r)),
+        # 历史记录
+        'get_history_by_request_info_id': with_member(lambda u, p, r: db_orm.get_history_by_request_info_id(r)),
+        'get_history_with_permission_admin': with_member(
+            lambda u, p, r: db_orm.get_history_by_request_info_id_with_permission(r, u, 'admin')),
+        'get_history_with_permission_user': with_member(
+            lambda u, p, r: db_orm.get_history_by_request_info_id_with_permission(r, u, 'user')),
+        'get_history_record': lambda _: db_orm.get_history_record(data.history_id()),
+        # 搜索
+        'search_project_requests': with_member(lambda u, p, r: db_orm.search_project_requests(p, 'orders', u, 'admin')),
+        # 写入
+        'save_to_history': with_member(save_history),
+        'save_or_update_request_info': with_member(update_request)
+    }
+
+def _queries_by_function():
+    from util.xapi_metrics import DB_QUERIES
+    return {labels[0]: value for labels, value in DB_QUERIES.snapshot().items()}
+
+def main():
+    parser = argparse.ArgumentParser(description='db_orm 基准测试')
+    parser.add_argument('--iterations', type=int, default=100, help='每个函数的调用次数')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--functions', help='逗号分隔的函数列表，默认全部')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help='与 seed_db.py 相同的目录')
+    parser.add_argument('--output', help='结果文件路径，默认写入 benchmarks/results/')
+    add_database_arguments(parser)
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    prepare_environment(args.work_dir, database_overrides(args))
+    logging.getLogger('example01').setLevel(logging.WARNING)
+    from db_orm import init_db, db_manager
+    init_db()
+    data = BenchData(args.seed)
+    scenarios = build_scenarios(data)
+    names = [name.strip() for name in args.functions.split(',')] if args.functions else list(scenarios)
+    unknown = set(names) - set(scenarios)
+    if unknown:
+        parser.error(f"未知函数: {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name in names:
+        before = _queries_by_function()
+        result = run_load(scenarios[name], args.iterations, args.concurrency, args.warmup)
+        after = _queries_by_function()
+        calls = args.iterations + args.warmup
+        result['queries_per_call'] = round((sum(after.values()) - sum(before.values())) / calls, 2) if calls else None
+        results[name] = result
+
+    print_results(results)
+    params = {key: value for key, value in vars(args).items() if key not in ('output', 'work_dir', 'pg_password')}
+    params['dialect'] = db_manager.engine.dialect.name
+    params['search_backend'] = db_manager.search_backend
+    print(f"结果已保存: {save_results('db', params, results, output)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+util/xapi_replace.py 微基准测试和候选实现校验
+
+按请求体大小（1KB ~ 10MB）、嵌套深度和占位符密度组合测量
+contains_xapi_variables / replace_variables 的耗时；指定 --candidate 时，
+先在模糊测试语料和全部基准数据上校验候选实现输出与当前实现完全一致，再对比速度。
+
+    python benchmarks/bench_replace.py
+    python benchmarks/bench_replace.py --sizes 1k,100k --candidate mypkg.fast_replace
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import importlib
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import prepare_environment, save_results
+from replace_corpus import PRE_REQUEST_RESULTS, build_case, generate_corpus
+
+DEFAULT_SIZES = '1k,10k,100k,1m,10m'
+DEFAULT_DEPTHS = '1,8,32'
+DEFAULT_DENSITIES = '0,0.01,0.1'
+
+def _parse_size(value):
+    value = value.strip().lower()
+    units = {'k': 1024, 'm': 1024 * 1024}
+    if value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+def _time_call(func, min_time, max_repeat):
+    """重复调用直到累计耗时超过 min_time，返回 (最短耗时ms, 平均耗时ms, 次数)"""
+    timings = []
+    total = 0
+    while (total < min_time or len(timings) < 3) and len(timings) < max_repeat:
+        started_at = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started_at
+        timings.append(elapsed)
+        total += elapsed
+    return round(min(timings) * 1000, 4), round(total / len(timings) * 1000, 4), len(timings)
+
+def _load_engine(name):
+    module = importlib.import_module(name)
+    return module.contains_xapi_variables, module.replace_variables
+
+def validate(baseline, candidate, cases):
+    """校验候选实现与当前实现输出一致，返回不一致的用例下标"""
+    mismatches = []
+    for index, (data, results) in enumerate(cases):
+        if baseline[0](data) != candidate[0](data):
+            mismatches.append(index)
+            continue
+        expected = baseline[1](data, results)
+        actual = candidate[1](data, results)
+        if expected != actual or type(expected) is not type(actual):
+            mismatches.append(index)
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description='xapi_replace 微基准测试')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='请求体大小列表，如 1k,1m')
+    parser.add_argument('--depths', default=DEFAULT_DEPTHS, help='嵌套深度列表')
+    parser.add_argument('--densities', default=DEFAULT_DENSITIES, help='占位符密度列表（含占位符的字符串比例）')
+    parser.add_argument('--min-time', type=float, default=0.2, help='每项测量的最少累计时间（秒）')
+    parser.add_argument('--max-repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--corpus-size', type=int, default=2000, help='模糊测试语料数量')
+    parser.add_argument('--candidate', help='候选实现模块名，需提供 contains_xapi_variables 和 replace_variables')
+    parser.add_argument('--with-logging', action='store_true', help='保留替换过程中的日志输出（默认关闭，避免日志影响测量）')
+    parser.add_argument('--output', help='结果文件路径，默认写入 benchmarks/results/')
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    # 候选模块可位于当前目录
+    sys.path.insert(0, os.getcwd())
+    prepare_environment(tempfile.mkdtemp(prefix='xapi-bench-replace-'))
+    baseline = _load_engine('util.xapi_replace')
+    candidate = _load_engine(args.candidate) if args.candidate else None
+    if not args.with_logging:
+        logging.getLogger('example01').setLevel(logging.CRITICAL)
+
+    cases = []
+    for size in args.sizes.split(','):
+        for depth in args.depths.split(','):
+            for density in args.densities.split(','):
+                cases.append((size.strip(), int(depth), float(density)))
+
+    validation = None
+    if candidate:
+        corpus = [(case['data'], case['pre_request_results']) for case in generate_corpus(args.seed, args.corpus_size)]
+        mismatches = validate(baseline, candidate, corpus)
+        validation = {'corpus_cases': len(corpus), 'corpus_mismatches': mismatches[:20]}
+        print(f"模糊语料校验: {len(corpus)} 条, 不一致 {len(mismatches)} 条")
+
+    results = {}
+    failed = bool(validation and validation['corpus_mismatches'])
+    print(f"{'case':<24}{'bytes':>10}{'contains ms':>13}{'replace ms':>12}" + (f"{'cand ms':>10}{'speedup':>9}" if candidate else ''))
+    for size, depth, density in cases:
+        name = f'{size}-d{depth}-p{density}'
+        data = build_case(_parse_size(size), depth, density, seed=args.seed)
+        approx_bytes = len(str(data).encode('utf-8'))
+        contains_min, contains_mean, contains_runs = _time_call(lambda: baseline[0](data), args.min_time, args.max_repeat)
+        replace_min, replace_mean, replace_runs = _time_call(lambda: baseline[1](data, PRE_REQUEST_RESULTS), args.min_time, args.max_repeat)
+        result = {
+            'bytes': approx_bytes,
+            'depth': depth,
+            'density': density,
+            'contains': {'min_ms': contains_min, 'mean_ms': contains_mean, 'runs': contains_runs},
+            'replace': {'min_ms': replace_min, 'mean_ms': replace_mean, 'runs': replace_runs}
+        }
+        line = f"{name:<24}{approx_bytes:>10}{contains_min:>13.3f}{replace_min:>12.3f}"
+        if candidate:
+            identical = not validate(baseline, candidate, [(data, PRE_REQUEST_RESULTS)])
+            cand_min, cand_mean, cand_runs = _time_call(lambda: candidate[1](data, PRE_REQUEST_RESULTS), args.min_time, args.max_repeat)
+            speedup = round(replace_min / cand_min, 2) if cand_min else None
+            result['candidate'] = {'identical': identical, 'replace': {'min_ms': cand_min, 'mean_ms': cand_mean, 'runs': cand_runs},
+                                   'speedup': speedup}
+            line += f"{cand_min:>10.3f}{speedup or 0:>8.2f}x" + ('' if identical else '  输出不一致')
+            failed = failed or not identical
+        results[name] = result
+        print(line)
+
+    params = {key: value for key, value in vars(args).items() if key != 'output'}
+    if validation is not None:
+        params['validation'] = validation
+    print(f"结果已保存: {save_results('replace', params, results, output)}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
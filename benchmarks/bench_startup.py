@@ -0,0 +1,120 @@
+"""
+启动耗时基准测试
+
+每次在新的子进程中导入 main 并发出第一个请求，测量 worker 冷启动的耗时：
+导入应用（含静态资源构建）、第一个不访问数据库的请求、第一个访问数据库的请求（创建连接池）。
+表结构由 init_db 预先初始化，不计入启动耗时。--import-time 时额外输出导入耗时最多的模块（python -X importtime）。
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --runs 10 --import-time 15
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import REPO_ROOT, prepare_environment, latency_summary, save_results, print_results
+
+SCENARIOS = ('import_main', 'first_static_request', 'first_db_request', 'total')
+
+# 子进程内执行：输出各阶段耗时（毫秒）和常驻内存
+CHILD_SCRIPT = """
+import sys, json, time
+started_at = time.perf_counter()
+sys.path.insert(0, {root!r})
+import main
+imported_at = time.perf_counter()
+client = main.app.test_client()
+static_ok = client.get('/login.html').status_code == 200
+static_at = time.perf_counter()
+db_ok = client.post('/api/login', json={{'username': 'bench-nobody', 'password': 'x'}}).status_code in (400, 401)
+db_at = time.perf_counter()
+sys.path.insert(0, {bench_dir!r})
+from common import _rss_mb
+print(json.dumps({{
+    'import_main': (imported_at - started_at) * 1000,
+    'first_static_request': (static_at - imported_at) * 1000,
+    'first_db_request': (db_at - static_at) * 1000,
+    'total': (db_at - started_at) * 1000,
+    'ok': static_ok and db_ok,
+    'rss_mb': _rss_mb()
+}}))
+"""
+
+def _child_script():
+    return CHILD_SCRIPT.format(root=REPO_ROOT, bench_dir=os.path.dirname(os.path.abspath(__file__)))
+
+def run_once(extra_args=()):
+    """启动一个子进程测量一次冷启动，返回 (各阶段耗时, 子进程 stderr)"""
+    completed = subprocess.run([sys.executable, *extra_args, '-c', _child_script()], capture_output=True,
+                               text=True, env=os.environ.copy())
+    if completed.returncode != 0:
+        raise RuntimeError(f'子进程启动失败: {completed.stderr[-2000:]}')
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+def import_time_top(stderr, top, max_depth=2):
+    """
+    解析 -X importtime 输出，返回累计导入耗时最多的模块 [(模块, 毫秒)]
+    只统计 main 导入的前 max_depth 层，避免同一依赖链上的模块重复出现
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        # 名称前每两个空格表示一层嵌套导入，main 本身位于第 0 层
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        if 0 < depth <= max_depth:
+            modules.append((name.strip(), int(cumulative_us) / 1000))
+    return sorted(modules, key=lambda item: item[1], reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description='xapi 启动耗时基准测试')
+    parser.add_argument('--runs', type=int, default=10, help='冷启动次数')
+    parser.add_argument('--import-time', type=int, default=0, metavar='N', help='输出导入耗时最多的 N 个模块')
+    parser.add_argument('--work-dir', help='数据库、日志等临时文件目录，默认新建临时目录')
+    parser.add_argument('--output', help='结果文件路径，默认写入 benchmarks/results/')
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    prepare_environment(args.work_dir or tempfile.mkdtemp(prefix='xapi-bench-'), {'config_reload': {'enabled': False}})
+    # 表结构初始化是部署步骤，不计入 worker 启动耗时；同时预热静态资源压缩缓存
+    subprocess.run([sys.executable, '-c', f"import sys; sys.path.insert(0, {REPO_ROOT!r}); "
+                    "from db_orm import init_db; init_db(); "
+                    "from util.xapi_static import static_assets; static_assets.build()"], check=True)
+
+    samples = {name: [] for name in SCENARIOS}
+    rss, errors = [], 0
+    for _ in range(args.runs):
+        timings, _ = run_once()
+        for name in SCENARIOS:
+            samples[name].append(timings[name])
+        rss.append(timings['rss_mb'])
+        errors += 0 if timings['ok'] else 1
+
+    results = {}
+    for name in SCENARIOS:
+        results[name] = {
+            'requests': args.runs,
+            'concurrency': 1,
+            'errors': errors,
+            'latency': latency_summary(samples[name]),
+            'memory': {'rss_after_mb': max((value for value in rss if value is not None), default=None)}
+        }
+    print_results(results)
+
+    if args.import_time:
+        _, stderr = run_once(('-X', 'importtime'))
+        print(f"\n导入耗时最多的模块（累计，毫秒）:")
+        for name, ms in import_time_top(stderr, args.import_time):
+            print(f"  {name:<48}{ms:>10.1f}")
+
+    params = {key: value for key, value in vars(args).items() if key not in ('output', 'work_dir')}
+    print(f"结果已保存: {save_results('startup', params, results, output)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+基准测试公共工具：隔离运行环境、并发压测、分位数统计、内存统计和结果保存
+"""
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import subprocess
+import threading
+import tracemalloc
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+def prepare_environment(work_dir, overrides=None):
+    """
+    生成独立的配置文件并切换工作目录，必须在导入 main/config 之前调用
+    默认使用 work_dir 下的 SQLite 数据库、blob 目录和日志目录，不影响本地开发数据
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    with open(os.path.join(REPO_ROOT, 'config.json'), 'r', encoding='utf-8') as f:
+        bench_config = json.load(f)
+    db_file = os.path.join(work_dir, 'bench.db')
+    bench_config['database'] = {'type': 'sqlite', 'path': db_file, 'db_path': db_file}
+    bench_config.setdefault('response_body', {})['blob_dir'] = os.path.join(work_dir, 'blobs')
+    bench_config['ldap_config'] = {}
+    bench_config.setdefault('user_config', {})['allow_registration'] = True
+    # 定时监控调度器会定期查询数据库，压测时关闭
+    bench_config.setdefault('monitor', {})['enabled'] = False
+    for key, value in (overrides or {}).items():
+        if key == 'database':
+            bench_config[key] = value
+        elif isinstance(value, dict) and isinstance(bench_config.get(key), dict):
+            bench_config[key].update(value)
+        else:
+            bench_config[key] = value
+    config_path = os.path.join(work_dir, 'config.json')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(bench_config, f, ensure_ascii=False, indent=2)
+    os.environ['XAPI_CONFIG'] = config_path
+    os.chdir(work_dir)
+    return config_path
+
+def add_database_arguments(parser):
+    """数据库相关命令行参数：默认使用 work_dir 下的 SQLite，--db postgresql 时连接本地 Postgres"""
+    parser.add_argument('--db', choices=('sqlite', 'postgresql'), default='sqlite')
+    parser.add_argument('--pg-host', default='localhost')
+    parser.add_argument('--pg-port', type=int, default=5432)
+    parser.add_argument('--pg-user', default='postgres')
+    parser.add_argument('--pg-password', default='')
+    parser.add_argument('--pg-database', default='xapi_bench')
+
+def database_overrides(args):
+    """根据命令行参数生成 prepare_environment 的 database 覆盖配置"""
+    if args.db != 'postgresql':
+        return {}
+    return {'database': {
+        'type': 'postgresql',
+        'host': args.pg_host,
+        'port': args.pg_port,
+        'username': args.pg_user,
+        'password': args.pg_password,
+        'database': args.pg_database
+    }}
+
+def percentile(sorted_values, pct):
+    """线性插值分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+def latency_summary(latencies_ms):
+    values = sorted(latencies_ms)
+    if not values:
+        return {}
+    return {
+        'min_ms': round(values[0], 3),
+        'mean_ms': round(sum(values) / len(values), 3),
+        'p50_ms': round(percentile(values, 50), 3),
+        'p90_ms': round(percentile(values, 90), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'max_ms': round(values[-1], 3)
+    }
+
+def _rss_mb():
+    """当前进程常驻内存（MB），不支持的平台返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 2)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，Linux 为 KB
+        return round(usage / 1024 / 1024 if sys.platform == 'darwin' else usage / 1024, 2)
+    except ImportError:
+        return None
+
+def run_load(task, total, concurrency=1, warmup=0, trace_memory=False, make_state=None):
+    """
+    并发执行 task(state) 共 total 次，task 返回 False 或抛出异常计为失败
+    make_state 为每个工作线程创建独立状态（如 Flask test_client）
+    """
+    local = threading.local()
+
+    def get_state():
+        if not hasattr(local, 'state'):
+            local.state = make_state() if make_state else None
+        return local.state
+
+    for _ in range(warmup):
+        task(get_state())
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def run_one(_):
+        state = get_state()
+        started_at = time.perf_counter()
+        try:
+            ok = task(state) is not False
+            error = None if ok else 'failed'
+        except Exception as e:
+            ok, error = False, f'{type(e).__name__}: {e}'
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        with lock:
+            latencies.append(elapsed_ms)
+            if not ok:
+                errors.append(error)
+
+    gc.collect()
+    rss_before = _rss_mb()
+    if trace_memory:
+        tracemalloc.start()
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run_one, range(total)))
+    duration = time.perf_counter() - started_at
+    memory = {'rss_before_mb': rss_before, 'rss_after_mb': _rss_mb()}
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory['traced_current_mb'] = round(current / 1024 / 1024, 3)
+        memory['traced_peak_mb'] = round(peak / 1024 / 1024, 3)
+
+    result = {
+        'requests': total,
+        'concurrency': concurrency,
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(total / duration, 2) if duration else None,
+        'errors': len(errors),
+        'latency': latency_summary(latencies),
+        'memory': memory
+    }
+    if errors:
+        result['error_samples'] = sorted(set(errors))[:5]
+    return result
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def save_results(name, params, results, output=None):
+    """
+    保存结果为 JSON，默认路径 benchmarks/results/<name>-<commit>-<时间>.json
+    返回写入的文件路径
+    """
+    commit = _git_commit()
+    payload = {
+        'benchmark': name,
+        'commit': commit,
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': params,
+        'results': results
+    }
+    if output is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"{name}-{commit or 'nogit'}-{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return output
+
+def print_results(results):
+    """打印结果表格"""
+    print(f"{'scenario':<28}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'errors':>8}{'rss MB':>9}")
+    for scenario, result in results.items():
+        latency = result.get('latency', {})
+        print(f"{scenario:<28}{result.get('throughput_rps') or 0:>10.1f}{latency.get('p50_ms', 0):>10.2f}"
+              f"{latency.get('p95_ms', 0):>10.2f}{latency.get('p99_ms', 0):>10.2f}{latency.get('max_ms', 0):>10.2f}"
+              f"{result.get('errors', 0):>8}{result['memory'].get('rss_after_mb') or 0:>9.1f}")
@@ -0,0 +1,61 @@
+"""
+对比两次基准测试结果
+
+    python benchmarks/compare.py baseline.json current.json --threshold 10
+
+任一场景 p95 延迟上升或吞吐量下降超过阈值（百分比）时以非 0 状态码退出，可用于 CI 回归检查
+"""
+import sys
+import json
+import argparse
+
+# 对比的指标：(名称, 取值函数, 数值越大越好)
+METRICS = (
+    ('throughput_rps', lambda r: r.get('throughput_rps'), True),
+    ('p50_ms', lambda r: r.get('latency', {}).get('p50_ms'), False),
+    ('p95_ms', lambda r: r.get('latency', {}).get('p95_ms'), False),
+    ('p99_ms', lambda r: r.get('latency', {}).get('p99_ms'), False),
+    ('rss_after_mb', lambda r: r.get('memory', {}).get('rss_after_mb'), False)
+)
+# 参与回归判断的指标
+GATED_METRICS = ('throughput_rps', 'p95_ms')
+
+def _load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def compare(baseline, current, threshold):
+    regressions = []
+    print(f"baseline: {baseline.get('commit')} ({baseline.get('created_at')})")
+    print(f"current:  {current.get('commit')} ({current.get('created_at')})")
+    print(f"{'scenario':<28}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for scenario, result in current.get('results', {}).items():
+        base_result = baseline.get('results', {}).get(scenario)
+        if base_result is None:
+            continue
+        for name, getter, higher_is_better in METRICS:
+            old, new = getter(base_result), getter(result)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            flag = ''
+            if name in GATED_METRICS and worse > threshold:
+                flag = '  !'
+                regressions.append(f'{scenario}.{name}')
+            print(f"{scenario:<28}{name:<16}{old:>12.2f}{new:>12.2f}{change:>+9.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='对比两次基准测试结果')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=10, help='回归阈值（百分比）')
+    args = parser.parse_args()
+    regressions = compare(_load(args.baseline), _load(args.current), args.threshold)
+    if regressions:
+        print(f"性能回归: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
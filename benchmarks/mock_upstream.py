@@ -0,0 +1,87 @@
+"""
+本地模拟上游服务
+
+GET/POST 任意路径返回 JSON：{"token": ..., "path": ..., "data": "xxx..."}
+查询参数 latency_ms / size 可覆盖默认延迟（毫秒）和 data 字段大小（字节）
+
+单独运行：python benchmarks/mock_upstream.py --port 18080 --latency-ms 20 --payload-bytes 4096
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query)
+        latency_ms = float(params.get('latency_ms', [self.server.latency_ms])[0])
+        size = int(params.get('size', [self.server.payload_bytes])[0])
+        if latency_ms > 0:
+            time.sleep(latency_ms / 1000)
+        body = json.dumps({'token': 'mock-token', 'path': parts.path, 'data': 'x' * size}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+    do_POST = _respond
+    do_PUT = _respond
+    do_PATCH = _respond
+    do_DELETE = _respond
+
+class MockUpstream:
+    """在后台线程运行的模拟上游服务，可作为上下文管理器使用"""
+
+    def __init__(self, latency_ms=0, payload_bytes=1024, host='127.0.0.1', port=0):
+        self.server = ThreadingHTTPServer((host, port), _MockHandler)
+        self.server.daemon_threads = True
+        self.server.latency_ms = latency_ms
+        self.server.payload_bytes = payload_bytes
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='mock-upstream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地模拟上游服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--payload-bytes', type=int, default=1024)
+    args = parser.parse_args()
+    upstream = MockUpstream(args.latency_ms, args.payload_bytes, args.host, args.port)
+    print(f'mock upstream listening on {upstream.base_url}')
+    try:
+        upstream.server.serve_forever()
+    except KeyboardInterrupt:
+        upstream.stop()
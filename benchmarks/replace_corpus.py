@@ -0,0 +1,141 @@
+"""
+util/xapi_replace.py 的测试数据生成器
+
+- build_case: 按目标大小、嵌套深度、占位符密度生成请求数据（用于基准测试）
+- generate_corpus: 按随机种子生成模糊测试语料（边界格式的占位符、缺失路径、非字典结果等）
+
+同一种子生成的数据完全相同，可用 --write 导出语料文件:
+
+    python benchmarks/replace_corpus.py --seed 1 --count 2000 --write /tmp/xapi_replace_corpus.json
+"""
+import json
+import random
+import argparse
+
+# 前置请求结果，包含嵌套路径、中文、非字符串值和非字典 body
+PRE_REQUEST_RESULTS = {
+    'global': {
+        '1': {
+            'header': {'authorization': 'Bearer global-token', 'x-request-id': 'req-001'},
+            'body': {'token': 'abc123', 'data': {'user': {'id': 7, 'name': '张三', 'tags': ['a', 'b']}, 'ok': True}}
+        },
+        '10': {'header': {}, 'body': '请求失败: timeout'}
+    },
+    'custom': {
+        '2': {
+            'header': {'set-cookie': 'sid=xyz'},
+            'body': {'session': {'id': 'sess-9', 'expires': 3600}, 'empty': '', 'none': None}
+        }
+    }
+}
+
+VALID_PLACEHOLDERS = (
+    '$xapi.global.1.body.token',
+    '$xapi.global.1.body.data.user.id',
+    '$xapi.global.1.body.data.user.name',
+    '$xapi.global.1.body.data.user.tags',
+    '$xapi.global.1.body.data.ok',
+    '$xapi.global.1.header.authorization',
+    '$xapi.custom.2.body.session.id',
+    '$xapi.custom.2.body.empty',
+    '$xapi.custom.2.body.none',
+    '$xapi.custom.2.header.set-cookie'
+)
+
+MISSING_PLACEHOLDERS = (
+    '$xapi.global.1.body.missing',
+    '$xapi.global.1.body.data.user.id.deeper',
+    '$xapi.global.10.body.token',
+    '$xapi.global.99.body.token',
+    '$xapi.custom.3.header.authorization',
+    '$xapi.global.1.body.token.',
+    '$xapi.custom.2.body..session'
+)
+
+# 模糊测试用的片段，随机拼接出接近/不符合占位符格式的字符串
+FUZZ_FRAGMENTS = (
+    '$xapi', '$', 'xapi', '.global', '.custom', '.other', '.1', '.2', '.10', '.99', '.01', '.-1',
+    '.body', '.header', '.token', '.data', '.user', '.name', '.id', '.session', '.', '..', '_',
+    ' ', '中文', '\n', '\\', '"', '{', '}', 'abc', '$$', '$xapi.global.1.body.token', '%24xapi'
+)
+
+_WORDS = ('alpha', 'beta', 'gamma', 'delta', 'order', 'user', 'value', '测试', '数据', 'id', 'name', 'status')
+
+def _text(rng, length=40):
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)
+
+def _leaf(rng, density):
+    roll = rng.random()
+    if roll < density:
+        placeholder = rng.choice(VALID_PLACEHOLDERS if rng.random() < 0.8 else MISSING_PLACEHOLDERS)
+        if rng.random() < 0.5:
+            return placeholder
+        return f'{_text(rng, 12)} {placeholder} {_text(rng, 12)}'
+    if roll < density + 0.05:
+        return rng.choice((rng.randint(-1000, 100000), rng.random(), True, False, None))
+    return _text(rng)
+
+def build_case(size_bytes, depth=1, density=0.01, seed=0, leaves_per_record=8):
+    """
+    生成约 size_bytes 大小（JSON 序列化后）的请求数据
+    depth 为每条记录的嵌套层数（字典和列表交替），density 为字符串叶子中含占位符的比例
+    """
+    rng = random.Random(seed)
+    record_bytes = leaves_per_record * 56 + depth * 10
+    records = max(1, size_bytes // record_bytes)
+    items = []
+    for _ in range(records):
+        node = {f'f{index}': _leaf(rng, density) for index in range(leaves_per_record)}
+        for level in range(depth - 1):
+            node = {f'n{level}': node} if level % 2 == 0 else [node]
+        items.append(node)
+    return {'items': items}
+
+def _fuzz_string(rng):
+    return ''.join(rng.choice(FUZZ_FRAGMENTS) for _ in range(rng.randint(1, 12)))
+
+def _fuzz_value(rng, depth):
+    roll = rng.random()
+    if depth > 0 and roll < 0.25:
+        return {_fuzz_string(rng) if rng.random() < 0.2 else f'k{index}': _fuzz_value(rng, depth - 1)
+                for index in range(rng.randint(0, 5))}
+    if depth > 0 and roll < 0.4:
+        return [_fuzz_value(rng, depth - 1) for _ in range(rng.randint(0, 5))]
+    if roll < 0.5:
+        return rng.choice((0, -1, 3.5, True, False, None, ''))
+    if roll < 0.75:
+        return rng.choice(VALID_PLACEHOLDERS + MISSING_PLACEHOLDERS) + rng.choice(('', '.', ' ', 'x', '$xapi'))
+    return _fuzz_string(rng)
+
+def generate_corpus(seed=1, count=1000, max_depth=12):
+    """生成模糊测试语料：[{"data": ..., "pre_request_results": ...}]"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        data = _fuzz_value(rng, rng.randint(0, max_depth))
+        results = PRE_REQUEST_RESULTS if rng.random() < 0.9 else rng.choice(({}, {'global': {}}, {'custom': {'2': {}}}))
+        corpus.append({'data': data, 'pre_request_results': results})
+    # 深层嵌套和超长字符串
+    deep = 'leaf $xapi.global.1.body.token'
+    for level in range(200):
+        deep = {'n': deep} if level % 2 == 0 else [deep]
+    corpus.append({'data': deep, 'pre_request_results': PRE_REQUEST_RESULTS})
+    corpus.append({'data': '$xapi.global.1.body.token' * 2000, 'pre_request_results': PRE_REQUEST_RESULTS})
+    corpus.append({'data': '$' * 50000 + 'xapi.global.1.body.token', 'pre_request_results': PRE_REQUEST_RESULTS})
+    return corpus
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='生成 xapi_replace 模糊测试语料')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--write', required=True, help='输出文件路径')
+    args = parser.parse_args()
+    with open(args.write, 'w', encoding='utf-8') as f:
+        json.dump(generate_corpus(args.seed, args.count), f, ensure_ascii=False)
+    print(f'语料已写入: {args.write}')
@@ -0,0 +1,224 @@
+"""
+生成生产规模的测试数据库
+
+按参数批量写入用户、项目、成员权限、请求、项目-请求关联、全局前置请求配置、环境变量和历史记录，
+历史记录的响应体大小服从对数正态分布（均值约 --payload-bytes），时间戳分布在最近 90 天内。
+
+    python benchmarks/seed_db.py --projects 50 --requests-per-project 100 --history-per-request 400   # 200 万条历史
+    python benchmarks/seed_db.py --db postgresql --pg-database xapi_bench ...
+
+默认写入 <临时目录>/xapi-bench-db/bench.db，bench_db.py 使用相同的 --work-dir 即可读取。
+所有用户的密码均为 bench-pass，管理员为 admin。
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import prepare_environment, add_database_arguments, database_overrides
+
+DEFAULT_WORK_DIR = os.path.join(tempfile.gettempdir(), 'xapi-bench-db')
+SEED_PASSWORD = 'bench-pass'
+RESOURCES = ('orders', 'users', 'products', 'payments', 'inventory', 'reports', 'coupons', 'shipments')
+METHODS = ('GET', 'GET', 'GET', 'POST', 'PUT', 'DELETE', 'PATCH')
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def _payload(rng, mean_bytes):
+    """对数正态分布大小的 JSON 响应体"""
+    size = max(16, int(rng.lognormvariate(math.log(mean_bytes) - 0.5, 1.0)))
+    item = {'id': rng.randint(1, 10 ** 6), 'name': 'item', 'price': round(rng.random() * 100, 2), 'tags': ['a', 'b']}
+    item_bytes = len(json.dumps(item))
+    return json.dumps({'code': 0, 'message': 'success', 'data': {'items': [item] * max(1, size // item_bytes)}})
+
+class Seeder:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.now = datetime.now()
+        from db_orm import db_manager
+        self.engine = db_manager.engine
+
+    def insert(self, table, rows):
+        """按批次插入，返回插入行数"""
+        batch_size = self.args.batch_size
+        for start in range(0, len(rows), batch_size):
+            with self.engine.begin() as conn:
+                conn.execute(table.insert(), rows[start:start + batch_size])
+        return len(rows)
+
+    def ids(self, table):
+        with self.engine.connect() as conn:
+            return [row[0] for row in conn.execute(table.select().with_only_columns([table.c.id]).order_by(table.c.id))]
+
+    def run(self):
+        from model.models import (
+            User, Project, UserProjectPermission, ProjectRequestRelation, RequestInfo,
+            RequestHistory, AdvancedConfig, ProjectEnv
+        )
+        args, rng = self.args, self.rng
+        created_at = _timestamp(self.now - timedelta(days=90))
+        tag = str(int(time.time()))
+
+        # 用户
+        users = [{'username': 'admin', 'password': SEED_PASSWORD, 'role': 'admin', 'created_at': created_at}]
+        users += [{'username': f'user{index}', 'password': SEED_PASSWORD, 'role': 'user', 'created_at': created_at}
+                  for index in range(1, args.users + 1)]
+        existing = {row for row in self._usernames(User)}
+        self.insert(User.__table__, [user for user in users if user['username'] not in existing])
+        user_rows = self._users(User)
+        user_ids = [user_id for user_id, username in user_rows if username != 'admin']
+        usernames = dict(user_rows)
+
+        # 项目和成员
+        project_start = max(self.ids(Project.__table__) or [0])
+        self.insert(Project.__table__, [{
+            'name': f'bench-{tag}-{index}', 'description': f'benchmark project {index}',
+            'created_by': rng.choice(user_ids), 'created_at': created_at, 'updated_at': created_at, 'status': 'active'
+        } for index in range(args.projects)])
+        project_ids = [project_id for project_id in self.ids(Project.__table__) if project_id > project_start]
+
+        permissions = []
+        members = {}
+        for project_id in project_ids:
+            chosen = rng.sample(user_ids, min(args.members_per_project, len(user_ids)))
+            members[project_id] = chosen
+            for position, user_id in enumerate(chosen):
+                level = 'owner' if position == 0 else rng.choice(('read', 'write', 'write'))
+                permissions.append({'user_id': user_id, 'project_id': project_id, 'permission_level': level,
+                                    'granted_by': chosen[0], 'granted_at': created_at})
+        self.insert(UserProjectPermission.__table__, permissions)
+
+        # 请求和项目关联
+        request_start = max(self.ids(RequestInfo.__table__) or [0])
+        requests = []
+        for project_id in project_ids:
+            for index in range(args.requests_per_project):
+                resource = rng.choice(RESOURCES)
+                requests.append({
+                    'timestamp': created_at,
+                    'url': f'https://api.example.com/v1/{resource}/{index}?project={project_id}',
+                    'method': rng.choice(METHODS),
+                    'headers': json.dumps({'Content-Type': 'application/json', 'Authorization': 'Bearer $xapi.global.1.body.token'}),
+                    'body': json.dumps({'resource': resource, 'page': index, 'filters': {'status': 'active'}}),
+                    'query': json.dumps({'page': '1', 'size': '20'}),
+                    'auth': '{}',
+                    'request_name': f'{resource}-{tag}-{project_id}-{index}',
+                    'is_deleted': 0
+                })
+        self.insert(RequestInfo.__table__, requests)
+        request_ids = [request_id for request_id in self.ids(RequestInfo.__table__) if request_id > request_start]
+        request_of = dict(zip(request_ids, requests))
+        relations = []
+        project_of = {}
+        for position, request_id in enumerate(request_ids):
+            project_id = project_ids[position // args.requests_per_project]
+            project_of[request_id] = project_id
+            relations.append({'project_id': project_id, 'request_info_id': request_id, 'created_at': created_at})
+        self.insert(ProjectRequestRelation.__table__, relations)
+
+        # 全局前置请求配置和环境变量
+        self.insert(AdvancedConfig.__table__, [{
+            'project_id': project_id, 'request_info_id': request_ids[position * args.requests_per_project],
+            'is_global': 1, 'body_info': '{}', 'query_info': '{}', 'created_at': created_at, 'updated_at': created_at
+        } for position, project_id in enumerate(project_ids) if args.requests_per_project])
+        self.insert(ProjectEnv.__table__, [{
+            'project_id': project_id, 'env': json.dumps({'host': 'https://api.example.com', 'timeout': 30}),
+            'created_at': created_at, 'updated_at': created_at
+        } for project_id in project_ids])
+
+        # 历史记录，按批生成避免一次性占用大量内存
+        total_history = len(request_ids) * args.history_per_request
+        inserted = 0
+        batch = []
+        span_seconds = 90 * 24 * 3600
+        started_at = time.time()
+        for position in range(total_history):
+            request_id = request_ids[position % len(request_ids)]
+            status = 200 if rng.random() < 0.92 else rng.choice((400, 401, 404, 500, 502))
+            moment = self.now - timedelta(seconds=span_seconds * (1 - position / max(total_history, 1)))
+            batch.append({
+                'request_info_id': request_id,
+                'timestamp': _timestamp(moment),
+                'url': request_of[request_id]['url'],
+                'method': request_of[request_id]['method'],
+                'auth': '{}',
+                'request_name': request_of[request_id]['request_name'],
+                'request_headers': '{"Content-Type": "application/json"}',
+                'request_body': '{}',
+                'response_status': status,
+                'response_headers': '{"Content-Type": "application/json"}',
+                'response_body': _payload(rng, args.payload_bytes),
+                'response_time': int(rng.lognormvariate(4, 0.8)),
+                'execution_status': '成功' if status < 400 else '失败',
+                'execution_message': f'HTTP {status}',
+                'execution_details': json.dumps({'statusCode': status}),
+                'query': '{}',
+                'pre_request_results': '{}',
+                'username': usernames.get(rng.choice(members[project_of[request_id]]))
+            })
+            if len(batch) >= args.batch_size:
+                inserted += self.insert(RequestHistory.__table__, batch)
+                batch = []
+                self._progress(inserted, total_history, started_at)
+        if batch:
+            inserted += self.insert(RequestHistory.__table__, batch)
+            self._progress(inserted, total_history, started_at)
+
+        return {
+            'users': len(user_ids) + 1,
+            'projects': len(project_ids),
+            'permissions': len(permissions),
+            'requests': len(request_ids),
+            'history': inserted
+        }
+
+    def _usernames(self, user_model):
+        with self.engine.connect() as conn:
+            return [row[0] for row in conn.execute(user_model.__table__.select().with_only_columns([user_model.__table__.c.username]))]
+
+    def _users(self, user_model):
+        table = user_model.__table__
+        with self.engine.connect() as conn:
+            return [(row[0], row[1]) for row in conn.execute(table.select().with_only_columns([table.c.id, table.c.username]))]
+
+    @staticmethod
+    def _progress(done, total, started_at):
+        elapsed = time.time() - started_at
+        rate = done / elapsed if elapsed else 0
+        print(f"\r历史记录 {done}/{total} ({rate:.0f} 行/秒)", end='', flush=True)
+        if done >= total:
+            print()
+
+def main():
+    parser = argparse.ArgumentParser(description='生成 xapi 测试数据库')
+    parser.add_argument('--projects', type=int, default=20)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--members-per-project', type=int, default=10)
+    parser.add_argument('--requests-per-project', type=int, default=50)
+    parser.add_argument('--history-per-request', type=int, default=100)
+    parser.add_argument('--payload-bytes', type=int, default=2048, help='历史记录响应体平均大小')
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help='SQLite 数据库和日志目录')
+    add_database_arguments(parser)
+    args = parser.parse_args()
+    if args.users < 1 or args.projects < 1:
+        parser.error('--users 和 --projects 至少为 1')
+
+    prepare_environment(args.work_dir, database_overrides(args))
+    from db_orm import init_db
+    init_db()
+    started_at = time.time()
+    counts = Seeder(args).run()
+    print(f"写入完成，用时 {time.time() - started_at:.1f}s: {json.dumps(counts, ensure_ascii=False)}")
+
+if __name__ == '__main__':
+    main()
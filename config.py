@@ -1,17 +1,66 @@
 import json
 import os
-from typing import Dict, Any
+import threading
+from types import MappingProxyType
+from typing import Dict, Any, Callable, Iterable
+
+# 配置文件变更检查默认参数
+DEFAULT_RELOAD_OPTIONS = {
+    'enabled': True,
+    'interval': 2       # 检查配置文件修改时间的间隔（秒）
+}
+
+def _flatten(data, prefix='', result=None):
+    """把嵌套字典展开为 {'a': {...}, 'a.b': ..., 'a.b.c': ...}，查询时不必逐级拆分路径"""
+    if result is None:
+        result = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        result[path] = value
+        if isinstance(value, dict):
+            _flatten(value, f"{path}.", result)
+    return result
+
+class ConfigState:
+    """一次加载的配置快照，加载完成后不再修改，重新加载时整体替换"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.flat = _flatten(data)
+        self.ldap_config = data.get('ldap_config', {})
+        self.redis_config = data.get('redis_config', {})
+        self.jwt_config = data.get('jwt_config', {})
+        self.user_config = data.get('user_config', {})
+        self.database_config = data.get('database', {})
+        self.jwt_secret_key = self.jwt_config.get('secret_key', 'default-secret-key')
+        self.admin_users = frozenset(self.user_config.get('admin_users', []))
+        db_name = self.flat.get('database.db_path', 'api_tester.db')
+        # 如果是相对路径，则相对于项目根目录
+        if not os.path.isabs(db_name):
+            db_name = os.path.join(os.path.dirname(os.path.abspath(__file__)), db_name)
+        self.db_path = db_name
+        # (配置段, 默认值) -> 合并后的只读配置
+        self.sections = {}
 
 class Config:
-    """配置管理类"""
-    
+    """
+    配置管理类
+    配置加载后预先展开为扁平索引和常用配置段，文件修改后整体替换快照并通知订阅者，不需要重启服务
+    """
+
     def __init__(self, config_file: str = None):
         if config_file is None:
-            config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
-        
+            # 环境变量 XAPI_CONFIG 可指定其他配置文件（如压测、基准测试使用独立数据库）
+            config_file = os.environ.get('XAPI_CONFIG') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+
         self.config_file = config_file
-        self._config = self._load_config()
-    
+        # 最近一次检查到的配置文件（修改时间, 大小），加载失败时也更新，避免反复加载同一个不完整的文件
+        self._seen_mtime = self._file_mtime()
+        self._state = ConfigState(self._load_config())
+        self._subscribers = []
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+
     def _load_config(self) -> Dict[str, Any]:
         """加载配置文件"""
         try:
@@ -21,75 +70,159 @@ class Config:
             raise FileNotFoundError(f"配置文件未找到: {self.config_file}")
         except json.JSONDecodeError as e:
             raise ValueError(f"配置文件格式错误: {e}")
-    
+
+    def _file_mtime(self):
+        try:
+            stat = os.stat(self.config_file)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
     def get(self, key: str, default=None):
-        """获取配置项"""
-        keys = key.split('.')
-        value = self._config
-        
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
-        
-        return value
-    
+        """获取配置项，key 为点分路径，如 database.type"""
+        return self._state.flat.get(key, default)
+
+    def section(self, name: str, defaults: Dict[str, Any]) -> MappingProxyType:
+        """
+        获取合并了默认值的配置段（只读），同一快照内只合并一次
+        defaults 应为模块级常量，按对象区分缓存
+        """
+        state = self._state
+        key = (name, id(defaults))
+        options = state.sections.get(key)
+        if options is None:
+            merged = dict(defaults)
+            merged.update(state.flat.get(name) or {})
+            options = state.sections[key] = MappingProxyType(merged)
+        return options
+
     @property
     def ldap_config(self) -> Dict[str, Any]:
         """获取LDAP配置"""
-        return self.get('ldap_config', {})
-    
+        return self._state.ldap_config
+
     @property
     def redis_config(self) -> Dict[str, Any]:
         """获取Redis配置"""
-        return self.get('redis_config', {})
-    
+        return self._state.redis_config
+
     @property
     def jwt_config(self) -> Dict[str, Any]:
         """获取JWT配置"""
-        return self.get('jwt_config', {})
-    
+        return self._state.jwt_config
+
+    @property
+    def jwt_secret_key(self) -> str:
+        """获取JWT签名密钥"""
+        return self._state.jwt_secret_key
+
     @property
     def user_config(self) -> Dict[str, Any]:
         """获取用户配置"""
-        return self.get('user_config', {})
-    
+        return self._state.user_config
+
     def is_registration_allowed(self) -> bool:
         """检查是否允许注册"""
         return self.user_config.get('allow_registration', True)
-    
+
     def is_admin_user(self, username: str) -> bool:
         """检查用户是否为管理员"""
-        admin_users = self.user_config.get('admin_users', [])
-        return username in admin_users
-    
+        return username in self._state.admin_users
+
     def get_default_role(self) -> str:
         """获取默认用户角色"""
         return self.user_config.get('default_role', 'user')
-    
+
     def get_database_config(self) -> Dict[str, Any]:
         """获取数据库配置"""
-        return self.get('database', {})
-    
+        return self._state.database_config
+
     @property
     def db_path(self) -> str:
         """获取数据库路径"""
-        db_name = self.get('database.db_path', 'api_tester.db')
-        # 如果是相对路径，则相对于项目根目录
-        if not os.path.isabs(db_name):
-            return os.path.join(os.path.dirname(os.path.abspath(__file__)), db_name)
-        return db_name
-    
-    def reload(self):
-        """重新加载配置文件"""
-        self._config = self._load_config()
+        return self._state.db_path
+
+    def subscribe(self, callback: Callable[[frozenset], None], sections: Iterable[str] = ()):
+        """
+        订阅配置变更，重新加载后以发生变化的顶层配置段集合调用 callback
+        指定 sections 时只在这些配置段变化时调用
+        """
+        self._subscribers.append((callback, frozenset(sections)))
+        return callback
+
+    def reload(self) -> frozenset:
+        """
+        重新加载配置文件并通知订阅者，返回发生变化的顶层配置段
+        文件格式错误时保留原配置并抛出异常
+        """
+        with self._reload_lock:
+            self._seen_mtime = self._file_mtime()
+            old_state = self._state
+            new_state = ConfigState(self._load_config())
+            keys = set(old_state.data) | set(new_state.data)
+            changed = frozenset(key for key in keys if old_state.data.get(key) != new_state.data.get(key))
+            self._state = new_state
+        if changed:
+            _refresh_module_values()
+            self._notify(changed)
+        return changed
+
+    def _notify(self, changed):
+        from log_base import MyLog
+        log = MyLog().my_logger()
+        log.info(f"配置已重新加载 - 变化的配置段: {sorted(changed)}")
+        for callback, sections in list(self._subscribers):
+            if sections and not (sections & changed):
+                continue
+            try:
+                callback(changed)
+            except Exception as e:
+                log.error(f"配置变更通知失败 - {getattr(callback, '__name__', callback)}: {e}")
+
+    def check_for_changes(self) -> frozenset:
+        """配置文件修改时间或大小变化时重新加载"""
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self._seen_mtime:
+            return frozenset()
+        try:
+            return self.reload()
+        except (ValueError, FileNotFoundError) as e:
+            # 编辑器写入过程中可能读到不完整的文件，记录本次修改时间，等下一次修改后再加载
+            self._seen_mtime = mtime
+            from log_base import MyLog
+            MyLog().my_logger().error(f"配置文件重新加载失败，继续使用原配置: {e}")
+            return frozenset()
+
+    def start_watching(self):
+        """按 config_reload 配置启动后台线程检查配置文件变化（进程内只启动一次）"""
+        options = self.section('config_reload', DEFAULT_RELOAD_OPTIONS)
+        if not options['enabled'] or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._watcher = threading.Thread(target=self._watch, name='xapi-config-watcher', daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        stop = threading.Event()
+        while not stop.wait(self.section('config_reload', DEFAULT_RELOAD_OPTIONS)['interval']):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                from log_base import MyLog
+                MyLog().my_logger().error(f"检查配置文件变化失败: {e}")
 
 # 全局配置实例
 config = Config()
 
+def _refresh_module_values():
+    """重新加载后同步更新下面的兼容变量（通过 from config import XXX 导入的副本不会更新，应改用 config 实例）"""
+    global LDAP_CONFIG, REDIS_CONFIG, DB_PATH, JWT_SECRET_KEY
+    LDAP_CONFIG = config.ldap_config
+    REDIS_CONFIG = config.redis_config
+    DB_PATH = config.db_path
+    JWT_SECRET_KEY = config.jwt_secret_key
+
 # 为了向后兼容，提供直接访问的变量
 LDAP_CONFIG = config.ldap_config
 REDIS_CONFIG = config.redis_config
 DB_PATH = config.db_path
-JWT_SECRET_KEY = config.jwt_config.get('secret_key', 'default-secret-key')
\ No newline at end of file
+JWT_SECRET_KEY = config.jwt_secret_key
@@ -1,88 +1,585 @@
-from sqlalchemy import create_engine, and_, or_, desc
+from sqlalchemy import create_engine, event, text, and_, or_, desc, func
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.exc import IntegrityError
+from flask import has_request_context, g, request, jsonify
 import json
 import os
+import threading
+import math
+import time
 from datetime import datetime
 from log_base import MyLog
 from config import config
+from util import xapi_json
+from util.xapi_json import RawJSON
+from util.xapi_access_log import add_db_time
+from util.xapi_metrics import track_db_function, observe_db_query
+from util.xapi_histogram import merge_results
 from model.models import (
     Base, RequestInfo, RequestHistory, User, Project, 
     UserProjectPermission, ProjectRequestRelation,
-    AdvancedConfig, ProjectEnv
+    AdvancedConfig, ProjectEnv, MonitorJob, MonitorRun,
+    ProjectVersion, ProjectRequestChange,
+    LoadWorker, LoadJob, LoadShard, BackgroundJob
 )
 
 log = MyLog().my_logger()
 
+# 连接池默认参数（仅对 mysql/postgresql 生效）
+DEFAULT_POOL_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 30,
+    'pool_recycle': 1800,
+    'pool_pre_ping': True
+}
+
+# 写入后读请求回到主库的时间窗口（秒），用于规避从库复制延迟
+DEFAULT_REPLICA_LAG_SECONDS = 5
+# 记录最近一次写入时间的 cookie，多 worker 部署时下一个请求落到其他进程也能读主库
+LAST_WRITE_COOKIE = 'xapi_last_write'
+
+# SQLite FTS5 全文索引（外部内容表 + 触发器增量维护）
+# 使用 trigram 分词：中文和 camelCase 名称没有分词边界，按三字符片段索引才能匹配任意子串（与 LIKE 一致）
+SQLITE_FTS_TOKENIZER = 'trigram'
+# trigram 索引无法匹配少于 3 个字符的词，这类查询使用 LIKE
+SQLITE_FTS_MIN_TERM_LENGTH = 3
+SQLITE_SEARCH_INDEX_DDL = {
+    'request_info_fts': [
+        "CREATE VIRTUAL TABLE request_info_fts USING fts5(url, request_name, body, content='request_info', content_rowid='id', "
+        f"tokenize='{SQLITE_FTS_TOKENIZER}')",
+        """CREATE TRIGGER IF NOT EXISTS request_info_fts_ai AFTER INSERT ON request_info BEGIN
+            INSERT INTO request_info_fts(rowid, url, request_name, body) VALUES (new.id, new.url, new.request_name, new.body);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS request_info_fts_ad AFTER DELETE ON request_info BEGIN
+            INSERT INTO request_info_fts(request_info_fts, rowid, url, request_name, body) VALUES ('delete', old.id, old.url, old.request_name, old.body);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS request_info_fts_au AFTER UPDATE OF url, request_name, body ON request_info BEGIN
+            INSERT INTO request_info_fts(request_info_fts, rowid, url, request_name, body) VALUES ('delete', old.id, old.url, old.request_name, old.body);
+            INSERT INTO request_info_fts(rowid, url, request_name, body) VALUES (new.id, new.url, new.request_name, new.body);
+        END""",
+    ],
+    'request_history_fts': [
+        "CREATE VIRTUAL TABLE request_history_fts USING fts5(url, response_body, content='request_history', content_rowid='id', "
+        f"tokenize='{SQLITE_FTS_TOKENIZER}')",
+        """CREATE TRIGGER IF NOT EXISTS request_history_fts_ai AFTER INSERT ON request_history BEGIN
+            INSERT INTO request_history_fts(rowid, url, response_body) VALUES (new.id, new.url, new.response_body);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS request_history_fts_ad AFTER DELETE ON request_history BEGIN
+            INSERT INTO request_history_fts(request_history_fts, rowid, url, response_body) VALUES ('delete', old.id, old.url, old.response_body);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS request_history_fts_au AFTER UPDATE OF url, response_body ON request_history BEGIN
+            INSERT INTO request_history_fts(request_history_fts, rowid, url, response_body) VALUES ('delete', old.id, old.url, old.response_body);
+            INSERT INTO request_history_fts(rowid, url, response_body) VALUES (new.id, new.url, new.response_body);
+        END""",
+    ]
+}
+
+# PostgreSQL 表达式 GIN 索引，写入时由数据库增量维护
+POSTGRESQL_SEARCH_VECTORS = {
+    'request_info': "to_tsvector('simple', coalesce(url, '') || ' ' || coalesce(request_name, '') || ' ' || coalesce(body, ''))",
+    'request_history': "to_tsvector('simple', coalesce(url, '') || ' ' || coalesce(response_body, ''))"
+}
+
 class DatabaseManager:
-    """数据库管理器"""
+    """
+    数据库管理器
+    引擎和连接池在第一次访问数据库时创建，导入模块时不连接数据库；表结构由 init_db() 显式初始化
+    """
     
     def __init__(self):
-        self.engine = None
-        self.Session = None
+        self._engine = None
+        self._Session = None
         self.session = None
-        self._init_database()
+        # 只读从库（可选）
+        self._read_engine = None
+        self._ReadSession = None
+        self.replica_lag_seconds = DEFAULT_REPLICA_LAG_SECONDS
+        self._last_write_at = {}
+        self._search_backend = None
+        self._init_lock = threading.RLock()
+        self._pool_lock = threading.Lock()
+        self._pool_stats = self._new_pool_stats()
+        self._read_pool_stats = self._new_pool_stats()
+    
+    @property
+    def initialized(self):
+        return self._engine is not None
+    
+    def _ensure_initialized(self):
+        if self._engine is None:
+            with self._init_lock:
+                if self._engine is None:
+                    self._init_database()
+    
+    @property
+    def engine(self):
+        self._ensure_initialized()
+        return self._engine
+    
+    @property
+    def Session(self):
+        self._ensure_initialized()
+        return self._Session
+    
+    @property
+    def read_engine(self):
+        self._ensure_initialized()
+        return self._read_engine
+    
+    @property
+    def ReadSession(self):
+        self._ensure_initialized()
+        return self._ReadSession
+    
+    @property
+    def search_backend(self):
+        """全文搜索方式，第一次使用时按数据库中是否已建立全文索引判断"""
+        if self._search_backend is None:
+            self._search_backend = self._detect_search_backend()
+        return self._search_backend
+    
+    @staticmethod
+    def _new_pool_stats():
+        return {
+            'connects': 0,
+            'checkouts': 0,
+            'checkins': 0,
+            'invalidations': 0,
+            'checked_out': 0,
+            'peak_checked_out': 0
+        }
+    
+    def _build_database_url(self, db_config):
+        """根据配置构建数据库连接URL"""
+        db_type = db_config.get('type', 'sqlite')
+        
+        if db_type == 'sqlite':
+            db_path = db_config.get('path', 'api_tester.db')
+            return f'sqlite:///{db_path}'
+        elif db_type == 'mysql':
+            host = db_config.get('host', 'localhost')
+            port = db_config.get('port', 3306)
+            username = db_config.get('username', 'root')
+            password = db_config.get('password', '')
+            database = db_config.get('database', 'api_tester')
+            return f'mysql+pymysql://{username}:{password}@{host}:{port}/{database}'
+        elif db_type == 'postgresql':
+            host = db_config.get('host', 'localhost')
+            port = db_config.get('port', 5432)
+            username = db_config.get('username', 'postgres')
+            password = db_config.get('password', '')
+            database = db_config.get('database', 'api_tester')
+            return f'postgresql://{username}:{password}@{host}:{port}/{database}'
+        else:
+            raise ValueError(f"Unsupported database type: {db_type}")
+    
+    def _build_engine_options(self, db_config):
+        """
+        根据配置构建 create_engine 参数
+        statement_timeout 单位为毫秒，sqlite 下作为锁等待超时使用
+        """
+        db_type = db_config.get('type', 'sqlite')
+        statement_timeout = db_config.get('statement_timeout')
+        options = {'echo': False}
+        connect_args = {}
+        
+        if db_type == 'sqlite':
+            # sqlite 文件库使用 NullPool，连接池参数不适用
+            if statement_timeout:
+                connect_args['timeout'] = statement_timeout / 1000.0
+        else:
+            for key, default in DEFAULT_POOL_OPTIONS.items():
+                options[key] = db_config.get(key, default)
+            if statement_timeout:
+                if db_type == 'mysql':
+                    connect_args['init_command'] = f"SET SESSION max_execution_time={int(statement_timeout)}"
+                elif db_type == 'postgresql':
+                    connect_args['options'] = f"-c statement_timeout={int(statement_timeout)}"
+        
+        if connect_args:
+            options['connect_args'] = connect_args
+        return options
+    
+    def _create_engine(self, db_config, stats):
+        engine = create_engine(self._build_database_url(db_config), **self._build_engine_options(db_config))
+        self._register_pool_events(engine, stats)
+        self._register_query_timing(engine)
+        return engine
+    
+    @staticmethod
+    def _read_config(db_config):
+        """只读从库配置，未单独配置的连接项沿用主库配置；未配置从库时返回 None"""
+        replica_config = db_config.get('replica')
+        if not replica_config:
+            return None
+        read_config = {k: v for k, v in db_config.items() if k != 'replica'}
+        read_config.update(replica_config)
+        return read_config
+    
+    def init_schema(self, engine=None):
+        """创建所有表和索引，回填项目版本号（已存在的表和索引跳过），engine 默认为当前主库引擎"""
+        engine = engine or self.engine
+        Base.metadata.create_all(engine)
+        search_backend = self._init_search_index(engine)
+        if engine is self._engine:
+            self._search_backend = search_backend
+        self._init_project_versions(engine)
     
     def _init_database(self):
-        """初始化数据库连接"""
+        """创建数据库引擎和会话工厂，引擎最后赋值，其他线程看到引擎时会话工厂已就绪"""
         try:
             # 从配置获取数据库连接信息
             db_config = config.get_database_config()
             db_type = db_config.get('type', 'sqlite')
             
-            if db_type == 'sqlite':
-                db_path = db_config.get('path', 'api_tester.db')
-                database_url = f'sqlite:///{db_path}'
-            elif db_type == 'mysql':
-                host = db_config.get('host', 'localhost')
-                port = db_config.get('port', 3306)
-                username = db_config.get('username', 'root')
-                password = db_config.get('password', '')
-                database = db_config.get('database', 'api_tester')
-                database_url = f'mysql+pymysql://{username}:{password}@{host}:{port}/{database}'
-            elif db_type == 'postgresql':
-                host = db_config.get('host', 'localhost')
-                port = db_config.get('port', 5432)
-                username = db_config.get('username', 'postgres')
-                password = db_config.get('password', '')
-                database = db_config.get('database', 'api_tester')
-                database_url = f'postgresql://{username}:{password}@{host}:{port}/{database}'
-            else:
-                raise ValueError(f"Unsupported database type: {db_type}")
-            
-            self.engine = create_engine(database_url, echo=False)
-            self.Session = scoped_session(sessionmaker(bind=self.engine))
+            engine = self._create_engine(db_config, self._pool_stats)
+            self._Session = scoped_session(sessionmaker(bind=engine))
             
-            # 创建所有表
-            Base.metadata.create_all(self.engine)
+            read_config = self._read_config(db_config)
+            if read_config:
+                self._read_engine = self._create_engine(read_config, self._read_pool_stats)
+                self._ReadSession = scoped_session(sessionmaker(bind=self._read_engine))
+                self.replica_lag_seconds = db_config.get('replica_lag_seconds', DEFAULT_REPLICA_LAG_SECONDS)
+                log.info(f"Read replica enabled with {read_config.get('type', 'sqlite')}")
+            self._engine = engine
             
-            log.info(f"Database initialized successfully with {db_type}")
+            log.info(f"Database engine created with {db_type}")
+            # 兼容旧的部署方式：配置 auto_init_schema 时在第一次连接数据库时初始化表结构
+            if db_config.get('auto_init_schema', False):
+                self.init_schema()
             
         except Exception as e:
             log.error(f"Database initialization failed: {e}")
             raise
     
+    def reconfigure(self, changed=None):
+        """
+        数据库配置变化后按新配置重建连接池
+        新引擎先验证能连接（切换数据库时先建好表结构），成功后会话工厂才改为绑定新引擎，旧连接池中的空闲连接随后关闭；
+        验证失败时丢弃新引擎，继续使用旧引擎
+        """
+        if self._engine is None:
+            # 尚未连接过数据库，第一次使用时会按新配置创建
+            return
+        db_config = config.get_database_config()
+        old_engine, old_read_engine = self._engine, self._read_engine
+        new_engine = new_read_engine = None
+        try:
+            new_engine = self._create_engine(db_config, self._pool_stats)
+            read_config = self._read_config(db_config)
+            new_read_engine = self._create_engine(read_config, self._read_pool_stats) if read_config else None
+            for engine in (new_engine, new_read_engine):
+                if engine is not None:
+                    with engine.connect() as conn:
+                        conn.execute(text("SELECT 1"))
+            if str(new_engine.url) != str(old_engine.url):
+                # 切换到新的数据库时确保表结构存在
+                self.init_schema(new_engine)
+        except Exception as e:
+            for engine in (new_engine, new_read_engine):
+                if engine is not None:
+                    engine.dispose()
+            log.error(f"Database reconfiguration failed, keeping current connection pool: {e}")
+            return
+        
+        with self._init_lock:
+            self._Session.configure(bind=new_engine)
+            self._engine = new_engine
+            self._search_backend = None
+            if new_read_engine is None:
+                self._read_engine = None
+                self._ReadSession = None
+            else:
+                self._read_engine = new_read_engine
+                if self._ReadSession is None:
+                    self._ReadSession = scoped_session(sessionmaker(bind=new_read_engine))
+                else:
+                    self._ReadSession.configure(bind=new_read_engine)
+            self.replica_lag_seconds = db_config.get('replica_lag_seconds', DEFAULT_REPLICA_LAG_SECONDS)
+        
+        old_engine.dispose()
+        if old_read_engine is not None:
+            old_read_engine.dispose()
+        log.info(f"Database connection pool reconfigured with {db_config.get('type', 'sqlite')}"
+                 f"{', read replica enabled' if new_read_engine is not None else ''}")
+    
+    def _init_project_versions(self, engine):
+        """为还没有版本号的项目补充版本记录（版本号从 1 开始）"""
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "INSERT INTO project_versions (project_id, version) SELECT id, 1 FROM projects "
+                    "WHERE id NOT IN (SELECT project_id FROM project_versions)"
+                ))
+        except Exception as e:
+            log.warning(f"Project version backfill failed: {e}")
+    
+    def _detect_search_backend(self):
+        """按全文索引是否存在选择搜索方式，未执行 init_db() 建立索引时使用 LIKE 查询"""
+        dialect = self.engine.dialect.name
+        try:
+            with self.engine.connect() as conn:
+                if dialect == 'sqlite':
+                    exists = conn.execute(text(
+                        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'request_info_fts'"
+                    )).first()
+                    # 旧版本按 unicode61 分词建立的索引无法匹配中文子串，重新执行 init-db 重建前使用 LIKE 查询
+                    return 'fts5' if exists and SQLITE_FTS_TOKENIZER in exists[0] else 'like'
+                if dialect == 'postgresql':
+                    exists = conn.execute(text(
+                        "SELECT 1 FROM pg_indexes WHERE indexname = 'ix_request_info_fts'"
+                    )).first()
+                    return 'tsvector' if exists else 'like'
+        except Exception as e:
+            log.warning(f"Full-text index detection failed, falling back to LIKE search: {e}")
+        return 'like'
+    
+    def _init_search_index(self, engine):
+        """创建全文索引，已存在时跳过；首次创建（或分词方式变化重建）SQLite FTS5 表时回填历史数据，返回可用的搜索方式"""
+        dialect = engine.dialect.name
+        search_backend = 'like'
+        try:
+            with engine.begin() as conn:
+                if dialect == 'sqlite':
+                    for table, statements in SQLITE_SEARCH_INDEX_DDL.items():
+                        exists = conn.execute(
+                            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                            {'name': table}
+                        ).first()
+                        if exists and SQLITE_FTS_TOKENIZER not in exists[0]:
+                            # 旧版本的索引分词方式不同，删除后按 trigram 重建（触发器按表名引用，保留）
+                            log.info(f"Rebuilding full-text index {table} with {SQLITE_FTS_TOKENIZER} tokenizer")
+                            conn.execute(text(f"DROP TABLE {table}"))
+                            exists = None
+                        if not exists:
+                            conn.execute(text(statements[0]))
+                            conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+                        for statement in statements[1:]:
+                            conn.execute(text(statement))
+                    search_backend = 'fts5'
+                elif dialect == 'postgresql':
+                    for table, vector in POSTGRESQL_SEARCH_VECTORS.items():
+                        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_fts ON {table} USING gin ({vector})"))
+                    search_backend = 'tsvector'
+        except Exception as e:
+            # 缺少 FTS5 扩展等情况下退化为 LIKE 查询
+            log.warning(f"Full-text index unavailable, falling back to LIKE search: {e}")
+            search_backend = 'like'
+        return search_backend
+    
+    def _register_pool_events(self, engine, stats):
+        """注册连接池事件，统计连接的检出/归还情况"""
+        lock = self._pool_lock
+        
+        @event.listens_for(engine, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            with lock:
+                stats['connects'] += 1
+        
+        @event.listens_for(engine, 'checkout')
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with lock:
+                stats['checkouts'] += 1
+                stats['checked_out'] += 1
+                if stats['checked_out'] > stats['peak_checked_out']:
+                    stats['peak_checked_out'] = stats['checked_out']
+        
+        @event.listens_for(engine, 'checkin')
+        def on_checkin(dbapi_connection, connection_record):
+            with lock:
+                stats['checkins'] += 1
+                stats['checked_out'] = max(stats['checked_out'] - 1, 0)
+        
+        @event.listens_for(engine, 'invalidate')
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with lock:
+                stats['invalidations'] += 1
+    
+    def _register_query_timing(self, engine):
+        """注册语句执行事件，把数据库耗时累计到当前请求的访问日志和指标中"""
+        @event.listens_for(engine, 'before_cursor_execute')
+        def on_before_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+        
+        @event.listens_for(engine, 'after_cursor_execute')
+        def on_after_execute(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.get('query_started_at')
+            if started:
+                elapsed = time.perf_counter() - started.pop()
+                add_db_time(elapsed * 1000)
+                observe_db_query(elapsed)
+
+        @event.listens_for(engine, 'handle_error')
+        def on_execute_error(context):
+            # 执行失败的语句不会触发 after_cursor_execute，在这里出栈，失败语句的耗时同样计入
+            conn = context.connection
+            started = conn.info.get('query_started_at') if conn is not None else None
+            if started:
+                elapsed = time.perf_counter() - started.pop()
+                add_db_time(elapsed * 1000)
+                observe_db_query(elapsed)
+
+    def _engine_pool_stats(self, engine, pool_stats):
+        with self._pool_lock:
+            stats = dict(pool_stats)
+        pool = engine.pool
+        stats['pool_class'] = type(pool).__name__
+        stats['pool_status'] = pool.status()
+        for attr in ('size', 'overflow', 'checkedin'):
+            method = getattr(pool, attr, None)
+            if callable(method):
+                stats[attr] = method()
+        return stats
+    
+    def get_pool_stats(self):
+        """获取连接池统计信息"""
+        stats = self._engine_pool_stats(self.engine, self._pool_stats)
+        if self.read_engine is not None:
+            stats['replica'] = self._engine_pool_stats(self.read_engine, self._read_pool_stats)
+        return stats
+    
     def get_session(self):
         """获取数据库会话"""
         return self.Session()
     
+    def get_read_session(self):
+        """获取只读会话，未配置从库时返回主库会话"""
+        if self.ReadSession is None:
+            return self.Session()
+        return self.ReadSession()
+    
+    def mark_write(self, user_key):
+        """记录用户最近一次写入时间"""
+        if user_key is not None:
+            self._last_write_at[user_key] = time.time()
+    
+    def recently_wrote(self, user_key, last_write_at=None):
+        """
+        用户是否在复制延迟窗口内写入过数据
+        last_write_at 为客户端带回的写入时间（cookie），与本进程的记录取较晚的一个
+        """
+        now = time.time()
+        local_write_at = self._last_write_at.get(user_key)
+        if local_write_at is not None and now - local_write_at > self.replica_lag_seconds:
+            self._last_write_at.pop(user_key, None)
+            local_write_at = None
+        latest = max(local_write_at or 0, last_write_at or 0)
+        return now - latest <= self.replica_lag_seconds
+    
     def close_session(self, session):
-        """关闭数据库会话"""
-        if session:
+        """
+        关闭数据库会话
+        Flask 请求内会话由 remove_session 在请求结束时统一释放，同一请求内的多次调用复用同一个会话
+        """
+        if session and not has_request_context():
             session.close()
+    
+    def remove_session(self):
+        """释放当前线程的会话，连接归还连接池（尚未连接过数据库时无需处理）"""
+        if self._Session is not None:
+            self._Session.remove()
+        if self._ReadSession is not None:
+            self._ReadSession.remove()
 
 # 全局数据库管理器实例
 db_manager = DatabaseManager()
+# 数据库配置修改后重建连接池
+config.subscribe(db_manager.reconfigure, ('database',))
 
 def get_db_session():
     """获取数据库会话的便捷函数"""
     return db_manager.get_session()
 
+def get_read_db_session():
+    """
+    获取只读查询使用的会话
+    当前请求已有写入，或当前用户刚写入过数据（复制延迟窗口内）时读主库，其余情况读从库
+    写入时间同时记录在本进程和 LAST_WRITE_COOKIE 中，写入和读取落到不同 worker 进程时按 cookie 判断
+    """
+    if db_manager.ReadSession is None:
+        return db_manager.get_session()
+    if has_request_context():
+        if g.get('db_pending_writes') or db_manager.recently_wrote(g.get('user_id'), _cookie_write_time()):
+            return db_manager.get_session()
+    return db_manager.get_read_session()
+
+def _cookie_write_time():
+    try:
+        return float(request.cookies.get(LAST_WRITE_COOKIE) or 0) or None
+    except ValueError:
+        return None
+
 def init_db():
-    """初始化数据库（兼容原有接口）"""
-    # SQLAlchemy 在 DatabaseManager 初始化时已经创建了所有表
+    """
+    初始化数据库表结构：建表、全文索引和项目版本号回填
+    部署或升级后执行一次（python main.py 启动时自动执行，或 flask init-db），web worker 启动时不再检查表结构
+    """
+    db_manager.init_schema()
     log.info("Database tables initialized")
 
+def commit_session(session):
+    """
+    提交会话
+    Flask 请求内只 flush 写入并登记待提交，整个请求作为一个工作单元在 after_request 中统一提交
+    """
+    if has_request_context():
+        session.flush()
+        g.db_pending_writes = True
+    else:
+        session.commit()
+
+def rollback_session(session):
+    """回滚会话，请求内回滚会丢弃本工作单元中已 flush 的全部写入"""
+    session.rollback()
+    if has_request_context() and g.get('db_pending_writes'):
+        g.db_pending_writes = False
+        g.db_unit_rolled_back = True
+
+def release_db_connection():
+    """
+    在耗时的外部调用前归还当前会话占用的连接
+    仅在本工作单元没有待提交写入时生效，会话本身仍可继续使用
+    """
+    if has_request_context() and g.get('db_pending_writes'):
+        return
+    db_manager.get_session().rollback()
+    if db_manager.ReadSession is not None:
+        db_manager.ReadSession().rollback()
+
+def init_app(app):
+    """注册请求级工作单元的提交与会话释放钩子"""
+    @app.after_request
+    def commit_unit_of_work(response):
+        if g.get('db_unit_rolled_back') and response.status_code < 400:
+            log.error(f"请求内数据库事务已回滚，此前的写入未保存: {request.path}")
+            response = jsonify({'success': False, 'error': '数据库事务已回滚，请重试'})
+            response.status_code = 500
+        if not g.pop('db_pending_writes', False):
+            return response
+        try:
+            db_manager.get_session().commit()
+            db_manager.mark_write(g.get('user_id'))
+            if db_manager.ReadSession is not None:
+                # cookie 只会让读请求回到主库，客户端伪造也不影响数据正确性
+                response.set_cookie(LAST_WRITE_COOKIE, f"{time.time():.3f}", max_age=math.ceil(db_manager.replica_lag_seconds),
+                                    httponly=True, samesite='Lax')
+        except Exception as e:
+            db_manager.get_session().rollback()
+            g.db_commit_failed = True
+            log.error(f"提交请求事务失败: {e}")
+            response = jsonify({'success': False, 'error': '数据保存失败'})
+            response.status_code = 500
+        return response
+    
+    @app.teardown_appcontext
+    def shutdown_session(exception=None):
+        db_manager.remove_session()
+
+def get_db_pool_stats():
+    """获取数据库连接池统计信息"""
+    return db_manager.get_pool_stats()
+
 def save_or_update_request_info(url, method, headers, body, query, auth=None, request_name=None, request_info_id=None):
     """保存或更新请求信息到request_info表"""
     session = get_db_session()
@@ -102,6 +599,7 @@ def save_or_update_request_info(url, method, headers, body, query, auth=None, re
                 request_info.auth = json.dumps(auth) if auth else None
                 request_info.request_name = request_name
                 info_id = request_info_id
+                _bump_project_versions(session, _request_project_ids(session, info_id), info_id, 'upsert')
                 log.info(f"Updating request info with ID: {request_info_id}")
             else:
                 return None
@@ -123,11 +621,11 @@ def save_or_update_request_info(url, method, headers, body, query, auth=None, re
             info_id = request_info.id
             log.info(f"Inserting new request name: {request_name}")
         
-        session.commit()
+        commit_session(session)
         return info_id
         
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error saving request info: {e}")
         return None
     finally:
@@ -135,7 +633,7 @@ def save_or_update_request_info(url, method, headers, body, query, auth=None, re
 
 def get_all_projects():
     """获取所有项目（管理员专用）"""
-    session = get_db_session()
+    session = get_read_db_session()
     try:
         projects = session.query(Project).order_by(desc(Project.created_at)).all()
         
@@ -177,12 +675,13 @@ def add_project_request_relation(project_id, request_info_id):
                 created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             )
             session.add(relation)
-            session.commit()
+            _bump_project_versions(session, [project_id], request_info_id, 'upsert')
+            commit_session(session)
         
         return True
         
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"添加项目请求关系失败: {e}")
         return False
     finally:
@@ -199,12 +698,13 @@ def remove_project_request_relation(project_id, request_info_id):
         
         if relation:
             session.delete(relation)
-            session.commit()
+            _bump_project_versions(session, [project_id], request_info_id, 'delete')
+            commit_session(session)
         
         return True
         
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"删除项目请求关系失败: {e}")
         return False
     finally:
@@ -212,7 +712,7 @@ def remove_project_request_relation(project_id, request_info_id):
 
 def get_request_ids_by_project(project_id):
     """根据项目ID查询相关的请求ID列表"""
-    session = get_db_session()
+    session = get_read_db_session()
     try:
         relations = session.query(ProjectRequestRelation).filter_by(
             project_id=project_id
@@ -228,7 +728,7 @@ def get_request_ids_by_project(project_id):
 
 def get_requests_by_project_id(project_id):
     """根据项目ID获取请求列表"""
-    session = get_db_session()
+    session = get_read_db_session()
     try:
         results = session.query(RequestInfo).join(
             ProjectRequestRelation,
@@ -261,6 +761,51 @@ def get_requests_by_project_id(project_id):
     finally:
         db_manager.close_session(session)
 
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def get_request_summaries(project_id, keyword=None, method=None, offset=0, limit=50):
+    """
+    分页获取项目请求摘要（只查询 id/名称/方法/URL/时间，不读取请求头和请求体）
+    keyword 按名称或 URL 模糊匹配，method 按请求方法过滤，返回 {'total': 总数, 'items': [...]}
+    """
+    session = get_read_db_session()
+    try:
+        query = session.query(
+            RequestInfo.id, RequestInfo.request_name, RequestInfo.method, RequestInfo.url, RequestInfo.timestamp
+        ).join(
+            ProjectRequestRelation,
+            RequestInfo.id == ProjectRequestRelation.request_info_id
+        ).filter(
+            ProjectRequestRelation.project_id == project_id,
+            RequestInfo.is_deleted == 0
+        )
+        if keyword:
+            pattern = f"%{_escape_like(keyword)}%"
+            query = query.filter(or_(
+                RequestInfo.request_name.ilike(pattern, escape='\\'),
+                RequestInfo.url.ilike(pattern, escape='\\')
+            ))
+        if method:
+            query = query.filter(RequestInfo.method == method.upper())
+        total = query.count()
+        rows = query.order_by(desc(RequestInfo.timestamp), desc(RequestInfo.id)).offset(offset).limit(limit).all()
+        return {
+            'total': total,
+            'items': [{
+                'id': row.id,
+                'request_name': row.request_name,
+                'method': row.method,
+                'url': row.url,
+                'timestamp': row.timestamp
+            } for row in rows]
+        }
+    except Exception as e:
+        log.error(f"查询项目请求摘要失败: {e}")
+        return {'total': 0, 'items': []}
+    finally:
+        db_manager.close_session(session)
+
 def check_request_in_project(project_id, request_info_id):
     """检查请求是否属于某个项目"""
     session = get_db_session()
@@ -290,29 +835,29 @@ def save_to_history(request_info_id, response_status, response_headers, response
             timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             url=url,
             method=method,
-            auth=json.dumps(auth) if auth else None,
+            auth=xapi_json.dumps(auth) if auth else None,
             request_name=request_name,
-            request_headers=json.dumps(request_headers) if request_headers else None,
+            request_headers=xapi_json.dumps(request_headers) if request_headers else None,
             request_body=request_body,
             response_status=response_status,
-            response_headers=json.dumps(response_headers) if response_headers else None,
+            response_headers=xapi_json.dumps(response_headers) if response_headers else None,
             response_body=response_body,
             response_time=response_time,
-            query=json.dumps(query) if query else None,
+            query=xapi_json.dumps(query) if query else None,
             execution_status=execution_status,
             execution_message=execution_message,
-            execution_details=json.dumps(execution_details) if execution_details else None,
-            pre_request_results=json.dumps(pre_request_results) if pre_request_results else None,
+            execution_details=xapi_json.dumps(execution_details) if execution_details else None,
+            pre_request_results=xapi_json.dumps(pre_request_results) if pre_request_results else None,
             username=username
         )
         
         session.add(history)
-        session.commit()
+        commit_session(session)
         
         return history.id
         
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error saving to history: {e}")
         return None
     finally:
@@ -320,7 +865,7 @@ def save_to_history(request_info_id, response_status, response_headers, response
 
 def get_request_info_list():
     """获取所有请求信息（用于左侧显示）"""
-    session = get_db_session()
+    session = get_read_db_session()
     try:
         requests = session.query(RequestInfo).filter(
             RequestInfo.is_deleted == 0
@@ -366,7 +911,7 @@ def get_request_info_list():
 
 def get_history_by_request_info_id(request_info_id):
     """根据请求信息ID获取历史记录"""
-    session = get_db_session()
+    session = get_read_db_session()
     try:
         histories = session.query(RequestHistory).filter_by(
             request_info_id=request_info_id
@@ -380,9 +925,12 @@ def get_history_by_request_info_id(request_info_id):
     finally:
         db_manager.close_session(session)
 
-def get_history_by_request_info_id_with_permission(request_info_id, user_id, user_role):
-    """根据请求信息ID和用户权限获取历史记录"""
-    session = get_db_session()
+def get_history_by_request_info_id_with_permission(request_info_id, user_id, user_role, raw_body=False):
+    """
+    根据请求信息ID和用户权限获取历史记录
+    raw_body 为 True 时 JSON 响应体以 RawJSON 原样返回，需使用 xapi_json 序列化
+    """
+    session = get_read_db_session()
     try:
         # 管理员可以查看所有记录
         if user_role == 'admin':
@@ -425,7 +973,7 @@ def get_history_by_request_info_id_with_permission(request_info_id, user_id, use
                 else:
                     histories = []
         
-        return _format_history_data(histories)
+        return _format_history_data(histories, raw_body=raw_body)
         
     except Exception as e:
         log.error(f"Error getting history by request info id with permission: {e}")
@@ -433,33 +981,40 @@ def get_history_by_request_info_id_with_permission(request_info_id, user_id, use
     finally:
         db_manager.close_session(session)
 
-def _format_history_data(histories):
+def _format_history_data(histories, raw_body=False):
     """格式化历史记录数据"""
     history = []
     for row in histories:
         # 解析存储的JSON字符串
         try:
-            response_headers = json.loads(row.response_headers) if row.response_headers else {}
+            response_headers = xapi_json.loads(row.response_headers) if row.response_headers else {}
         except:
             response_headers = {}
             
         try:
-            response_body = json.loads(row.response_body) if row.response_body else {}
+            if not row.response_body:
+                response_body = {}
+            elif raw_body:
+                # 只校验不反序列化，原文直接透传
+                xapi_json.loads(row.response_body)
+                response_body = RawJSON(row.response_body)
+            else:
+                response_body = xapi_json.loads(row.response_body)
         except:
             response_body = row.response_body
             
         try:
-            auth = json.loads(row.auth) if row.auth else {}
+            auth = xapi_json.loads(row.auth) if row.auth else {}
         except:
             auth = {}
             
         try:
-            query = json.loads(row.query) if row.query else {}
+            query = xapi_json.loads(row.query) if row.query else {}
         except:
             query = {}
             
         try:
-            request_headers = json.loads(row.request_headers) if row.request_headers else {}
+            request_headers = xapi_json.loads(row.request_headers) if row.request_headers else {}
         except:
             request_headers = {}
             
@@ -469,12 +1024,12 @@ def _format_history_data(histories):
             request_body = ''
             
         try:
-            execution_details = json.loads(row.execution_details) if row.execution_details else None
+            execution_details = xapi_json.loads(row.execution_details) if row.execution_details else None
         except:
             execution_details = None
             
         try:
-            pre_request_results = json.loads(row.pre_request_results) if row.pre_request_results else None
+            pre_request_results = xapi_json.loads(row.pre_request_results) if row.pre_request_results else None
         except:
             pre_request_results = None
         
@@ -516,6 +1071,37 @@ def _format_history_data(histories):
     
     return history
 
+def get_history_record(history_id):
+    """根据历史记录ID获取历史记录的归属和响应元信息（不含响应体）"""
+    session = get_db_session()
+    try:
+        row = session.query(RequestHistory).filter_by(id=history_id).first()
+        if not row:
+            return None
+        
+        try:
+            response_headers = json.loads(row.response_headers) if row.response_headers else {}
+        except:
+            response_headers = {}
+            
+        try:
+            execution_details = json.loads(row.execution_details) if row.execution_details else {}
+        except:
+            execution_details = {}
+        
+        return {
+            'id': row.id,
+            'request_info_id': row.request_info_id,
+            'username': row.username,
+            'response_headers': response_headers,
+            'execution_details': execution_details
+        }
+    except Exception as e:
+        log.error(f"Error getting history record: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
 def get_request_info_by_id(request_info_id):
     """根据ID获取请求信息"""
     session = get_db_session()
@@ -575,13 +1161,13 @@ def create_user(username, password, role='user'):
             created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         )
         session.add(user)
-        session.commit()
+        commit_session(session)
         return user.id
     except IntegrityError:
-        session.rollback()
+        rollback_session(session)
         return None
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error creating user: {e}")
         return None
     finally:
@@ -652,11 +1238,11 @@ def update_user_last_login(timestamp, user_id):
         user = session.query(User).filter_by(id=user_id).first()
         if user:
             user.last_login = timestamp
-            session.commit()
+            commit_session(session)
             return True
         return False
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error updating user last login: {e}")
         return False
     finally:
@@ -688,11 +1274,12 @@ def create_project(name, description, created_by):
             granted_at=timestamp
         )
         session.add(permission)
-        session.commit()
+        session.add(ProjectVersion(project_id=project.id, version=1, updated_at=timestamp))
+        commit_session(session)
         
         return project.id
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error creating project: {e}")
         return None
     finally:
@@ -700,7 +1287,7 @@ def create_project(name, description, created_by):
 
 def get_user_projects(user_id):
     """获取用户有权限的项目列表"""
-    session = get_db_session()
+    session = get_read_db_session()
     try:
         results = session.query(Project, UserProjectPermission, User).join(
             UserProjectPermission, Project.id == UserProjectPermission.project_id
@@ -775,7 +1362,7 @@ def check_user_project_permission(user_id, project_id):
 
 def get_project_members(project_id):
     """获取项目成员列表"""
-    session = get_db_session()
+    session = get_read_db_session()
     try:
         results = session.query(User, UserProjectPermission).join(
             UserProjectPermission, User.id == UserProjectPermission.user_id
@@ -811,11 +1398,11 @@ def remove_project_member(user_id, project_id):
         
         if permission:
             session.delete(permission)
-            session.commit()
+            commit_session(session)
             return True
         return False
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error removing project member: {e}")
         return False
     finally:
@@ -845,10 +1432,10 @@ def grant_project_permission(user_id, project_id, permission_level, granted_by):
             )
             session.add(permission)
         
-        session.commit()
+        commit_session(session)
         return True
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error granting project permission: {e}")
         return False
     finally:
@@ -867,7 +1454,7 @@ def get_all_request_list():
 
 def get_all_users_list():
     """获取所有用户列表"""
-    session = get_db_session()
+    session = get_read_db_session()
     try:
         users = session.query(User).order_by(desc(User.created_at)).all()
         
@@ -921,10 +1508,10 @@ def save_advanced_config(project_id, request_info_id, is_global, body_info, quer
             updated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         )
         session.add(config)
-        session.commit()
+        commit_session(session)
         return config.id
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error saving advanced config: {e}")
         return None
     finally:
@@ -982,11 +1569,11 @@ def update_advanced_config(config_id, project_id, request_info_id, is_global, bo
             config.private_request_id = private_request_id
             config.host = host
             config.updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            session.commit()
+            commit_session(session)
             return True
         return False
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error updating advanced config: {e}")
         return False
     finally:
@@ -999,16 +1586,28 @@ def delete_advanced_config(config_id):
         config = session.query(AdvancedConfig).filter_by(id=config_id).first()
         if config:
             session.delete(config)
-            session.commit()
+            commit_session(session)
             return True
         return False
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error deleting advanced config: {e}")
         return False
     finally:
         db_manager.close_session(session)
 
+def get_pre_request_project_ids(request_info_id):
+    """获取把该请求配置为前置请求的项目ID"""
+    session = get_db_session()
+    try:
+        rows = session.query(AdvancedConfig.project_id).filter_by(request_info_id=request_info_id).distinct().all()
+        return {row[0] for row in rows}
+    except Exception as e:
+        log.error(f"Error getting pre-request projects: {e}")
+        return set()
+    finally:
+        db_manager.close_session(session)
+
 # ==================== 项目环境配置相关函数 ====================
 
 def get_project_env(project_id):
@@ -1050,10 +1649,10 @@ def save_project_env(project_id, env_json):
             )
             session.add(env)
         
-        session.commit()
+        commit_session(session)
         return True
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error saving project env: {e}")
         return False
     finally:
@@ -1066,11 +1665,11 @@ def delete_project_env(project_id):
         env = session.query(ProjectEnv).filter_by(project_id=project_id).first()
         if env:
             session.delete(env)
-            session.commit()
+            commit_session(session)
             return True
         return False
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error deleting project env: {e}")
         return False
     finally:
@@ -1113,11 +1712,12 @@ def copy_request_info(request_id, project_id):
                 created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             )
             session.add(relation)
+            _bump_project_versions(session, [project_id], new_request.id, 'upsert')
         
-        session.commit()
+        commit_session(session)
         return new_request.id
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error copying request info: {e}")
         return None
     finally:
@@ -1150,12 +1750,1142 @@ def delete_request_info(request_id, project_id):
         ).first()
         if request_info:
             request_info.is_deleted = 1
+            # 请求已软删除，所有关联项目都视为删除
+            _bump_project_versions(session, set(_request_project_ids(session, request_id)) | {project_id}, request_id, 'delete')
         
-        session.commit()
+        commit_session(session)
         return True
     except Exception as e:
-        session.rollback()
+        rollback_session(session)
         log.error(f"Error deleting request info: {e}")
         return False
     finally:
-        db_manager.close_session(session)
\ No newline at end of file
+        db_manager.close_session(session)
+
+# ==================== 项目版本和增量同步相关函数 ====================
+
+# 每个项目保留的请求变更记录数，更早的版本增量同步时返回全量标记
+DEFAULT_MAX_REQUEST_CHANGES = 1000
+# 每递增多少个版本清理一次过期的变更记录
+REQUEST_CHANGES_PRUNE_INTERVAL = 100
+
+def _request_project_ids(session, request_info_id):
+    """请求所属的全部项目ID"""
+    rows = session.query(ProjectRequestRelation.project_id).filter_by(request_info_id=request_info_id).all()
+    return [row[0] for row in rows]
+
+def _bump_project_versions(session, project_ids, request_info_id, change_type):
+    """
+    在当前事务中递增项目版本号并记录请求变更（upsert/delete），与请求的修改一起提交
+    按项目ID顺序更新，避免并发事务互相等待
+    """
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    max_changes = config.get('request_changes.max_per_project', DEFAULT_MAX_REQUEST_CHANGES)
+    for project_id in sorted({int(project_id) for project_id in project_ids if project_id}):
+        updated = session.query(ProjectVersion).filter_by(project_id=project_id).update({
+            'version': ProjectVersion.version + 1,
+            'updated_at': timestamp
+        }, synchronize_session=False)
+        if not updated:
+            session.add(ProjectVersion(project_id=project_id, version=1, updated_at=timestamp))
+            session.flush()
+        version = session.query(ProjectVersion.version).filter_by(project_id=project_id).scalar()
+        session.add(ProjectRequestChange(
+            project_id=project_id,
+            request_info_id=request_info_id,
+            version=version,
+            change_type=change_type,
+            changed_at=timestamp
+        ))
+        if version % REQUEST_CHANGES_PRUNE_INTERVAL == 0:
+            session.query(ProjectRequestChange).filter(
+                ProjectRequestChange.project_id == project_id,
+                ProjectRequestChange.version <= version - max_changes
+            ).delete(synchronize_session=False)
+
+def get_project_version(project_id):
+    """获取项目请求列表的当前版本号，没有记录时返回 0"""
+    session = get_read_db_session()
+    try:
+        version = session.query(ProjectVersion.version).filter_by(project_id=project_id).scalar()
+        return version or 0
+    except Exception as e:
+        log.error(f"获取项目版本失败: {e}")
+        return 0
+    finally:
+        db_manager.close_session(session)
+
+def get_project_request_changes(project_id, since):
+    """
+    获取 since 版本之后的请求变更
+    返回 {'version': 当前版本, 'full': 是否需要全量加载, 'upserted': [请求摘要], 'deleted': [请求ID]}
+    since 早于保留的变更记录或大于当前版本（如数据库重建）时 full 为 True
+    """
+    session = get_read_db_session()
+    try:
+        version = session.query(ProjectVersion.version).filter_by(project_id=project_id).scalar() or 0
+        result = {'version': version, 'full': False, 'upserted': [], 'deleted': []}
+        if since == version:
+            return result
+        oldest = session.query(func.min(ProjectRequestChange.version)).filter(
+            ProjectRequestChange.project_id == project_id
+        ).scalar()
+        if since > version or oldest is None or since < oldest - 1:
+            result['full'] = True
+            return result
+
+        changes = session.query(
+            ProjectRequestChange.request_info_id, ProjectRequestChange.change_type
+        ).filter(
+            ProjectRequestChange.project_id == project_id,
+            ProjectRequestChange.version > since,
+            ProjectRequestChange.version <= version
+        ).order_by(ProjectRequestChange.version).all()
+        # 同一请求多次变更时以最后一次为准
+        latest = {}
+        for request_info_id, change_type in changes:
+            latest[request_info_id] = change_type
+        upsert_ids = [request_info_id for request_info_id, change_type in latest.items() if change_type == 'upsert']
+        rows = []
+        if upsert_ids:
+            rows = session.query(
+                RequestInfo.id, RequestInfo.request_name, RequestInfo.method, RequestInfo.url, RequestInfo.timestamp
+            ).join(
+                ProjectRequestRelation,
+                RequestInfo.id == ProjectRequestRelation.request_info_id
+            ).filter(
+                ProjectRequestRelation.project_id == project_id,
+                RequestInfo.id.in_(upsert_ids),
+                RequestInfo.is_deleted == 0
+            ).order_by(desc(RequestInfo.timestamp), desc(RequestInfo.id)).all()
+        found = {row.id for row in rows}
+        result['upserted'] = [{
+            'id': row.id,
+            'request_name': row.request_name,
+            'method': row.method,
+            'url': row.url,
+            'timestamp': row.timestamp
+        } for row in rows]
+        # 之后被移出项目或删除的请求按删除处理
+        result['deleted'] = [request_info_id for request_info_id in latest if request_info_id not in found]
+        return result
+    except Exception as e:
+        log.error(f"获取项目请求变更失败: {e}")
+        return {'version': 0, 'full': True, 'upserted': [], 'deleted': []}
+    finally:
+        db_manager.close_session(session)
+
+# ==================== 定时监控相关函数 ====================
+
+# 每个监控任务保留的执行结果数
+DEFAULT_MONITOR_MAX_RUNS = 1000
+
+def _monitor_job_to_dict(job):
+    try:
+        assertions = json.loads(job.assertions) if job.assertions else []
+    except (TypeError, ValueError):
+        assertions = []
+    return {
+        'id': job.id,
+        'project_id': job.project_id,
+        'request_info_id': job.request_info_id,
+        'name': job.name,
+        'cron': job.cron,
+        'assertions': assertions,
+        'enabled': bool(job.enabled),
+        'created_by': job.created_by,
+        'created_at': job.created_at,
+        'updated_at': job.updated_at,
+        'next_run_at': job.next_run_at,
+        'last_run_at': job.last_run_at,
+        'last_status': job.last_status
+    }
+
+def create_monitor_job(project_id, request_info_id, name, cron, assertions, enabled, created_by, next_run_at):
+    """创建定时监控任务，返回任务ID"""
+    session = get_db_session()
+    try:
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        job = MonitorJob(
+            project_id=project_id,
+            request_info_id=request_info_id,
+            name=name,
+            cron=cron,
+            assertions=json.dumps(assertions, ensure_ascii=False),
+            enabled=1 if enabled else 0,
+            created_by=created_by,
+            created_at=timestamp,
+            updated_at=timestamp,
+            next_run_at=next_run_at
+        )
+        session.add(job)
+        commit_session(session)
+        return job.id
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error creating monitor job: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
+def update_monitor_job(job_id, **fields):
+    """更新定时监控任务，fields 可包含 request_info_id/name/cron/assertions/enabled/next_run_at"""
+    session = get_db_session()
+    try:
+        job = session.query(MonitorJob).filter_by(id=job_id).first()
+        if not job:
+            return False
+        for key, value in fields.items():
+            if key == 'assertions':
+                value = json.dumps(value, ensure_ascii=False)
+            elif key == 'enabled':
+                value = 1 if value else 0
+            setattr(job, key, value)
+        job.updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        commit_session(session)
+        return True
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error updating monitor job: {e}")
+        return False
+    finally:
+        db_manager.close_session(session)
+
+def delete_monitor_job(job_id):
+    """删除定时监控任务及其执行结果"""
+    session = get_db_session()
+    try:
+        session.query(MonitorRun).filter_by(job_id=job_id).delete(synchronize_session=False)
+        deleted = session.query(MonitorJob).filter_by(id=job_id).delete(synchronize_session=False)
+        commit_session(session)
+        return deleted > 0
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error deleting monitor job: {e}")
+        return False
+    finally:
+        db_manager.close_session(session)
+
+def get_monitor_job(job_id):
+    """根据ID获取定时监控任务"""
+    session = get_db_session()
+    try:
+        job = session.query(MonitorJob).filter_by(id=job_id).first()
+        return _monitor_job_to_dict(job) if job else None
+    except Exception as e:
+        log.error(f"Error getting monitor job: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
+def get_monitor_jobs(project_id):
+    """获取项目下的定时监控任务"""
+    session = get_read_db_session()
+    try:
+        jobs = session.query(MonitorJob).filter_by(project_id=project_id).order_by(MonitorJob.id).all()
+        return [_monitor_job_to_dict(job) for job in jobs]
+    except Exception as e:
+        log.error(f"Error getting monitor jobs: {e}")
+        return []
+    finally:
+        db_manager.close_session(session)
+
+def claim_due_monitor_jobs(owner, now, lease_expires_at, limit):
+    """
+    领取到期的监控任务
+    通过条件更新租约字段实现抢占，多进程/多实例同时调度时每个任务只会被一个调度器领取
+    """
+    session = get_db_session()
+    claimed = []
+    try:
+        lease_free = or_(MonitorJob.lease_expires_at.is_(None), MonitorJob.lease_expires_at < now)
+        candidates = session.query(MonitorJob.id).filter(
+            MonitorJob.enabled == 1,
+            MonitorJob.next_run_at <= now,
+            lease_free
+        ).order_by(MonitorJob.next_run_at).limit(limit).all()
+        for (job_id,) in candidates:
+            updated = session.query(MonitorJob).filter(MonitorJob.id == job_id, lease_free).update({
+                'lease_owner': owner,
+                'lease_expires_at': lease_expires_at
+            }, synchronize_session=False)
+            if updated:
+                claimed.append(job_id)
+        commit_session(session)
+        if not claimed:
+            return []
+        jobs = session.query(MonitorJob).filter(MonitorJob.id.in_(claimed)).all()
+        return [_monitor_job_to_dict(job) for job in jobs]
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error claiming monitor jobs: {e}")
+        return []
+    finally:
+        db_manager.close_session(session)
+
+def renew_monitor_job_leases(owner, job_ids, lease_expires_at):
+    """
+    为执行中的监控任务续租，返回仍持有租约的任务ID集合
+    不在集合中的任务租约已过期并被其他调度器领取，应停止执行
+    """
+    if not job_ids:
+        return set()
+    session = get_db_session()
+    try:
+        owned = (MonitorJob.id.in_(list(job_ids)), MonitorJob.lease_owner == owner)
+        session.query(MonitorJob).filter(*owned).update(
+            {'lease_expires_at': lease_expires_at}, synchronize_session=False)
+        rows = session.query(MonitorJob.id).filter(*owned).all()
+        commit_session(session)
+        return {row[0] for row in rows}
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error renewing monitor job leases: {e}")
+        # 续租失败时不判定任务丢失，下次续租再确认
+        return set(job_ids)
+    finally:
+        db_manager.close_session(session)
+
+def finish_monitor_job(job_id, owner, runs, next_run_at, last_run_at, last_status):
+    """
+    保存一次监控执行的结果，更新下次执行时间并释放租约
+    租约已过期并被其他执行器取得时不保存结果，返回 False
+    """
+    session = get_db_session()
+    try:
+        updated = session.query(MonitorJob).filter(MonitorJob.id == job_id, MonitorJob.lease_owner == owner).update({
+            'next_run_at': next_run_at,
+            'last_run_at': last_run_at,
+            'last_status': last_status,
+            'lease_owner': None,
+            'lease_expires_at': None
+        }, synchronize_session=False)
+        if updated != 1:
+            return False
+        for run in runs:
+            session.add(MonitorRun(
+                job_id=job_id,
+                project_id=run['project_id'],
+                request_info_id=run.get('request_info_id'),
+                started_at=run['started_at'],
+                status=run['status'],
+                response_status=run.get('response_status'),
+                response_time=run.get('response_time'),
+                response_bytes=run.get('response_bytes'),
+                assertion_results=json.dumps(run.get('assertions', []), ensure_ascii=False),
+                error=run.get('error')
+            ))
+        commit_session(session)
+
+        # 只保留最近的执行结果
+        max_runs = config.get('monitor.max_runs_per_job', DEFAULT_MONITOR_MAX_RUNS)
+        boundary = session.query(MonitorRun.id).filter_by(job_id=job_id).order_by(desc(MonitorRun.id)).offset(max_runs).first()
+        if boundary:
+            session.query(MonitorRun).filter(MonitorRun.job_id == job_id, MonitorRun.id <= boundary[0]).delete(synchronize_session=False)
+            commit_session(session)
+        return True
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error finishing monitor job: {e}")
+        return False
+    finally:
+        db_manager.close_session(session)
+
+def get_monitor_runs(job_id, limit=50):
+    """获取监控任务最近的执行结果"""
+    session = get_read_db_session()
+    try:
+        runs = session.query(MonitorRun).filter_by(job_id=job_id).order_by(desc(MonitorRun.id)).limit(limit).all()
+        result = []
+        for run in runs:
+            try:
+                assertions = json.loads(run.assertion_results) if run.assertion_results else []
+            except (TypeError, ValueError):
+                assertions = []
+            result.append({
+                'id': run.id,
+                'request_info_id': run.request_info_id,
+                'started_at': run.started_at,
+                'status': run.status,
+                'response_status': run.response_status,
+                'response_time': run.response_time,
+                'response_bytes': run.response_bytes,
+                'assertions': assertions,
+                'error': run.error
+            })
+        return result
+    except Exception as e:
+        log.error(f"Error getting monitor runs: {e}")
+        return []
+    finally:
+        db_manager.close_session(session)
+
+# ==================== 分布式压测相关函数 ====================
+
+# 未结束的任务/分片状态
+LOAD_ACTIVE_STATUSES = ('pending', 'running')
+
+def register_load_worker(worker_key, name, hostname, pid, capacity):
+    """登记压测 worker（同一 worker_key 重复注册时更新信息），返回 worker ID"""
+    session = get_db_session()
+    try:
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        worker = session.query(LoadWorker).filter_by(worker_key=worker_key).first()
+        if worker is None:
+            worker = LoadWorker(worker_key=worker_key, registered_at=timestamp)
+            session.add(worker)
+        worker.name = name
+        worker.hostname = hostname
+        worker.pid = pid
+        worker.capacity = capacity
+        worker.last_seen_at = timestamp
+        commit_session(session)
+        return worker.id
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error registering load worker: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
+def touch_load_worker(worker_id):
+    """更新 worker 最近联系时间，worker 不存在时返回 False"""
+    session = get_db_session()
+    try:
+        updated = session.query(LoadWorker).filter_by(id=worker_id).update({
+            'last_seen_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }, synchronize_session=False)
+        commit_session(session)
+        return updated > 0
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error touching load worker: {e}")
+        return False
+    finally:
+        db_manager.close_session(session)
+
+def get_load_workers():
+    """获取已注册的 worker 及其正在执行的分片数"""
+    session = get_read_db_session()
+    try:
+        running = dict(session.query(LoadShard.worker_id, func.count(LoadShard.id)).filter(
+            LoadShard.status == 'running'
+        ).group_by(LoadShard.worker_id).all())
+        workers = session.query(LoadWorker).order_by(desc(LoadWorker.last_seen_at)).all()
+        return [{
+            'id': worker.id,
+            'name': worker.name,
+            'hostname': worker.hostname,
+            'pid': worker.pid,
+            'capacity': worker.capacity,
+            'registered_at': worker.registered_at,
+            'last_seen_at': worker.last_seen_at,
+            'running_shards': running.get(worker.id, 0)
+        } for worker in workers]
+    except Exception as e:
+        log.error(f"Error getting load workers: {e}")
+        return []
+    finally:
+        db_manager.close_session(session)
+
+def _load_job_to_dict(job):
+    try:
+        spec = json.loads(job.spec) if job.spec else {}
+    except (TypeError, ValueError):
+        spec = {}
+    return {
+        'id': job.id,
+        'project_id': job.project_id,
+        'name': job.name,
+        'kind': job.kind,
+        'spec': spec,
+        'shard_count': job.shard_count,
+        'status': job.status,
+        'created_by': job.created_by,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at
+    }
+
+def _load_shard_results(shard):
+    try:
+        return json.loads(shard.results) if shard.results else {}
+    except (TypeError, ValueError):
+        return {}
+
+def create_load_job(project_id, name, kind, spec, shard_count, created_by):
+    """创建压测任务和待领取的分片，返回任务ID"""
+    session = get_db_session()
+    try:
+        job = LoadJob(
+            project_id=project_id,
+            name=name,
+            kind=kind,
+            spec=json.dumps(spec, ensure_ascii=False),
+            shard_count=shard_count,
+            status='pending',
+            created_by=created_by,
+            created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
+        session.add(job)
+        session.flush()
+        for index in range(shard_count):
+            session.add(LoadShard(job_id=job.id, shard_index=index, status='pending', attempts=0))
+        commit_session(session)
+        return job.id
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error creating load job: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
+def get_load_jobs(project_id, limit=50):
+    """获取项目下最近的压测任务（不含结果）"""
+    session = get_read_db_session()
+    try:
+        jobs = session.query(LoadJob).filter_by(project_id=project_id).order_by(desc(LoadJob.id)).limit(limit).all()
+        return [_load_job_to_dict(job) for job in jobs]
+    except Exception as e:
+        log.error(f"Error getting load jobs: {e}")
+        return []
+    finally:
+        db_manager.close_session(session)
+
+def get_load_job(job_id, with_results=True):
+    """获取压测任务、各分片状态和合并后的结果（{请求ID: 统计}）"""
+    session = get_db_session()
+    try:
+        job = session.query(LoadJob).filter_by(id=job_id).first()
+        if not job:
+            return None
+        result = _load_job_to_dict(job)
+        shards = session.query(LoadShard).filter_by(job_id=job_id).order_by(LoadShard.shard_index).all()
+        merged = {}
+        result['shards'] = []
+        for shard in shards:
+            if with_results:
+                merged = merge_results(merged, _load_shard_results(shard))
+            result['shards'].append({
+                'id': shard.id,
+                'shard_index': shard.shard_index,
+                'status': shard.status,
+                'worker_id': shard.worker_id,
+                'attempts': shard.attempts,
+                'started_at': shard.started_at,
+                'finished_at': shard.finished_at,
+                'error': shard.error
+            })
+        if with_results:
+            result['results'] = merged
+        return result
+    except Exception as e:
+        log.error(f"Error getting load job: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
+def get_load_shard(shard_id):
+    """根据ID获取压测分片（不含结果）"""
+    session = get_db_session()
+    try:
+        shard = session.query(LoadShard).filter_by(id=shard_id).first()
+        if not shard:
+            return None
+        return {
+            'id': shard.id,
+            'job_id': shard.job_id,
+            'shard_index': shard.shard_index,
+            'status': shard.status,
+            'worker_id': shard.worker_id,
+            'attempts': shard.attempts
+        }
+    except Exception as e:
+        log.error(f"Error getting load shard: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
+def _finish_load_job_if_done(session, job, now):
+    """所有分片都结束后更新任务状态：全部失败为 failed，已取消的保持 cancelled"""
+    statuses = [status for (status,) in session.query(LoadShard.status).filter_by(job_id=job.id).all()]
+    if any(status in LOAD_ACTIVE_STATUSES for status in statuses):
+        return
+    if job.status != 'cancelled':
+        job.status = 'failed' if statuses and all(status == 'failed' for status in statuses) else 'finished'
+    job.finished_at = job.finished_at or now
+
+def cancel_load_job(job_id):
+    """取消压测任务：未领取的分片直接取消，执行中的分片在 worker 下次上报时停止"""
+    session = get_db_session()
+    try:
+        job = session.query(LoadJob).filter_by(id=job_id).first()
+        if not job or job.status not in LOAD_ACTIVE_STATUSES:
+            return False
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        job.status = 'cancelled'
+        session.query(LoadShard).filter(LoadShard.job_id == job_id, LoadShard.status == 'pending').update({
+            'status': 'cancelled',
+            'finished_at': now
+        }, synchronize_session=False)
+        _finish_load_job_if_done(session, job, now)
+        commit_session(session)
+        return True
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error cancelling load job: {e}")
+        return False
+    finally:
+        db_manager.close_session(session)
+
+def claim_load_shard(worker_id, now, lease_expires_at, max_attempts):
+    """
+    为 worker 领取一个分片
+    待执行的分片和租约已过期（worker 失联）的分片都可领取，通过条件更新抢占；重新领取时丢弃失联 worker 的部分结果，
+    已领取 max_attempts 次的过期分片标记为失败
+    """
+    session = get_db_session()
+    try:
+        active_jobs = session.query(LoadJob.id).filter(LoadJob.status.in_(LOAD_ACTIVE_STATUSES))
+        expired = and_(LoadShard.status == 'running', LoadShard.lease_expires_at < now)
+        # 多次失联的分片不再重试
+        exhausted = session.query(LoadShard).filter(expired, LoadShard.attempts >= max_attempts,
+                                                   LoadShard.job_id.in_(active_jobs)).all()
+        for shard in exhausted:
+            shard.status = 'failed'
+            shard.error = 'worker 失联，已达到最大重试次数'
+            shard.finished_at = now
+            shard.lease_expires_at = None
+            session.flush()
+            _finish_load_job_if_done(session, session.query(LoadJob).filter_by(id=shard.job_id).first(), now)
+
+        claimable = or_(LoadShard.status == 'pending', expired)
+        candidates = session.query(LoadShard.id).filter(
+            claimable, LoadShard.job_id.in_(active_jobs)
+        ).order_by(LoadShard.job_id, LoadShard.shard_index).limit(5).all()
+        for (shard_id,) in candidates:
+            updated = session.query(LoadShard).filter(LoadShard.id == shard_id, claimable).update({
+                'status': 'running',
+                'worker_id': worker_id,
+                'lease_expires_at': lease_expires_at,
+                'attempts': LoadShard.attempts + 1,
+                'started_at': now,
+                'results': None,
+                'error': None
+            }, synchronize_session=False)
+            if not updated:
+                continue
+            shard = session.query(LoadShard).filter_by(id=shard_id).first()
+            job = session.query(LoadJob).filter_by(id=shard.job_id).first()
+            if job.status == 'pending':
+                job.status = 'running'
+                job.started_at = now
+            commit_session(session)
+            return {
+                'shard_id': shard.id,
+                'shard_index': shard.shard_index,
+                'attempts': shard.attempts,
+                'job': _load_job_to_dict(job)
+            }
+        commit_session(session)
+        return None
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error claiming load shard: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
+def report_load_shard(shard_id, worker_id, delta, final, error, now, lease_expires_at):
+    """
+    累加 worker 上报的增量结果并续租；final 时结束分片
+    分片已不属于该 worker（租约过期后被重新分配）时返回 None，worker 应放弃执行
+    数据库错误（锁等待超时等）直接抛出，由接口返回 500，worker 保留结果稍后重试
+    """
+    session = get_db_session()
+    try:
+        shard = session.query(LoadShard).filter_by(id=shard_id, worker_id=worker_id, status='running').first()
+        if not shard:
+            return None
+        job = session.query(LoadJob).filter_by(id=shard.job_id).first()
+        if delta:
+            shard.results = json.dumps(merge_results(_load_shard_results(shard), delta), ensure_ascii=False)
+        cancelled = job.status == 'cancelled'
+        if final:
+            shard.status = 'failed' if error else ('cancelled' if cancelled else 'finished')
+            shard.error = error
+            shard.finished_at = now
+            shard.lease_expires_at = None
+            session.flush()
+            _finish_load_job_if_done(session, job, now)
+        else:
+            shard.lease_expires_at = lease_expires_at
+        session.query(LoadWorker).filter_by(id=worker_id).update({'last_seen_at': now}, synchronize_session=False)
+        commit_session(session)
+        return {
+            'job_id': job.id,
+            'project_id': job.project_id,
+            'job_status': job.status,
+            'shard_status': shard.status,
+            'cancelled': cancelled
+        }
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error reporting load shard: {e}")
+        raise
+    finally:
+        db_manager.close_session(session)
+
+# ==================== 后台任务队列相关函数 ====================
+
+# 未结束的后台任务状态
+JOB_ACTIVE_STATUSES = ('queued', 'running')
+
+def _json_field(value, default=None):
+    try:
+        return json.loads(value) if value else default
+    except (TypeError, ValueError):
+        return default
+
+def _background_job_to_dict(job, with_result=False):
+    result = {
+        'id': job.id,
+        'project_id': job.project_id,
+        'job_type': job.job_type,
+        'payload': _json_field(job.payload, {}),
+        'status': job.status,
+        'priority': job.priority,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'run_after': job.run_after,
+        'cancel_requested': bool(job.cancel_requested),
+        'progress': {
+            'completed': job.progress_completed,
+            'total': job.progress_total,
+            'message': job.progress_message
+        },
+        'error': job.error,
+        'created_by': job.created_by,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at
+    }
+    if with_result:
+        result['result'] = _json_field(job.result)
+    return result
+
+def create_background_job(project_id, job_type, payload, created_by, max_attempts, priority=0):
+    """任务入队，返回任务ID"""
+    session = get_db_session()
+    try:
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        job = BackgroundJob(
+            project_id=project_id,
+            job_type=job_type,
+            payload=json.dumps(payload, ensure_ascii=False),
+            status='queued',
+            priority=priority,
+            attempts=0,
+            max_attempts=max_attempts,
+            run_after=timestamp,
+            cancel_requested=0,
+            progress_completed=0,
+            created_by=created_by,
+            created_at=timestamp
+        )
+        session.add(job)
+        commit_session(session)
+        return job.id
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error creating background job: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
+def get_background_job(job_id, with_result=False):
+    """根据ID获取后台任务，with_result 时附带执行结果"""
+    session = get_db_session()
+    try:
+        job = session.query(BackgroundJob).filter_by(id=job_id).first()
+        return _background_job_to_dict(job, with_result) if job else None
+    except Exception as e:
+        log.error(f"Error getting background job: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
+def get_background_jobs(project_id, status=None, job_type=None, limit=50):
+    """获取项目下最近的后台任务（不含结果）"""
+    session = get_read_db_session()
+    try:
+        query = session.query(BackgroundJob).filter_by(project_id=project_id)
+        if status:
+            query = query.filter_by(status=status)
+        if job_type:
+            query = query.filter_by(job_type=job_type)
+        jobs = query.order_by(desc(BackgroundJob.id)).limit(limit).all()
+        return [_background_job_to_dict(job) for job in jobs]
+    except Exception as e:
+        log.error(f"Error getting background jobs: {e}")
+        return []
+    finally:
+        db_manager.close_session(session)
+
+def claim_background_jobs(owner, now, lease_expires_at, limit):
+    """
+    领取可执行的后台任务：已到 run_after 的排队任务，以及租约已过期（执行进程退出）的执行中任务
+    通过条件更新抢占，多进程同时领取时每个任务只会被一个执行器领取；领取即计一次尝试，
+    租约过期且已达到最大尝试次数的任务标记为失败
+    """
+    session = get_db_session()
+    claimed = []
+    try:
+        expired = and_(BackgroundJob.status == 'running', BackgroundJob.lease_expires_at < now)
+        exhausted = session.query(BackgroundJob).filter(
+            expired, BackgroundJob.attempts >= BackgroundJob.max_attempts).all()
+        for job in exhausted:
+            job.status = 'failed'
+            job.error = job.error or '执行进程失联，已达到最大重试次数'
+            job.finished_at = now
+            job.lease_owner = None
+            job.lease_expires_at = None
+
+        claimable = or_(
+            and_(BackgroundJob.status == 'queued', BackgroundJob.run_after <= now),
+            and_(expired, BackgroundJob.attempts < BackgroundJob.max_attempts)
+        )
+        candidates = session.query(BackgroundJob.id).filter(claimable).order_by(
+            desc(BackgroundJob.priority), BackgroundJob.id).limit(limit).all()
+        for (job_id,) in candidates:
+            updated = session.query(BackgroundJob).filter(BackgroundJob.id == job_id, claimable).update({
+                'status': 'running',
+                'lease_owner': owner,
+                'lease_expires_at': lease_expires_at,
+                'attempts': BackgroundJob.attempts + 1,
+                'started_at': func.coalesce(BackgroundJob.started_at, now)
+            }, synchronize_session=False)
+            if updated:
+                claimed.append(job_id)
+        commit_session(session)
+        if not claimed:
+            return []
+        jobs = session.query(BackgroundJob).filter(BackgroundJob.id.in_(claimed)).order_by(
+            desc(BackgroundJob.priority), BackgroundJob.id).all()
+        return [_background_job_to_dict(job) for job in jobs]
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error claiming background jobs: {e}")
+        return []
+    finally:
+        db_manager.close_session(session)
+
+def renew_background_job_leases(owner, job_ids, lease_expires_at):
+    """
+    为执行中的任务续租，返回 (仍持有租约的任务ID集合, 已请求取消的任务ID集合)
+    不在第一个集合中的任务已被其他执行器接管，应停止执行
+    """
+    if not job_ids:
+        return set(), set()
+    session = get_db_session()
+    try:
+        owned = (BackgroundJob.id.in_(list(job_ids)), BackgroundJob.lease_owner == owner,
+                 BackgroundJob.status == 'running')
+        session.query(BackgroundJob).filter(*owned).update(
+            {'lease_expires_at': lease_expires_at}, synchronize_session=False)
+        rows = session.query(BackgroundJob.id, BackgroundJob.cancel_requested).filter(*owned).all()
+        commit_session(session)
+        return {job_id for job_id, _ in rows}, {job_id for job_id, cancel in rows if cancel}
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error renewing background job leases: {e}")
+        # 续租失败时不判定任务丢失，下次续租再确认
+        return set(job_ids), set()
+    finally:
+        db_manager.close_session(session)
+
+def update_background_job_progress(job_id, owner, completed, total, message):
+    """更新任务进度，任务已不属于该执行器时返回 False"""
+    session = get_db_session()
+    try:
+        updated = session.query(BackgroundJob).filter_by(id=job_id, lease_owner=owner, status='running').update({
+            'progress_completed': completed,
+            'progress_total': total,
+            'progress_message': message[:255] if message else None
+        }, synchronize_session=False)
+        commit_session(session)
+        return updated > 0
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error updating background job progress: {e}")
+        return False
+    finally:
+        db_manager.close_session(session)
+
+def import_requests_for_job(job_id, owner, project_id, items, completed, total):
+    """
+    批量导入请求并关联到项目，在同一事务中记录后台任务进度
+    任务重试时从已记录的进度继续，不会重复导入；任务已不属于该执行器时不导入并返回 None，
+    数据库错误时抛出异常，由任务执行器按重试策略处理
+    """
+    session = get_db_session()
+    try:
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        updated = session.query(BackgroundJob).filter_by(id=job_id, lease_owner=owner, status='running').update({
+            'progress_completed': completed + len(items),
+            'progress_total': total,
+            'progress_message': f"已导入 {completed + len(items)}/{total}"
+        }, synchronize_session=False)
+        if not updated:
+            rollback_session(session)
+            return None
+        request_ids = []
+        for item in items:
+            request_info = RequestInfo(
+                timestamp=timestamp,
+                url=item['url'],
+                method=item['method'],
+                headers=json.dumps(item['headers']) if item['headers'] else None,
+                body=item['body'],
+                query=json.dumps(item['query']) if item['query'] else None,
+                auth=json.dumps(item['auth']) if item['auth'] else None,
+                request_name=item['request_name'],
+                is_deleted=0
+            )
+            session.add(request_info)
+            session.flush()
+            session.add(ProjectRequestRelation(project_id=project_id, request_info_id=request_info.id,
+                                               created_at=timestamp))
+            _bump_project_versions(session, [project_id], request_info.id, 'upsert')
+            request_ids.append(request_info.id)
+        commit_session(session)
+        return request_ids
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error importing requests for job: {e}")
+        raise
+    finally:
+        db_manager.close_session(session)
+
+def finish_background_job(job_id, owner, status, result=None, error=None):
+    """结束任务（succeeded / failed / cancelled）并释放租约，任务已不属于该执行器时返回 False"""
+    session = get_db_session()
+    try:
+        updated = session.query(BackgroundJob).filter_by(id=job_id, lease_owner=owner, status='running').update({
+            'status': status,
+            'result': json.dumps(result, ensure_ascii=False) if result is not None else None,
+            'error': error,
+            'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'lease_owner': None,
+            'lease_expires_at': None
+        }, synchronize_session=False)
+        commit_session(session)
+        return updated > 0
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error finishing background job: {e}")
+        return False
+    finally:
+        db_manager.close_session(session)
+
+def retry_background_job(job_id, owner, error, run_after):
+    """执行失败但未达到最大尝试次数：重新排队到 run_after 之后执行，保留进度供任务断点续做"""
+    session = get_db_session()
+    try:
+        updated = session.query(BackgroundJob).filter_by(id=job_id, lease_owner=owner, status='running').update({
+            'status': 'queued',
+            'error': error,
+            'run_after': run_after,
+            'lease_owner': None,
+            'lease_expires_at': None
+        }, synchronize_session=False)
+        commit_session(session)
+        return updated > 0
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error retrying background job: {e}")
+        return False
+    finally:
+        db_manager.close_session(session)
+
+def cancel_background_job(job_id):
+    """
+    取消任务：排队中的任务直接取消，执行中的任务标记取消请求，由执行器在下次续租时停止
+    返回取消后的状态，任务已结束时返回 None
+    """
+    session = get_db_session()
+    try:
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        cancelled = session.query(BackgroundJob).filter_by(id=job_id, status='queued').update({
+            'status': 'cancelled',
+            'cancel_requested': 1,
+            'finished_at': now
+        }, synchronize_session=False)
+        if cancelled:
+            commit_session(session)
+            return 'cancelled'
+        requested = session.query(BackgroundJob).filter_by(id=job_id, status='running').update({
+            'cancel_requested': 1
+        }, synchronize_session=False)
+        commit_session(session)
+        return 'running' if requested else None
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error cancelling background job: {e}")
+        return None
+    finally:
+        db_manager.close_session(session)
+
+def delete_finished_background_jobs(before):
+    """删除 before 之前结束的任务，返回删除条数"""
+    session = get_db_session()
+    try:
+        deleted = session.query(BackgroundJob).filter(
+            BackgroundJob.status.notin_(JOB_ACTIVE_STATUSES),
+            BackgroundJob.finished_at < before
+        ).delete(synchronize_session=False)
+        commit_session(session)
+        return deleted
+    except Exception as e:
+        rollback_session(session)
+        log.error(f"Error deleting finished background jobs: {e}")
+        return 0
+    finally:
+        db_manager.close_session(session)
+
+# ==================== 全文搜索相关函数 ====================
+
+def _build_fts5_query(keyword):
+    """把用户输入转为 FTS5 查询：按空白切分，每段作为短语匹配，全部命中"""
+    terms = [term.replace('"', '""') for term in keyword.split()]
+    return ' '.join(f'"{term}"' for term in terms)
+
+def _search_snippet(value, keyword, width=60):
+    """截取关键字附近的文本片段"""
+    if not value:
+        return ''
+    terms = keyword.split()
+    position = -1
+    lowered = value.lower()
+    for term in terms:
+        position = lowered.find(term.lower())
+        if position >= 0:
+            break
+    if position < 0:
+        return value[:width * 2]
+    start = max(position - width, 0)
+    return ('...' if start > 0 else '') + value[start:position + width] + ('...' if position + width < len(value) else '')
+
+def _search_ids(session, table, keyword, candidate_filter, params, limit):
+    """按当前数据库的全文索引查询匹配的记录ID，按相关度排序"""
+    backend = db_manager.search_backend
+    params = dict(params, limit=limit)
+    terms = keyword.split()
+    if backend == 'fts5' and any(len(term) < SQLITE_FTS_MIN_TERM_LENGTH for term in terms):
+        backend = 'like'
+    elif backend == 'tsvector' and any(not term.isascii() for term in terms):
+        # simple 分词按空白和标点切分，中文整句为一个词，无法按子串匹配
+        backend = 'like'
+    if backend == 'fts5':
+        params['match'] = _build_fts5_query(keyword)
+        sql = (f"SELECT t.id FROM {table} t JOIN {table}_fts f ON f.rowid = t.id "
+               f"WHERE {table}_fts MATCH :match AND {candidate_filter} ORDER BY f.rank LIMIT :limit")
+    elif backend == 'tsvector':
+        params['keyword'] = keyword
+        sql = (f"SELECT t.id FROM {table} t WHERE {POSTGRESQL_SEARCH_VECTORS[table].replace('coalesce(', 'coalesce(t.')} "
+               f"@@ plainto_tsquery('simple', :keyword) AND {candidate_filter} ORDER BY t.id DESC LIMIT :limit")
+    else:
+        columns = ['url', 'request_name', 'body'] if table == 'request_info' else ['url', 'response_body']
+        clauses = []
+        for index, term in enumerate(terms):
+            params[f'term{index}'] = f'%{term}%'
+            clauses.append('(' + ' OR '.join(f"t.{column} LIKE :term{index}" for column in columns) + ')')
+        sql = (f"SELECT t.id FROM {table} t WHERE {' AND '.join(clauses)} AND {candidate_filter} "
+               f"ORDER BY t.id DESC LIMIT :limit")
+    return [row[0] for row in session.execute(text(sql), params)]
+
+def search_project_requests(project_id, keyword, user_id, user_role, scope='all', limit=20):
+    """
+    在项目内全文搜索请求定义和执行历史
+    请求匹配 url/request_name/body，历史匹配 url/response_body；历史记录的可见范围与历史查询接口一致
+    """
+    result = {'requests': [], 'history': []}
+    keyword = (keyword or '').strip()
+    if not keyword:
+        return result
+    
+    session = get_read_db_session()
+    try:
+        project_filter = ("t.{column} IN (SELECT request_info_id FROM project_request_relations "
+                          "WHERE project_id = :project_id)")
+        params = {'project_id': project_id}
+        
+        if scope in ('all', 'requests'):
+            ids = _search_ids(session, 'request_info', keyword,
+                              project_filter.format(column='id') + " AND t.is_deleted = 0", params, limit)
+            rows = {row.id: row for row in session.query(RequestInfo).filter(RequestInfo.id.in_(ids)).all()} if ids else {}
+            for request_id in ids:
+                row = rows.get(request_id)
+                if not row:
+                    continue
+                result['requests'].append({
+                    'id': row.id,
+                    'request_name': row.request_name,
+                    'method': row.method,
+                    'url': row.url,
+                    'timestamp': row.timestamp,
+                    'snippet': _search_snippet(row.body, keyword)
+                })
+        
+        if scope in ('all', 'history'):
+            history_filter = project_filter.format(column='request_info_id')
+            history_params = dict(params)
+            # 非管理员且非项目Owner只能搜索自己的执行记录
+            if user_role != 'admin' and check_user_project_permission(user_id, project_id) != 'owner':
+                user = session.query(User).filter_by(id=user_id).first()
+                if not user:
+                    return result
+                history_filter += " AND t.username = :username"
+                history_params['username'] = user.username
+            ids = _search_ids(session, 'request_history', keyword, history_filter, history_params, limit)
+            rows = {row.id: row for row in session.query(RequestHistory).filter(RequestHistory.id.in_(ids)).all()} if ids else {}
+            for history_id in ids:
+                row = rows.get(history_id)
+                if not row:
+                    continue
+                result['history'].append({
+                    'id': row.id,
+                    'request_info_id': row.request_info_id,
+                    'request_name': row.request_name,
+                    'method': row.method,
+                    'url': row.url,
+                    'timestamp': row.timestamp,
+                    'response_status': row.response_status,
+                    'username': row.username,
+                    'snippet': _search_snippet(row.response_body, keyword)
+                })
+        
+        return result
+    except Exception as e:
+        log.error(f"Error searching project requests: {e}")
+        return result
+    finally:
+        db_manager.close_session(session)
+
+
+# 会话管理等基础函数不计入 db_orm 函数指标
+_UNTRACKED_FUNCTIONS = {
+    'get_db_session', 'get_read_db_session', 'init_db', 'commit_session', 'rollback_session',
+    'release_db_connection', 'init_app', 'get_db_pool_stats'
+}
+
+def _instrument_db_functions():
+    """为本模块的公开数据访问函数加上调用次数和耗时统计"""
+    module_globals = globals()
+    for name, func in list(module_globals.items()):
+        if (name.startswith('_') or name in _UNTRACKED_FUNCTIONS or not callable(func)
+                or getattr(func, '__module__', None) != __name__ or isinstance(func, type)):
+            continue
+        module_globals[name] = track_db_function(func)
+
+_instrument_db_functions()
@@ -4,13 +4,122 @@ import time
 import logging
 import sys
 import os
+import json
+import queue
+import random
+import atexit
+import threading
 
 from logging import config
+from logging.handlers import QueueHandler, QueueListener
+
+# 日志字段默认截断长度和采样率
+DEFAULT_MAX_FIELD_LENGTH = 2048
+DEFAULT_SAMPLE_RATE = 0.01
+
+_init_lock = threading.Lock()
+_listeners = []
+_settings = {
+    'max_field_length': DEFAULT_MAX_FIELD_LENGTH,
+    'sample_rate': DEFAULT_SAMPLE_RATE
+}
+
+def init_logging():
+    """
+    初始化日志（进程内只执行一次）
+    按 logger.ini 配置 handler 后，把各 logger 的同步 handler 换成 QueueHandler，
+    由后台 QueueListener 线程负责格式化和写文件，请求线程只做入队
+    各模块导入时都会创建 MyLog，已初始化时直接返回，不再加锁
+    """
+    if _listeners:
+        return
+    with _init_lock:
+        if _listeners:
+            return
+        if not os.path.isdir("logs"):
+            os.makedirs("logs", exist_ok=True)
+        config.fileConfig(os.path.split(os.path.realpath(__file__))[0] + '/logger.ini', disable_existing_loggers=False)
+        _load_settings(subscribe=True)
+
+        # handler 组合相同的 logger 共用一个队列，保证记录只写入各自配置的 handler
+        queues = {}
+        loggers = [logging.getLogger()] + [
+            logger for logger in logging.Logger.manager.loggerDict.values()
+            if isinstance(logger, logging.Logger)
+        ]
+        for logger in loggers:
+            handlers = [handler for handler in logger.handlers if not isinstance(handler, QueueHandler)]
+            if not handlers:
+                continue
+            key = tuple(id(handler) for handler in handlers)
+            if key not in queues:
+                log_queue = queue.SimpleQueue()
+                listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+                listener.start()
+                _listeners.append(listener)
+                queues[key] = log_queue
+            for handler in handlers:
+                logger.removeHandler(handler)
+            logger.addHandler(QueueHandler(queues[key]))
+        atexit.register(stop_logging)
+
+def stop_logging():
+    """停止后台日志线程，写出队列中剩余的日志"""
+    for listener in _listeners:
+        try:
+            listener.stop()
+        except Exception:
+            pass
+
+def _load_settings(subscribe=False):
+    """读取 logging 配置段；subscribe 为 True 时在配置文件修改后重新读取"""
+    try:
+        from config import config as app_config
+        _settings.update({
+            'max_field_length': DEFAULT_MAX_FIELD_LENGTH,
+            'sample_rate': DEFAULT_SAMPLE_RATE
+        })
+        _settings.update(app_config.get('logging', {}))
+        if subscribe:
+            app_config.subscribe(lambda changed: _load_settings(), ('logging',))
+    except Exception:
+        pass
+
+class _Brief(object):
+    """延迟序列化并截断的日志字段，只有日志真正输出时才计算"""
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value, limit):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        value = self.value
+        if isinstance(value, (dict, list)):
+            try:
+                value = json.dumps(value, ensure_ascii=False, default=str)
+            except Exception:
+                value = str(value)
+        elif isinstance(value, bytes):
+            value = value[:self.limit].decode('utf-8', errors='replace')
+        else:
+            value = str(value)
+        if len(value) > self.limit:
+            return f"{value[:self.limit]}...(共{len(value)}字符)"
+        return value
+
+def brief(value, limit=None):
+    """日志字段截断：log.debug("body: %s", brief(body))"""
+    return _Brief(value, limit or _settings['max_field_length'])
+
+def should_sample(rate=None):
+    """按采样率决定是否输出高频的详细日志"""
+    rate = _settings['sample_rate'] if rate is None else rate
+    return rate > 0 and random.random() < rate
+
 class MyLog(object):
  def __init__(self):
-  if not os.path.isdir("logs"):
-      os.mkdir("logs")
-  config.fileConfig(os.path.split(os.path.realpath(__file__))[0] +'/logger.ini')
+  init_logging()
   self.logger = logging.getLogger('example01')
  def my_logger(self):
-  return self.logger
\ No newline at end of file
+  return self.logger
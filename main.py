@@ -1,6 +1,7 @@
 import os
 import time
 import logging
+import threading
 from flask import Flask, request, g
 from flask_cors import CORS
 from flask import has_request_context
@@ -10,8 +11,16 @@ from routes import register_routes
 from config import config
 # 导入数据库操作模块
 from db_orm import (
-    init_db
+    init_db, init_app
 )
+from util.xapi_access_log import register_access_log
+from util.xapi_metrics import register_metrics
+from util.xapi_profiler import register_profiler
+from util.xapi_events import register_events
+from util.xapi_pre_cache import register_pre_request_cache
+from util.xapi_monitor import start_monitor_scheduler
+from util.xapi_jobs import start_job_pool, job_pool
+from util.xapi_static import static_assets
 app = Flask(__name__)
 CORS(app)  # 启用跨域请求支持
 
@@ -20,6 +29,53 @@ app.config['JSON_AS_ASCII'] = False
 app.config['JSONIFY_MIMETYPE'] = 'application/json; charset=utf-8'
 
 register_routes(app)
+# 静态资源指纹和预压缩
+static_assets.build()
+# 结构化访问日志（先注册，after_request 倒序执行，确保在提交事务后记录）
+register_access_log(app)
+register_metrics(app)
+register_profiler(app)
+# 事务提交后再推送请求内产生的事件
+register_events(app)
+# 事务提交后再清除前置请求缓存
+register_pre_request_cache(app)
+# 请求结束时释放数据库会话
+init_app(app)
+_background_started = False
+_background_lock = threading.Lock()
+
+def start_background_services():
+    """
+    启动 Web 服务进程的后台线程，只在服务进程中执行一次
+    导入 main 时不启动：flask init-db / run-jobs 等命令也会导入本模块；gunicorn --preload 时在 master 中启动的线程也不会带到 worker
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    # 定时监控调度器（多进程部署时通过任务租约保证同一任务只执行一次）
+    start_monitor_scheduler()
+    # 后台任务执行器（jobs.enabled 为 false 时只入队，由 flask run-jobs 启动的独立进程执行）
+    start_job_pool()
+    # 配置文件修改后自动重新加载
+    config.start_watching()
+
+@app.before_request
+def ensure_background_services():
+    # gunicorn、flask run 等方式启动时，在每个 worker 进程收到第一个请求时启动
+    if not _background_started:
+        start_background_services()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """初始化数据库表结构（部署或升级后执行一次：FLASK_APP=main flask init-db）"""
+    init_db()
+
+@app.cli.command('run-jobs')
+def run_jobs_command():
+    """以独立进程运行后台任务执行器，可启动多个（FLASK_APP=main flask run-jobs）"""
+    job_pool.run_forever()
 
 if __name__ == '__main__':
     # 打印配置信息
@@ -30,6 +86,7 @@ if __name__ == '__main__':
     
     # 初始化数据库
     init_db()
+    start_background_services()
     
     # 启动Flask应用
     app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
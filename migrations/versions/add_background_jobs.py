@@ -0,0 +1,53 @@
+"""Add background_jobs table
+
+Revision ID: add_background_jobs
+Revises: add_load_tables
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_background_jobs'
+down_revision = 'add_load_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create the persistent background job queue table"""
+    op.create_table('background_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=True),
+        sa.Column('job_type', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.String(length=50), nullable=False),
+        sa.Column('lease_owner', sa.String(length=100), nullable=True),
+        sa.Column('lease_expires_at', sa.String(length=50), nullable=True),
+        sa.Column('cancel_requested', sa.Integer(), nullable=False),
+        sa.Column('progress_completed', sa.Integer(), nullable=False),
+        sa.Column('progress_total', sa.Integer(), nullable=True),
+        sa.Column('progress_message', sa.String(length=255), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.String(length=50), nullable=False),
+        sa.Column('started_at', sa.String(length=50), nullable=True),
+        sa.Column('finished_at', sa.String(length=50), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_background_jobs_project_id'), 'background_jobs', ['project_id'], unique=False)
+    op.create_index('ix_background_jobs_status_run_after', 'background_jobs', ['status', 'run_after'], unique=False)
+
+
+def downgrade():
+    """Drop the background job queue table"""
+    op.drop_index('ix_background_jobs_status_run_after', table_name='background_jobs')
+    op.drop_index(op.f('ix_background_jobs_project_id'), table_name='background_jobs')
+    op.drop_table('background_jobs')
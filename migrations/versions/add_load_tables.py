@@ -0,0 +1,73 @@
+"""Add load_workers, load_jobs and load_shards tables
+
+Revision ID: add_load_tables
+Revises: add_project_versions
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_load_tables'
+down_revision = 'add_project_versions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create distributed load worker, job and shard tables"""
+    op.create_table('load_workers',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('worker_key', sa.String(length=255), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=True),
+        sa.Column('hostname', sa.String(length=255), nullable=True),
+        sa.Column('pid', sa.Integer(), nullable=True),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.Column('registered_at', sa.String(length=50), nullable=False),
+        sa.Column('last_seen_at', sa.String(length=50), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('worker_key')
+    )
+    op.create_index(op.f('ix_load_workers_last_seen_at'), 'load_workers', ['last_seen_at'], unique=False)
+    op.create_table('load_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('spec', sa.Text(), nullable=False),
+        sa.Column('shard_count', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_by', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.String(length=50), nullable=False),
+        sa.Column('started_at', sa.String(length=50), nullable=True),
+        sa.Column('finished_at', sa.String(length=50), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_load_jobs_project_id'), 'load_jobs', ['project_id'], unique=False)
+    op.create_table('load_shards',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('shard_index', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('worker_id', sa.Integer(), nullable=True),
+        sa.Column('lease_expires_at', sa.String(length=50), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.String(length=50), nullable=True),
+        sa.Column('finished_at', sa.String(length=50), nullable=True),
+        sa.Column('results', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_load_shards_job_id'), 'load_shards', ['job_id'], unique=False)
+
+
+def downgrade():
+    """Drop distributed load tables"""
+    op.drop_index(op.f('ix_load_shards_job_id'), table_name='load_shards')
+    op.drop_table('load_shards')
+    op.drop_index(op.f('ix_load_jobs_project_id'), table_name='load_jobs')
+    op.drop_table('load_jobs')
+    op.drop_index(op.f('ix_load_workers_last_seen_at'), table_name='load_workers')
+    op.drop_table('load_workers')
@@ -0,0 +1,64 @@
+"""Add monitor_jobs and monitor_runs tables
+
+Revision ID: add_monitor_tables
+Revises: drop_user_request_relations
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_monitor_tables'
+down_revision = 'drop_user_request_relations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create monitor_jobs and monitor_runs tables"""
+    op.create_table('monitor_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('request_info_id', sa.Integer(), nullable=True),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('cron', sa.String(length=100), nullable=False),
+        sa.Column('assertions', sa.Text(), nullable=True),
+        sa.Column('enabled', sa.Integer(), nullable=False),
+        sa.Column('created_by', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.String(length=50), nullable=False),
+        sa.Column('updated_at', sa.String(length=50), nullable=True),
+        sa.Column('next_run_at', sa.String(length=50), nullable=True),
+        sa.Column('last_run_at', sa.String(length=50), nullable=True),
+        sa.Column('last_status', sa.String(length=20), nullable=True),
+        sa.Column('lease_owner', sa.String(length=100), nullable=True),
+        sa.Column('lease_expires_at', sa.String(length=50), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_monitor_jobs_project_id', 'monitor_jobs', ['project_id'])
+    op.create_index('ix_monitor_jobs_next_run_at', 'monitor_jobs', ['next_run_at'])
+    op.create_table('monitor_runs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('request_info_id', sa.Integer(), nullable=True),
+        sa.Column('started_at', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('response_status', sa.Integer(), nullable=True),
+        sa.Column('response_time', sa.Integer(), nullable=True),
+        sa.Column('response_bytes', sa.Integer(), nullable=True),
+        sa.Column('assertion_results', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_monitor_runs_job_id', 'monitor_runs', ['job_id'])
+
+
+def downgrade():
+    """Drop monitor tables"""
+    op.drop_index('ix_monitor_runs_job_id', table_name='monitor_runs')
+    op.drop_table('monitor_runs')
+    op.drop_index('ix_monitor_jobs_next_run_at', table_name='monitor_jobs')
+    op.drop_index('ix_monitor_jobs_project_id', table_name='monitor_jobs')
+    op.drop_table('monitor_jobs')
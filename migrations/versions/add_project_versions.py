@@ -0,0 +1,45 @@
+"""Add project_versions and project_request_changes tables
+
+Revision ID: add_project_versions
+Revises: add_monitor_tables
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_project_versions'
+down_revision = 'add_monitor_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create project version counter and request change log tables"""
+    op.create_table('project_versions',
+        sa.Column('project_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.String(length=50), nullable=True),
+        sa.PrimaryKeyConstraint('project_id')
+    )
+    op.create_table('project_request_changes',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('request_info_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('change_type', sa.String(length=10), nullable=False),
+        sa.Column('changed_at', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_project_request_changes_project_version', 'project_request_changes', ['project_id', 'version'])
+    # 已有项目从版本 1 开始，客户端首次同步时全量加载
+    op.execute("INSERT INTO project_versions (project_id, version) SELECT id, 1 FROM projects")
+
+
+def downgrade():
+    """Drop project version tables"""
+    op.drop_index('ix_project_request_changes_project_version', table_name='project_request_changes')
+    op.drop_table('project_request_changes')
+    op.drop_table('project_versions')
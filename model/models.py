@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -113,4 +113,135 @@ class ProjectEnv(Base):
     project_id = Column(Integer)  # 不使用外键
     env = Column(Text)
     created_at = Column(String(50), default=lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-    updated_at = Column(String(50), default=lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
\ No newline at end of file
+    updated_at = Column(String(50), default=lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+class MonitorJob(Base):
+    """定时监控任务表"""
+    __tablename__ = 'monitor_jobs'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(Integer, nullable=False, index=True)  # 不使用外键
+    request_info_id = Column(Integer)  # 为空时执行项目下全部请求
+    name = Column(String(255), nullable=False)
+    cron = Column(String(100), nullable=False)
+    assertions = Column(Text)  # JSON字符串
+    enabled = Column(Integer, nullable=False, default=1)
+    created_by = Column(Integer, nullable=False)  # 不使用外键
+    created_at = Column(String(50), nullable=False)
+    updated_at = Column(String(50))
+    next_run_at = Column(String(50), index=True)
+    last_run_at = Column(String(50))
+    last_status = Column(String(20))
+    lease_owner = Column(String(100))
+    lease_expires_at = Column(String(50))
+
+class MonitorRun(Base):
+    """定时监控执行结果表（只保存状态、耗时和断言结果，不保存响应体）"""
+    __tablename__ = 'monitor_runs'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, nullable=False, index=True)  # 不使用外键
+    project_id = Column(Integer, nullable=False)  # 不使用外键
+    request_info_id = Column(Integer)  # 不使用外键
+    started_at = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False)  # passed / failed / error
+    response_status = Column(Integer)
+    response_time = Column(Integer)
+    response_bytes = Column(Integer)
+    assertion_results = Column(Text)  # JSON字符串
+    error = Column(Text)
+
+class ProjectVersion(Base):
+    """项目请求列表版本号（请求新增、修改、复制、删除时递增）"""
+    __tablename__ = 'project_versions'
+    
+    project_id = Column(Integer, primary_key=True, autoincrement=False)  # 不使用外键
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(String(50))
+
+class ProjectRequestChange(Base):
+    """项目请求变更记录（增量同步使用，只保留最近的记录）"""
+    __tablename__ = 'project_request_changes'
+    __table_args__ = (
+        Index('ix_project_request_changes_project_version', 'project_id', 'version'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(Integer, nullable=False)  # 不使用外键
+    request_info_id = Column(Integer, nullable=False)  # 不使用外键
+    version = Column(Integer, nullable=False)
+    change_type = Column(String(10), nullable=False)  # upsert / delete
+    changed_at = Column(String(50), nullable=False)
+
+class LoadWorker(Base):
+    """分布式压测 worker（注册后定期领取分片，last_seen_at 用于判断是否在线）"""
+    __tablename__ = 'load_workers'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    worker_key = Column(String(255), unique=True, nullable=False)  # 主机名:进程号:随机串
+    name = Column(String(255))
+    hostname = Column(String(255))
+    pid = Column(Integer)
+    capacity = Column(Integer, nullable=False, default=1)  # worker 可承担的最大并发
+    registered_at = Column(String(50), nullable=False)
+    last_seen_at = Column(String(50), index=True)
+
+class LoadJob(Base):
+    """分布式压测/批量执行任务，按分片分配给多个 worker"""
+    __tablename__ = 'load_jobs'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(Integer, nullable=False, index=True)  # 不使用外键
+    name = Column(String(255), nullable=False)
+    kind = Column(String(20), nullable=False)  # load / collect
+    spec = Column(Text, nullable=False)  # JSON字符串：请求ID、并发、时长、次数、速率
+    shard_count = Column(Integer, nullable=False, default=1)
+    status = Column(String(20), nullable=False)  # pending / running / finished / failed / cancelled
+    created_by = Column(Integer, nullable=False)  # 不使用外键
+    created_at = Column(String(50), nullable=False)
+    started_at = Column(String(50))
+    finished_at = Column(String(50))
+
+class LoadShard(Base):
+    """压测任务分片，worker 领取后持有租约，上报结果时续租；租约过期的分片重新分配"""
+    __tablename__ = 'load_shards'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, nullable=False, index=True)  # 不使用外键
+    shard_index = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False)  # pending / running / finished / failed / cancelled
+    worker_id = Column(Integer)  # 不使用外键
+    lease_expires_at = Column(String(50))
+    attempts = Column(Integer, nullable=False, default=0)
+    started_at = Column(String(50))
+    finished_at = Column(String(50))
+    results = Column(Text)  # JSON字符串：{请求ID: 直方图等统计}，按上报增量累加
+    error = Column(Text)
+
+class BackgroundJob(Base):
+    """后台任务队列（批量执行、导入等耗时操作），由任务执行器按租约领取执行"""
+    __tablename__ = 'background_jobs'
+    __table_args__ = (
+        Index('ix_background_jobs_status_run_after', 'status', 'run_after'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(Integer, index=True)  # 不使用外键
+    job_type = Column(String(50), nullable=False)
+    payload = Column(Text)  # JSON字符串
+    status = Column(String(20), nullable=False)  # queued / running / succeeded / failed / cancelled
+    priority = Column(Integer, nullable=False, default=0)  # 数值大的先执行
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(String(50), nullable=False)  # 重试时推迟到该时间之后
+    lease_owner = Column(String(100))
+    lease_expires_at = Column(String(50))
+    cancel_requested = Column(Integer, nullable=False, default=0)
+    progress_completed = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer)
+    progress_message = Column(String(255))
+    result = Column(Text)  # JSON字符串
+    error = Column(Text)
+    created_by = Column(Integer)  # 不使用外键
+    created_at = Column(String(50), nullable=False)
+    started_at = Column(String(50))
+    finished_at = Column(String(50))
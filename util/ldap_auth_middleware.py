@@ -1,6 +1,4 @@
 import re
-from ldap3 import Server, Connection, Tls
-import ssl
 import logging
 from typing import Optional, Dict
 import sys
@@ -17,16 +15,28 @@ class CachedLDAPAuth:
     def __init__(self, ldap_config: Dict = None):
         # 初始化LDAP配置，如果没有传入则使用配置文件中的配置
         self.ldap_config = ldap_config or config.ldap_config
-        self.tls = Tls(validate=ssl.CERT_REQUIRED) if self.ldap_config.get('use_ssl') else None
+
+    @property
+    def enabled(self) -> bool:
+        """是否配置了LDAP服务器"""
+        return bool(self.ldap_config.get('server'))
 
     def _ldap_auth(self, username: str, password: str) -> bool:
         """执行LDAP认证"""
         try:
+            # ldap3 和 ssl 导入较慢，只在实际进行LDAP认证时加载，未使用LDAP的部署不必安装 ldap3
+            from ldap3 import Server, Connection, Tls
+            import ssl
+        except ImportError:
+            logger.error("未安装 ldap3，无法进行LDAP认证")
+            return False
+        try:
+            tls = Tls(validate=ssl.CERT_REQUIRED) if self.ldap_config.get('use_ssl') else None
             server = Server(
                 host=self.ldap_config['server'],
                 port=self.ldap_config.get('port', 636),
                 use_ssl=self.ldap_config.get('use_ssl', True),
-                tls=self.tls
+                tls=tls
             )
 
             # 自动发现用户DN
@@ -66,6 +76,9 @@ class CachedLDAPAuth:
         result = {"success": False, "username": "", "from_cache": False}
         try:
             result["username"] = username
+            if not self.enabled:
+                logger.warning(f"未配置LDAP服务器，跳过LDAP认证: {username}")
+                return result
             # LDAP认证
             if self._ldap_auth(username, password):
                 result["success"] = True
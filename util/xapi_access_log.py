@@ -0,0 +1,67 @@
+import json
+import time
+import logging
+from datetime import datetime
+from flask import request, g, has_request_context
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 结构化访问日志，由 logger.ini 中的 xapi_access logger 写入独立文件
+access_log = logging.getLogger('xapi_access')
+
+def add_upstream_time(elapsed_ms):
+    """累计当前请求调用上游接口的耗时"""
+    if has_request_context():
+        g.upstream_ms = g.get('upstream_ms', 0) + elapsed_ms
+
+def add_db_time(elapsed_ms):
+    """累计当前请求的数据库耗时和语句数"""
+    if has_request_context():
+        g.db_ms = g.get('db_ms', 0) + elapsed_ms
+        g.db_queries = g.get('db_queries', 0) + 1
+
+def _request_project_id():
+    """从路径参数、查询参数或 JSON 请求体中获取 project_id"""
+    project_id = (request.view_args or {}).get('project_id') or request.args.get('project_id')
+    if project_id is None and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            project_id = data.get('project_id')
+    try:
+        return int(project_id) if project_id is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def register_access_log(app):
+    """注册访问日志钩子，每个请求输出一行 JSON"""
+    @app.before_request
+    def start_access_timer():
+        g.request_started_at = time.perf_counter()
+
+    @app.after_request
+    def write_access_log(response):
+        if not access_log.isEnabledFor(logging.INFO):
+            return response
+        try:
+            started_at = g.get('request_started_at')
+            record = {
+                'ts': datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+                'method': request.method,
+                'route': request.url_rule.rule if request.url_rule else None,
+                'path': request.path,
+                'user': g.get('username'),
+                'project_id': _request_project_id(),
+                'status': response.status_code,
+                'server_ms': round((time.perf_counter() - started_at) * 1000, 2) if started_at else None,
+                'upstream_ms': round(g.get('upstream_ms', 0), 2),
+                'db_ms': round(g.get('db_ms', 0), 2),
+                'db_queries': g.get('db_queries', 0),
+                'bytes_in': request.content_length or 0,
+                # 流式响应长度未知，记为 None
+                'bytes_out': None if response.is_streamed else response.content_length,
+                'remote_addr': request.headers.get('X-Forwarded-For', request.remote_addr)
+            }
+            access_log.info(json.dumps(record, ensure_ascii=False, default=str))
+        except Exception as e:
+            log.error(f"写入访问日志失败: {e}")
+        return response
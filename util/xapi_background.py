@@ -0,0 +1,79 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from log_base import MyLog
+log = MyLog().my_logger()
+
+class PollingService:
+    """
+    后台轮询服务（定时监控调度器、后台任务执行器共用）
+    一个调度线程每隔 poll_interval 秒调用 poll()，任务交给有界线程池执行；
+    子类实现 options()（需包含 enabled、poll_interval、max_workers）和 poll()
+    """
+
+    # 日志中的服务名称和线程名前缀，由子类覆盖
+    display_name = '后台服务'
+    thread_name = 'xapi-background'
+
+    def __init__(self):
+        self._thread = None
+        self._executor = None
+        self._stop = None
+        self.max_workers = 0
+        self._lifecycle_lock = threading.Lock()
+
+    def options(self):
+        raise NotImplementedError
+
+    def poll(self):
+        raise NotImplementedError
+
+    def enabled(self, options):
+        return options['enabled']
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lifecycle_lock:
+            if self.running:
+                return
+            options = self.options()
+            self.max_workers = options['max_workers']
+            # 每次启动使用新的停止信号和线程：旧线程可能仍在执行本轮 poll，不能复用旧的停止信号
+            stop = self._stop = threading.Event()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.thread_name)
+            self._thread = threading.Thread(target=self._loop, args=(stop,), name=f'{self.thread_name}-loop', daemon=True)
+            self._thread.start()
+        log.info(f"{self.display_name}已启动 - workers: {self.max_workers}")
+
+    def stop(self):
+        """通知调度线程退出，线程池不再接收新任务，执行中的任务继续完成"""
+        with self._lifecycle_lock:
+            if self._stop is not None:
+                self._stop.set()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._thread = None
+
+    def submit(self, fn, *args):
+        return self._executor.submit(fn, *args)
+
+    def apply_options(self, changed=None):
+        """按当前配置启动或停止，线程数变化时以新的线程池重新启动（执行中的任务不受影响）"""
+        options = self.options()
+        if not self.enabled(options):
+            if self.running:
+                self.stop()
+                log.info(f"{self.display_name}已停止")
+            return
+        if self.running and self.max_workers != options['max_workers']:
+            self.stop()
+        self.start()
+
+    def _loop(self, stop):
+        while not stop.wait(self.options()['poll_interval']):
+            try:
+                self.poll()
+            except Exception as e:
+                log.error(f"{self.display_name}调度失败: {e}")
@@ -0,0 +1,217 @@
+import os
+import re
+import time
+import uuid
+import threading
+from config import config
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 响应体大小限制默认值（字节）
+DEFAULT_BODY_LIMITS = {
+    'max_inline_bytes': 1024 * 1024,        # 超过该大小的响应体写入磁盘，只保留预览
+    'preview_bytes': 64 * 1024,             # 落盘时内存/历史记录中保留的预览大小
+    'max_body_bytes': 500 * 1024 * 1024,    # 单个响应体读取上限，超过后截断
+    'chunk_size': 64 * 1024,
+    'blob_dir': 'blobs',
+    'blob_retention_days': 7,               # 落盘响应体的保留天数，过期后删除（历史记录仍保留预览）
+    'max_blob_dir_bytes': 10 * 1024 ** 3,   # 落盘目录总大小上限，超过时从最旧的文件开始删除
+    'blob_cleanup_interval': 600            # 两次清理之间的最短间隔（秒）
+}
+# 最近修改过的文件可能仍在写入，按总大小清理时跳过
+BLOB_CLEANUP_GRACE_SECONDS = 60
+
+BLOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+def get_body_limits():
+    """获取响应体大小限制配置"""
+    return config.section('response_body', DEFAULT_BODY_LIMITS)
+
+def get_blob_dir():
+    """获取响应体落盘目录，相对路径相对于项目根目录"""
+    blob_dir = get_body_limits()['blob_dir']
+    if not os.path.isabs(blob_dir):
+        blob_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), blob_dir)
+    return blob_dir
+
+def get_blob_path(blob_id):
+    """根据 blob_id 获取文件路径，非法 id 返回 None"""
+    if not blob_id or not BLOB_ID_PATTERN.match(blob_id):
+        return None
+    return os.path.join(get_blob_dir(), blob_id)
+
+class ResponseBody:
+    """
+    上游响应体
+    小响应体完整保存在 content 中；大响应体写入 blob 文件，content 只保留前 preview_bytes 字节
+    """
+
+    def __init__(self, encoding=None):
+        self.encoding = encoding or 'utf-8'
+        self.content = b''
+        self.size = 0
+        self.blob_id = None
+        self.truncated = False
+        self._text = None
+
+    @property
+    def spilled(self):
+        return self.blob_id is not None
+
+    def text(self):
+        """按响应编码解码 content，结果缓存，只解码一次"""
+        if self._text is None:
+            self._text = self.content.decode(self.encoding, errors='replace')
+        return self._text
+
+    def utf8_content(self):
+        """UTF-8 编码的响应体字节，原本就是 UTF-8 时直接返回原始字节"""
+        if self.encoding.lower().replace('_', '-') in ('utf-8', 'utf8'):
+            return self.content
+        return self.text().encode('utf-8')
+
+    def blob_info(self):
+        """历史记录和前端使用的 blob 引用信息"""
+        if not self.spilled:
+            return None
+        return {
+            'id': self.blob_id,
+            'size': self.size,
+            'preview_bytes': len(self.content),
+            'truncated': self.truncated
+        }
+
+def read_response_body(response):
+    """
+    分块读取上游响应体（需以 stream=True 发起请求）
+    超过 max_inline_bytes 后写入 blob 文件，超过 max_body_bytes 后停止读取并标记截断
+    """
+    limits = get_body_limits()
+    body = ResponseBody(response.encoding)
+    buffer = bytearray()
+    blob_file = None
+    try:
+        for chunk in response.iter_content(chunk_size=limits['chunk_size']):
+            if not chunk:
+                continue
+            remaining = limits['max_body_bytes'] - body.size
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+                body.truncated = True
+            body.size += len(chunk)
+
+            if blob_file is None:
+                buffer.extend(chunk)
+                if len(buffer) > limits['max_inline_bytes']:
+                    body.blob_id = uuid.uuid4().hex
+                    os.makedirs(get_blob_dir(), exist_ok=True)
+                    blob_file = open(get_blob_path(body.blob_id), 'wb')
+                    blob_file.write(buffer)
+                    del buffer[limits['preview_bytes']:]
+            else:
+                blob_file.write(chunk)
+
+            if body.truncated:
+                break
+    except Exception:
+        # 读取上游失败时删除写了一半的 blob 文件
+        if blob_file is not None:
+            blob_file.close()
+            blob_file = None
+            _remove_blob(body.blob_id)
+        raise
+    finally:
+        if blob_file is not None:
+            blob_file.close()
+        if body.truncated:
+            response.close()
+
+    body.content = bytes(buffer)
+    if body.spilled:
+        log.info(f"响应体过大已写入磁盘 - blob: {body.blob_id}, size: {body.size}, truncated: {body.truncated}")
+        schedule_blob_cleanup()
+    return body
+
+def _remove_blob(blob_id):
+    path = get_blob_path(blob_id)
+    try:
+        if path:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log.warning(f"删除响应体文件失败 - blob: {blob_id}, error: {e}")
+
+def cleanup_blobs():
+    """
+    删除超过 blob_retention_days 的 blob 文件，总大小仍超过 max_blob_dir_bytes 时从最旧的文件开始删除
+    历史记录不会被删除，引用的 blob 不存在时读取接口返回 410，历史中的预览仍可查看
+    """
+    limits = get_body_limits()
+    blob_dir = get_blob_dir()
+    try:
+        names = os.listdir(blob_dir)
+    except FileNotFoundError:
+        return 0
+    now = time.time()
+    expire_before = now - limits['blob_retention_days'] * 86400
+    files = []
+    removed = 0
+    for name in names:
+        if not BLOB_ID_PATTERN.match(name):
+            continue
+        try:
+            stat = os.stat(os.path.join(blob_dir, name))
+        except FileNotFoundError:
+            continue
+        if stat.st_mtime < expire_before:
+            _remove_blob(name)
+            removed += 1
+        else:
+            files.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in files)
+    for mtime, size, name in sorted(files):
+        if total <= limits['max_blob_dir_bytes']:
+            break
+        if mtime > now - BLOB_CLEANUP_GRACE_SECONDS:
+            break
+        _remove_blob(name)
+        total -= size
+        removed += 1
+    if removed:
+        log.info(f"已清理落盘响应体 {removed} 个")
+    return removed
+
+_cleanup_lock = threading.Lock()
+_last_cleanup = 0.0
+
+def schedule_blob_cleanup():
+    """写入新的 blob 后按 blob_cleanup_interval 在后台线程清理一次，同一时间只有一个清理线程"""
+    global _last_cleanup
+    with _cleanup_lock:
+        if time.monotonic() - _last_cleanup < get_body_limits()['blob_cleanup_interval']:
+            return
+        _last_cleanup = time.monotonic()
+
+    def run():
+        try:
+            cleanup_blobs()
+        except Exception as e:
+            log.error(f"清理落盘响应体失败: {e}")
+    threading.Thread(target=run, name='xapi-blob-cleanup', daemon=True).start()
+
+def read_blob_range(blob_id, offset=0, length=None):
+    """
+    读取 blob 文件的指定区间
+    返回 (数据, 文件总大小)，文件不存在时返回 (None, 0)
+    """
+    path = get_blob_path(blob_id)
+    if not path or not os.path.isfile(path):
+        return None, 0
+    total = os.path.getsize(path)
+    offset = min(max(offset, 0), total)
+    if length is None:
+        length = get_body_limits()['preview_bytes']
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(max(length, 0)), total
@@ -0,0 +1,31 @@
+import hashlib
+from flask import request, Response
+
+# 接口数据与用户权限相关，只允许浏览器私有缓存，每次使用前通过 ETag 协商
+PRIVATE_REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+def etag_matches(etag):
+    """请求的 If-None-Match 是否包含 etag（弱比较：代理可能把强 ETag 改为 W/ 前缀）"""
+    if_none_match = request.headers.get('If-None-Match', '')
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().replace('W/', '', 1) for tag in if_none_match.split(',')}
+    return '*' in candidates or etag.replace('W/', '', 1) in candidates
+
+def not_modified(etag, cache_control=PRIVATE_REVALIDATE_CACHE_CONTROL, headers=None):
+    """304 响应"""
+    response_headers = {'ETag': etag, 'Cache-Control': cache_control}
+    response_headers.update(headers or {})
+    return Response(status=304, headers=response_headers)
+
+def with_etag(response, etag, cache_control=PRIVATE_REVALIDATE_CACHE_CONTROL):
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def content_etag_response(response):
+    """按响应内容计算 ETag，内容未变化时返回 304（适用于无法用版本号判断变化的小列表）"""
+    etag = f'"{hashlib.sha1(response.get_data()).hexdigest()[:20]}"'
+    if etag_matches(etag):
+        return not_modified(etag)
+    return with_etag(response, etag)
@@ -0,0 +1,250 @@
+import os
+import time
+import queue
+import threading
+import itertools
+from collections import deque
+from flask import g, has_request_context
+from config import config
+from util import xapi_json
+from util.xapi_metrics import registry
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 多进程部署时通过 Redis 在进程间转发事件，未安装 redis 时只能使用进程内分发
+try:
+    import redis
+except ImportError:
+    redis = None
+
+DEFAULT_EVENT_OPTIONS = {
+    'broker': 'memory',             # memory: 进程内分发；redis: 通过 Redis 在多个进程间转发
+    'redis_url': 'redis://localhost:6379/0',
+    'redis_channel': 'xapi:events',
+    'ticket_ttl': 60,               # EventSource 连接票据有效期（秒）
+    'heartbeat_interval': 15,       # 无事件时发送注释行保持连接，避免被代理断开
+    'retry_ms': 3000,               # 浏览器断线重连间隔
+    'max_stream_seconds': 600,      # 单个连接最长保持时间，到期后由浏览器重连，便于回收线程和刷新票据
+    'subscriber_queue_size': 500,   # 单个订阅者待发送事件上限，满时丢弃最旧的事件
+    'replay_size': 500              # 保留最近的事件，用于断线重连时按 Last-Event-ID 补发
+}
+
+EVENTS_PUBLISHED = registry.counter('xapi_events_published_total', '推送事件数', ('type',))
+EVENTS_DROPPED = registry.counter('xapi_events_dropped_total', '订阅者处理过慢被丢弃的事件数', ('type',))
+
+def get_event_options():
+    return config.section('events', DEFAULT_EVENT_OPTIONS)
+
+def project_channel(project_id):
+    return f"project:{int(project_id)}"
+
+def project_history_channel(project_id):
+    """项目的历史记录事件频道，只有项目 owner 和管理员可以订阅（与历史记录的查看权限一致）"""
+    return f"project:{int(project_id)}:history"
+
+def user_channel(user_id):
+    return f"user:{int(user_id)}"
+
+class Subscription:
+    """一个 SSE 连接订阅的频道集合和待发送事件队列"""
+
+    def __init__(self, broker, channels, maxsize):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, event):
+        """放入事件，队列已满时丢弃最旧的事件，保证发布方不被慢连接阻塞"""
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    dropped = self.queue.get_nowait()
+                    EVENTS_DROPPED.inc(dropped['type'])
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        """等待下一个事件，超时返回 None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class InProcessBroker:
+    """
+    进程内发布/订阅
+    事件按频道分发给本进程的订阅者；单进程部署使用，多进程部署需换成共享的代理（见 RedisBroker）
+    """
+
+    def __init__(self, options=None):
+        self.options = options or get_event_options()
+        self._subscribers = {}      # 频道 -> 订阅集合
+        self._recent = deque(maxlen=self.options['replay_size'])
+        self._lock = threading.Lock()
+        # 事件ID：进程标识 + 递增序号，多进程转发时仍保持唯一
+        self._prefix = f"{int(time.time() * 1000):x}{os.getpid():x}"
+        self._sequence = itertools.count(1)
+
+    def _new_event(self, channels, event_type, data):
+        return {
+            'id': f"{self._prefix}-{next(self._sequence)}",
+            'type': event_type,
+            'channels': list(channels),
+            'data': data
+        }
+
+    def publish(self, channels, event_type, data):
+        """向多个频道发布同一事件，同时订阅多个频道的连接只收到一次"""
+        event = self._new_event(channels, event_type, data)
+        EVENTS_PUBLISHED.inc(event_type)
+        self._dispatch(event)
+        return event
+
+    def _dispatch(self, event):
+        with self._lock:
+            self._recent.append(event)
+            targets = set()
+            for channel in event['channels']:
+                targets.update(self._subscribers.get(channel, ()))
+        for subscription in targets:
+            subscription.put(event)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, self.options['subscriber_queue_size'])
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def replay(self, channels, last_event_id):
+        """返回 last_event_id 之后发布到这些频道的事件；该事件已不在缓冲区时返回空列表"""
+        channels = set(channels)
+        with self._lock:
+            recent = list(self._recent)
+        for index, event in enumerate(recent):
+            if event['id'] == last_event_id:
+                return [item for item in recent[index + 1:] if channels.intersection(item['channels'])]
+        return []
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(set().union(*self._subscribers.values())) if self._subscribers else 0
+
+class RedisBroker(InProcessBroker):
+    """
+    通过 Redis 发布/订阅在多个进程间转发事件
+    每个进程只建立一个 Redis 订阅，收到的事件再按频道分发给本进程的连接
+    """
+
+    def __init__(self, options=None):
+        super().__init__(options)
+        if redis is None:
+            raise RuntimeError('未安装 redis，无法使用 Redis 事件代理')
+        self.client = redis.Redis.from_url(self.options['redis_url'])
+        self.redis_channel = self.options['redis_channel']
+        self._listener = threading.Thread(target=self._listen, name='xapi-event-listener', daemon=True)
+        self._listener.start()
+
+    def publish(self, channels, event_type, data):
+        event = self._new_event(channels, event_type, data)
+        EVENTS_PUBLISHED.inc(event_type)
+        try:
+            self.client.publish(self.redis_channel, xapi_json.dumps(event))
+        except Exception as e:
+            # Redis 不可用时至少保证本进程的订阅者能收到
+            log.error(f"发布事件到 Redis 失败，仅在本进程分发: {e}")
+            self._dispatch(event)
+        return event
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.redis_channel)
+                for message in pubsub.listen():
+                    try:
+                        self._dispatch(xapi_json.loads(message['data']))
+                    except Exception as e:
+                        log.error(f"处理 Redis 事件失败: {e}")
+            except Exception as e:
+                log.error(f"Redis 事件订阅中断，稍后重连: {e}")
+                time.sleep(1)
+
+_BROKERS = {'memory': InProcessBroker, 'redis': RedisBroker}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_event_broker():
+    """按 events.broker 配置创建全局事件代理"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                options = get_event_options()
+                broker_class = _BROKERS.get(options['broker'])
+                if broker_class is None:
+                    log.error(f"未知的事件代理类型 {options['broker']}，改用进程内分发")
+                    broker_class = InProcessBroker
+                try:
+                    _broker = broker_class(options)
+                except Exception as e:
+                    log.error(f"创建事件代理失败，改用进程内分发: {e}")
+                    _broker = InProcessBroker(options)
+    return _broker
+
+def set_event_broker(broker):
+    """替换全局事件代理（需实现 publish/subscribe/unsubscribe/replay）"""
+    global _broker
+    with _broker_lock:
+        _broker = broker
+
+def publish(channels, event_type, data):
+    """立即发布事件，发布失败只记录日志，不影响业务流程"""
+    try:
+        return get_event_broker().publish(channels, event_type, data)
+    except Exception as e:
+        log.error(f"发布事件失败 - type: {event_type}, error: {e}")
+        return None
+
+def publish_after_commit(channels, event_type, data):
+    """
+    请求内产生的数据变更事件在工作单元提交后再发布，避免客户端收到事件后读不到数据
+    请求上下文之外（后台线程）直接发布
+    """
+    if not has_request_context():
+        return publish(channels, event_type, data)
+    pending = g.get('pending_events')
+    if pending is None:
+        pending = g.pending_events = []
+    pending.append((channels, event_type, data))
+    return None
+
+def register_events(app):
+    """注册请求结束时发布待发送事件的钩子，需在 db_orm.init_app 之前注册（after_request 倒序执行）"""
+    @app.after_request
+    def flush_pending_events(response):
+        pending = g.pop('pending_events', None)
+        if pending and not (g.get('db_commit_failed') or g.get('db_unit_rolled_back')):
+            for channels, event_type, data in pending:
+                publish(channels, event_type, data)
+        return response
+
+registry.gauge('xapi_event_subscribers', '当前进程的事件订阅连接数',
+               lambda: _broker.subscriber_count() if _broker is not None else 0)
@@ -0,0 +1,191 @@
+import math
+
+# 只依赖标准库：压测 worker 在没有数据库和 Flask 配置的机器上也要导入本模块
+
+# 桶宽度按 2% 相对误差划分（对数分桶），1 微秒 ~ 1 小时只需约 1100 个桶，实际只保存出现过的桶
+DEFAULT_PRECISION = 0.02
+
+class LatencyHistogram:
+    """
+    可合并的耗时直方图
+    按对数分桶记录耗时（毫秒），只保存非空桶，序列化后体积与样本数无关；
+    多个 worker、多次上报的直方图按桶相加即可合并，分位数误差不超过桶的相对宽度
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value_ms):
+        # 以微秒为单位分桶，小于 1 微秒的耗时都落在第 0 个桶
+        return int(math.log(max(value_ms * 1000, 1.0)) / self._log_base)
+
+    def _bucket_value(self, index):
+        """桶的代表值（毫秒），取桶上下界的几何中点"""
+        return math.exp((index + 0.5) * self._log_base) / 1000
+
+    def record(self, value_ms):
+        index = self._index(value_ms)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+
+    def merge(self, other):
+        """合并另一个直方图（分桶精度需相同）"""
+        if other.precision != self.precision:
+            raise ValueError('直方图精度不同，无法合并')
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * pct / 100))
+        cumulative = 0
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative >= rank:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'min_ms': round(self.min, 3),
+            'mean_ms': round(self.total / self.count, 3),
+            'p50_ms': round(self.percentile(50), 3),
+            'p90_ms': round(self.percentile(90), 3),
+            'p95_ms': round(self.percentile(95), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(self.max, 3)
+        }
+
+    def to_dict(self):
+        return {
+            'precision': self.precision,
+            'buckets': {str(index): count for index, count in self.buckets.items()},
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data.get('precision', DEFAULT_PRECISION))
+        histogram.buckets = {int(index): int(count) for index, count in (data.get('buckets') or {}).items()}
+        histogram.count = int(data.get('count', 0))
+        histogram.total = float(data.get('sum', 0.0))
+        histogram.min = data.get('min')
+        histogram.max = data.get('max')
+        return histogram
+
+class RequestStats:
+    """单个请求的压测统计：耗时直方图、状态码计数、错误计数和响应字节数"""
+
+    # 保留的错误信息样例数
+    MAX_ERROR_SAMPLES = 5
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statuses = {}
+        self.errors = 0
+        self.error_samples = []
+        self.bytes = 0
+
+    def record(self, elapsed_ms, status=None, size=0, error=None):
+        """记录一次请求；请求异常（无响应）时 status 为 None 并传入 error"""
+        if error is not None:
+            self.errors += 1
+            if len(self.error_samples) < self.MAX_ERROR_SAMPLES and error not in self.error_samples:
+                self.error_samples.append(error)
+            return
+        self.latency.record(elapsed_ms)
+        key = str(status)
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        self.bytes += size
+
+    @property
+    def requests(self):
+        return self.latency.count + self.errors
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.errors += other.errors
+        for sample in other.error_samples:
+            if len(self.error_samples) < self.MAX_ERROR_SAMPLES and sample not in self.error_samples:
+                self.error_samples.append(sample)
+        self.bytes += other.bytes
+        return self
+
+    def summary(self):
+        failed = sum(count for status, count in self.statuses.items() if int(status) >= 400)
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'failed': failed,
+            'statuses': dict(self.statuses),
+            'bytes': self.bytes,
+            'latency': self.latency.summary(),
+            'error_samples': list(self.error_samples)
+        }
+
+    def to_dict(self):
+        return {
+            'latency': self.latency.to_dict(),
+            'statuses': dict(self.statuses),
+            'errors': self.errors,
+            'error_samples': list(self.error_samples),
+            'bytes': self.bytes
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.latency = LatencyHistogram.from_dict(data.get('latency') or {})
+        stats.statuses = {str(status): int(count) for status, count in (data.get('statuses') or {}).items()}
+        stats.errors = int(data.get('errors', 0))
+        stats.error_samples = list(data.get('error_samples') or [])[:cls.MAX_ERROR_SAMPLES]
+        stats.bytes = int(data.get('bytes', 0))
+        return stats
+
+def merge_results(target, delta):
+    """
+    合并两份 {请求ID: RequestStats.to_dict()} 结果，返回新的字典
+    worker 每次只上报上次上报之后的增量，服务端按请求累加
+    """
+    merged = dict(target or {})
+    for key, data in (delta or {}).items():
+        stats = RequestStats.from_dict(data)
+        if key in merged:
+            stats = RequestStats.from_dict(merged[key]).merge(stats)
+        merged[str(key)] = stats.to_dict()
+    return merged
+
+def summarize_results(results):
+    """把合并后的结果转换为每个请求的摘要和全部请求的汇总"""
+    total = RequestStats()
+    requests = {}
+    for key, data in (results or {}).items():
+        stats = RequestStats.from_dict(data)
+        total.merge(stats)
+        requests[key] = stats.summary()
+    return {'total': total.summary(), 'requests': requests}
@@ -0,0 +1,67 @@
+import queue
+import threading
+from config import config
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 历史记录写入队列默认长度
+DEFAULT_HISTORY_QUEUE_SIZE = 1000
+
+class HistoryWriter:
+    """
+    后台历史记录写入器
+    在请求上下文之外产生的历史记录（如流式响应结束时）交给后台线程写库，不阻塞调用方
+    """
+
+    def __init__(self, maxsize=None):
+        self.queue = queue.Queue(maxsize=maxsize or config.get('history_queue_size', DEFAULT_HISTORY_QUEUE_SIZE))
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='xapi-history-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        # 延迟导入，避免与 db_orm 循环依赖
+        from db_orm import save_to_history
+        while True:
+            history, on_saved = self.queue.get()
+            try:
+                self._save(save_to_history, history, on_saved)
+            except Exception as e:
+                log.error(f"后台写入历史记录失败: {e}")
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def _save(save_to_history, history, on_saved):
+        history_id = save_to_history(**history)
+        if history_id and on_saved is not None:
+            on_saved(history_id)
+
+    def submit(self, on_saved=None, **history):
+        """提交一条历史记录，队列已满时在当前线程直接写入；写入成功后以历史记录ID调用 on_saved"""
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((history, on_saved))
+        except queue.Full:
+            log.warning("历史记录写入队列已满，改为同步写入")
+            from db_orm import save_to_history
+            self._save(save_to_history, history, on_saved)
+
+    def depth(self):
+        """当前排队中的历史记录数"""
+        return self.queue.qsize()
+
+    def flush(self):
+        """等待队列中的历史记录全部写入"""
+        if self._thread is not None:
+            self.queue.join()
+
+# 全局历史记录写入器
+history_writer = HistoryWriter()
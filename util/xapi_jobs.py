@@ -0,0 +1,428 @@
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+from config import config
+from util.xapi_metrics import registry
+from util.xapi_events import publish, project_channel
+from util.xapi_background import PollingService
+from util.xapi_monitor import TIME_FORMAT, validate_assertions, evaluate_assertions, assertion_body_limit
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 后台任务默认参数
+DEFAULT_JOB_OPTIONS = {
+    'enabled': True,                    # Web 进程内是否执行后台任务，关闭后可用 flask run-jobs 单独运行执行器
+    'poll_interval': 2,                 # 领取任务和续租的间隔（秒）
+    'max_workers': 2,                   # 同时执行的任务数
+    'lease_seconds': 60,                # 任务租约，执行进程退出后租约过期的任务会被重新领取
+    'max_attempts': 3,                  # 每个任务最多执行的次数（含重试）
+    'retry_backoff_seconds': 10,        # 第 n 次重试前等待 retry_backoff_seconds * 2^(n-1) 秒
+    'max_retry_delay': 600,
+    'progress_interval': 1,             # 进度写库和推送事件的最小间隔（秒）
+    'retention_days': 7,                # 已结束任务的保留天数
+    'pre_request_cache_ttl': 300,
+    'max_requests_per_job': 1000,       # 批量执行任务最多包含的请求数
+    'max_result_runs': 1000,            # 批量执行结果中保留的明细条数，超出部分只计入汇总
+    'max_import_requests': 5000,        # 单个导入任务最多导入的请求数
+    'import_batch_size': 100
+}
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+IMPORT_METHODS = ('GET', 'POST', 'PUT', 'DELETE', 'PATCH')
+# 清理已结束任务的间隔（秒）
+CLEANUP_INTERVAL = 3600
+
+JOB_RUNS = registry.counter('xapi_jobs_total', '后台任务执行结束数', ('type', 'status'))
+JOB_DURATION = registry.histogram('xapi_job_duration_seconds', '后台任务单次执行耗时', ('type',),
+                                  buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600))
+
+def get_job_options():
+    return config.section('jobs', DEFAULT_JOB_OPTIONS)
+
+class JobCancelled(Exception):
+    """任务被取消或已被其他执行器接管，result 为截至取消时的部分结果"""
+
+    def __init__(self, result=None):
+        super().__init__('任务已取消')
+        self.result = result
+
+class JobFailed(Exception):
+    """不可重试的失败（参数错误、数据已删除等），任务直接标记为失败"""
+
+# ---------- 任务类型 ----------
+
+# {任务类型: (执行函数, 参数校验函数)}
+_JOB_TYPES = {}
+
+def job_type(name, validate):
+    """
+    注册任务类型
+    validate(project_id, payload) 在入队前校验并规范化参数，参数错误时抛出 ValueError；
+    执行函数 handler(context, payload) 在执行器线程中运行，返回可 JSON 序列化的结果
+    """
+    def decorator(handler):
+        _JOB_TYPES[name] = (handler, validate)
+        return handler
+    return decorator
+
+def job_types():
+    return sorted(_JOB_TYPES)
+
+def validate_job_payload(name, project_id, payload):
+    if name not in _JOB_TYPES:
+        raise ValueError(f"任务类型不支持，可选: {', '.join(job_types())}")
+    if not isinstance(payload, dict):
+        raise ValueError('payload 必须是对象')
+    return _JOB_TYPES[name][1](project_id, payload)
+
+class JobContext:
+    """传给任务执行函数的上下文：上报进度、检查是否被取消"""
+
+    def __init__(self, job, owner):
+        self.job = job
+        self.owner = owner
+        self.cancel_event = threading.Event()
+        # 租约已被其他执行器接管，任务结果不再保存
+        self.lost = False
+        self._last_progress = 0.0
+
+    @property
+    def attempt(self):
+        return self.job['attempts']
+
+    @property
+    def resume_from(self):
+        """上次执行已记录的进度，支持断点续做的任务从这里继续"""
+        return self.job['progress']['completed'] or 0
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self, result=None):
+        if self.cancel_event.is_set():
+            raise JobCancelled(result)
+
+    def progress(self, completed, total=None, message=None, force=False):
+        """记录进度并推送 job_progress 事件，按 progress_interval 限制频率"""
+        from db_orm import update_background_job_progress
+        now = time.monotonic()
+        if not force and now - self._last_progress < get_job_options()['progress_interval']:
+            return
+        self._last_progress = now
+        if not update_background_job_progress(self.job['id'], self.owner, completed, total, message):
+            self.lost = True
+            self.cancel_event.set()
+            return
+        publish_job_event(self.job, 'running', completed=completed, total=total, message=message)
+
+def publish_job_event(job, status, **data):
+    if job.get('project_id'):
+        publish([project_channel(job['project_id'])], 'job_progress',
+                dict(data, job_id=job['id'], job_type=job['job_type'], status=status))
+
+# ---------- 执行器 ----------
+
+class JobWorkerPool(PollingService):
+    """
+    后台任务执行器
+    后台线程定期从数据库领取排队的任务（带租约，多进程部署时每个任务只被一个执行器领取）交给有界线程池执行，
+    并为执行中的任务续租、检查取消请求；执行失败的任务按指数退避重新排队，达到最大次数后标记为失败
+    """
+
+    display_name = '后台任务执行器'
+    thread_name = 'xapi-job'
+
+    def __init__(self):
+        super().__init__()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # flask run-jobs 启动的独立执行器不受 jobs.enabled 影响
+        self.dedicated = False
+        self._contexts = {}
+        self._contexts_lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def options(self):
+        return get_job_options()
+
+    def enabled(self, options):
+        return options['enabled'] or self.dedicated
+
+    def poll(self):
+        self.renew_leases()
+        self.dispatch_jobs()
+        self._cleanup()
+
+    def run_forever(self):
+        """作为独立进程运行执行器，直到收到中断信号"""
+        self.dedicated = True
+        self.apply_options()
+        config.subscribe(self.apply_options, ('jobs',))
+        config.start_watching()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop()
+            log.info("后台任务执行器已停止")
+
+    def _lease_expires_at(self, now):
+        return (now + timedelta(seconds=get_job_options()['lease_seconds'])).strftime(TIME_FORMAT)
+
+    def renew_leases(self):
+        """为执行中的任务续租；已请求取消或被其他执行器接管的任务通知执行函数停止"""
+        from db_orm import renew_background_job_leases
+        with self._contexts_lock:
+            contexts = dict(self._contexts)
+        if not contexts:
+            return
+        owned, cancel_requested = renew_background_job_leases(
+            self.owner, set(contexts), self._lease_expires_at(datetime.now()))
+        for job_id, context in contexts.items():
+            if job_id not in owned:
+                context.lost = True
+            if job_id not in owned or job_id in cancel_requested:
+                context.cancel_event.set()
+
+    def dispatch_jobs(self):
+        """领取可执行的任务并提交到线程池，线程池已满时本轮不再领取"""
+        from db_orm import claim_background_jobs
+        with self._contexts_lock:
+            capacity = self.max_workers - len(self._contexts)
+        if capacity <= 0:
+            return 0
+        now = datetime.now()
+        jobs = claim_background_jobs(self.owner, now.strftime(TIME_FORMAT), self._lease_expires_at(now), capacity)
+        for job in jobs:
+            context = JobContext(job, self.owner)
+            if job['cancel_requested']:
+                context.cancel_event.set()
+            with self._contexts_lock:
+                self._contexts[job['id']] = context
+            self.submit(self._run_job_safely, context)
+        return len(jobs)
+
+    def _cleanup(self):
+        from db_orm import delete_finished_background_jobs
+        if time.monotonic() - self._last_cleanup < CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = time.monotonic()
+        before = (datetime.now() - timedelta(days=get_job_options()['retention_days'])).strftime(TIME_FORMAT)
+        deleted = delete_finished_background_jobs(before)
+        if deleted:
+            log.info(f"已清理 {deleted} 个过期的后台任务")
+
+    def _run_job_safely(self, context):
+        try:
+            self.run_job(context)
+        except Exception as e:
+            log.error(f"后台任务执行失败 - job: {context.job['id']}, error: {e}")
+        finally:
+            with self._contexts_lock:
+                self._contexts.pop(context.job['id'], None)
+
+    def run_job(self, context):
+        """执行一个任务并按结果结束、重新排队或标记失败"""
+        from db_orm import finish_background_job, retry_background_job
+        job = context.job
+        name = job['job_type']
+        started_at = time.perf_counter()
+        publish_job_event(job, 'running', attempt=job['attempts'])
+        try:
+            if name not in _JOB_TYPES:
+                raise JobFailed(f"未知的任务类型: {name}")
+            context.check_cancelled()
+            result = _JOB_TYPES[name][0](context, job['payload'])
+            status, error = 'succeeded', None
+        except JobCancelled as e:
+            status, error, result = 'cancelled', None, e.result
+        except JobFailed as e:
+            status, error, result = 'failed', str(e)[:1000], None
+        except Exception as e:
+            status, error, result = 'failed', f"{type(e).__name__}: {e}"[:1000], None
+            if job['attempts'] < job['max_attempts'] and not context.cancelled:
+                options = get_job_options()
+                delay = min(options['retry_backoff_seconds'] * 2 ** (job['attempts'] - 1), options['max_retry_delay'])
+                run_after = (datetime.now() + timedelta(seconds=delay)).strftime(TIME_FORMAT)
+                if retry_background_job(job['id'], self.owner, error, run_after):
+                    status = 'retrying'
+                    log.warning(f"后台任务执行失败，{delay} 秒后重试 - job: {job['id']}, "
+                                f"attempt: {job['attempts']}, error: {error}")
+        finally:
+            JOB_DURATION.observe(time.perf_counter() - started_at, name)
+
+        JOB_RUNS.inc(name, status)
+        if context.lost:
+            log.warning(f"后台任务已被其他执行器接管，放弃本次结果 - job: {job['id']}")
+            return
+        if status == 'retrying':
+            publish_job_event(job, 'queued', error=error)
+            return
+        if not finish_background_job(job['id'], self.owner, status, result, error):
+            log.warning(f"后台任务结束时租约已失效 - job: {job['id']}")
+            return
+        publish_job_event(job, status, error=error)
+        log.info(f"后台任务结束 - job: {job['id']}, type: {name}, status: {status}, attempt: {job['attempts']}")
+
+# 全局执行器
+job_pool = JobWorkerPool()
+
+def start_job_pool():
+    """按配置启动后台任务执行器，jobs 配置修改后自动启停"""
+    job_pool.apply_options()
+    config.subscribe(job_pool.apply_options, ('jobs',))
+
+# ---------- 内置任务类型 ----------
+
+def _request_ids_field(project_id, payload, limit):
+    from db_orm import get_request_ids_by_project, check_request_in_project
+    request_ids = payload.get('request_info_ids')
+    if request_ids:
+        if not isinstance(request_ids, list):
+            raise ValueError('request_info_ids 必须是数组')
+        try:
+            request_ids = [int(request_id) for request_id in request_ids]
+        except (TypeError, ValueError):
+            raise ValueError('请求ID无效')
+        if any(not check_request_in_project(project_id, request_id) for request_id in request_ids):
+            raise ValueError('请求不属于该项目')
+    else:
+        request_ids = get_request_ids_by_project(project_id)
+    if not request_ids:
+        raise ValueError('项目下没有可执行的请求')
+    if len(request_ids) > limit:
+        raise ValueError(f"单个任务最多包含 {limit} 个请求")
+    return request_ids
+
+def _validate_collection(project_id, payload):
+    options = get_job_options()
+    try:
+        iterations = int(payload.get('iterations', 1))
+    except (TypeError, ValueError):
+        raise ValueError('iterations 必须是整数')
+    if iterations < 1 or iterations > 1000:
+        raise ValueError('iterations 取值范围 1-1000')
+    assertions = payload.get('assertions') or []
+    error = validate_assertions(assertions)
+    if error:
+        raise ValueError(error)
+    return {
+        'request_info_ids': _request_ids_field(project_id, payload, options['max_requests_per_job']),
+        'iterations': iterations,
+        'assertions': assertions,
+        'stop_on_failure': bool(payload.get('stop_on_failure'))
+    }
+
+@job_type('collection', _validate_collection)
+def run_collection(context, payload):
+    """
+    批量执行：按顺序执行项目请求 iterations 遍，每个请求按断言判定结果（未配置断言时检查状态码 < 400）
+    执行请求不是幂等操作，重试时从头执行
+    """
+    from db_orm import get_request_info_by_id
+    from api.api_server import execute_saved_request
+    options = get_job_options()
+    project_id = context.job['project_id']
+    request_ids = payload['request_info_ids']
+    total = len(request_ids) * payload['iterations']
+    counts = {'passed': 0, 'failed': 0, 'error': 0}
+    runs = []
+    body_limit = assertion_body_limit(payload['assertions'])
+
+    def result():
+        return dict(counts, total=total, completed=sum(counts.values()), runs=runs,
+                    truncated=sum(counts.values()) > len(runs))
+
+    context.progress(0, total, '开始执行', force=True)
+    request_infos = {}
+    for iteration in range(payload['iterations']):
+        for request_info_id in request_ids:
+            context.check_cancelled(result())
+            run = {'iteration': iteration + 1, 'request_info_id': request_info_id,
+                   'started_at': datetime.now().strftime(TIME_FORMAT)}
+            try:
+                if request_info_id not in request_infos:
+                    request_infos[request_info_id] = get_request_info_by_id(request_info_id)
+                request_info = request_infos[request_info_id]
+                if not request_info:
+                    raise ValueError('请求不存在或已删除')
+                response = execute_saved_request(project_id, request_info, options['pre_request_cache_ttl'], body_limit)
+                passed, outcomes = evaluate_assertions(payload['assertions'], response)
+                run.update({
+                    'status': 'passed' if passed else 'failed',
+                    'response_status': response['status'],
+                    'response_time': response['response_time'],
+                    'response_bytes': response['size'],
+                    'attempts': len(response['outbound']['attempts']),
+                    'assertions': outcomes
+                })
+            except Exception as e:
+                run.update({'status': 'error', 'error': str(e)[:1000]})
+            counts[run['status']] += 1
+            if len(runs) < options['max_result_runs']:
+                runs.append(run)
+            completed = sum(counts.values())
+            context.progress(completed, total, f"已执行 {completed}/{total}，失败 {counts['failed'] + counts['error']}")
+            if payload['stop_on_failure'] and run['status'] != 'passed':
+                return dict(result(), stopped=True)
+    context.progress(total, total, '执行完成', force=True)
+    return result()
+
+def _validate_import(project_id, payload):
+    options = get_job_options()
+    items = payload.get('requests')
+    if not isinstance(items, list) or not items:
+        raise ValueError('requests 必须是非空数组')
+    if len(items) > options['max_import_requests']:
+        raise ValueError(f"单个任务最多导入 {options['max_import_requests']} 个请求")
+    normalized = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f'第{index + 1}个请求格式错误')
+        request_name = str(item.get('request_name') or '').strip()
+        url = str(item.get('url') or '').strip()
+        method = str(item.get('method') or 'GET').upper()
+        if not request_name or not url:
+            raise ValueError(f'第{index + 1}个请求缺少 request_name 或 url')
+        if method not in IMPORT_METHODS:
+            raise ValueError(f"第{index + 1}个请求方法不支持，可选: {', '.join(IMPORT_METHODS)}")
+        for field in ('headers', 'query', 'auth'):
+            if item.get(field) is not None and not isinstance(item[field], dict):
+                raise ValueError(f'第{index + 1}个请求的 {field} 必须是对象')
+        body = item.get('body')
+        if body is not None and not isinstance(body, str):
+            body = json.dumps(body, ensure_ascii=False)
+        normalized.append({
+            'request_name': request_name[:255],
+            'url': url,
+            'method': method,
+            'headers': item.get('headers') or {},
+            'query': item.get('query') or {},
+            'auth': item.get('auth') or {},
+            'body': body or ''
+        })
+    return {'requests': normalized}
+
+@job_type('import', _validate_import)
+def run_import(context, payload):
+    """按批导入请求到项目，每批与任务进度在同一事务中提交，重试时从已导入的位置继续"""
+    from db_orm import import_requests_for_job
+    batch_size = get_job_options()['import_batch_size']
+    items = payload['requests']
+    total = len(items)
+    completed = context.resume_from
+    project_id = context.job['project_id']
+    while completed < total:
+        context.check_cancelled({'imported': completed, 'total': total})
+        batch = items[completed:completed + batch_size]
+        request_ids = import_requests_for_job(context.job['id'], context.owner, project_id, batch, completed, total)
+        if request_ids is None:
+            context.lost = True
+            raise JobCancelled()
+        completed += len(batch)
+        publish_job_event(context.job, 'running', completed=completed, total=total, message=f"已导入 {completed}/{total}")
+    return {'imported': total, 'total': total}
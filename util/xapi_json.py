@@ -0,0 +1,65 @@
+import re
+import json
+import uuid
+from flask import Response
+
+# 优先使用 orjson，未安装时退化为标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MIMETYPE = 'application/json; charset=utf-8'
+
+# RawJSON 序列化时的占位符，序列化完成后替换为原始字节
+_RAW_TOKEN = f"__xapi_raw_{uuid.uuid4().hex}_"
+_RAW_PATTERN = re.compile(('"' + _RAW_TOKEN + r'(\d+)"').encode('ascii'))
+
+class RawJSON:
+    """已序列化的 JSON 片段，输出时原样拼接，不再解析和重新编码"""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data if isinstance(data, bytes) else data.encode('utf-8')
+
+def loads(data):
+    """解析 JSON，支持 str 和 bytes"""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj):
+    """序列化为 str，用于数据库存储"""
+    if orjson:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            # orjson 不支持的类型（如超过 64 位的整数）交给标准库处理
+            pass
+    return json.dumps(obj, ensure_ascii=False)
+
+def dumps_bytes(obj):
+    """序列化为 UTF-8 字节，其中的 RawJSON 片段原样拼接"""
+    fragments = []
+
+    def default(value):
+        if isinstance(value, RawJSON):
+            fragments.append(value.data)
+            return f"{_RAW_TOKEN}{len(fragments) - 1}"
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    data = None
+    if orjson:
+        try:
+            data = orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            fragments.clear()
+    if data is None:
+        data = json.dumps(obj, ensure_ascii=False, default=default).encode('utf-8')
+    if fragments:
+        data = _RAW_PATTERN.sub(lambda match: fragments[int(match.group(1))], data)
+    return data
+
+def json_response(payload, status=200):
+    """构建 JSON 响应，替代 jsonify 以支持 RawJSON 直接透传"""
+    return Response(dumps_bytes(payload), status=status, content_type=JSON_MIMETYPE)
@@ -0,0 +1,118 @@
+import json
+from config import config
+from util.xapi_metrics import registry
+
+# 分布式压测默认参数
+DEFAULT_LOAD_OPTIONS = {
+    'registration_token': '',       # worker 注册口令，为空时不接受 worker 注册
+    'token_ttl': 86400,             # worker token 有效期（秒），过期后 worker 自动重新注册
+    'lease_seconds': 30,            # 分片租约，worker 每次上报结果时续租，失联后租约过期的分片重新分配
+    'max_attempts': 3,              # 分片最多被领取的次数
+    'worker_timeout': 60,           # 超过该时间未联系服务端的 worker 视为离线
+    'poll_interval': 2,             # worker 无分片可领时的轮询间隔（秒）
+    'report_interval': 2,           # worker 上报增量结果的间隔（秒）
+    'request_timeout': 30,          # 单个请求超时（秒）
+    'max_concurrency': 500,
+    'max_duration_seconds': 3600,
+    'max_shards': 32,
+    'max_requests_per_job': 100,
+    'pre_request_cache_ttl': 300
+}
+
+LOAD_KINDS = ('load', 'collect')
+
+LOAD_SHARDS = registry.counter('xapi_load_shards_total', '压测分片结束数', ('status',))
+LOAD_REPORTS = registry.counter('xapi_load_reports_total', 'worker 上报结果次数', ('final',))
+
+def get_load_options():
+    return config.section('load_workers', DEFAULT_LOAD_OPTIONS)
+
+def _int_field(data, name, default, low, high):
+    value = data.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} 必须是整数')
+    if value < low or value > high:
+        raise ValueError(f'{name} 取值范围 {low}-{high}')
+    return value
+
+def validate_load_spec(kind, data):
+    """
+    校验并规范化任务参数，参数错误时抛出 ValueError
+    load: concurrency 个并发循环执行请求，直到 duration_seconds 到期或总共执行 iterations 次，rate 为总速率上限（次/秒，0 不限）
+    collect: 按顺序执行请求列表 iterations 遍，每个分片单并发
+    """
+    if kind not in LOAD_KINDS:
+        raise ValueError(f"任务类型不支持，可选: {', '.join(LOAD_KINDS)}")
+    options = get_load_options()
+    shards = _int_field(data, 'shards', 1, 1, options['max_shards'])
+    spec = {
+        'shards': shards,
+        'timeout': _int_field(data, 'timeout', options['request_timeout'], 1, 600)
+    }
+    if kind == 'collect':
+        spec['iterations'] = _int_field(data, 'iterations', 1, 1, 100000)
+        if spec['iterations'] < shards:
+            raise ValueError('批量执行的遍数不能少于分片数')
+        return spec
+    spec['concurrency'] = _int_field(data, 'concurrency', 10, 1, options['max_concurrency'])
+    spec['duration_seconds'] = _int_field(data, 'duration_seconds', 0, 0, options['max_duration_seconds'])
+    spec['iterations'] = _int_field(data, 'iterations', 0, 0, 100000000)
+    try:
+        spec['rate'] = max(float(data.get('rate') or 0), 0.0)
+    except (TypeError, ValueError):
+        raise ValueError('rate 必须是数字')
+    if not spec['duration_seconds'] and not spec['iterations']:
+        raise ValueError('duration_seconds 和 iterations 至少指定一个')
+    if spec['concurrency'] < shards:
+        raise ValueError('并发数不能少于分片数')
+    if spec['iterations'] and spec['iterations'] < shards:
+        # worker 把 iterations 为 0 视为不限次数，每个分片至少要分到一次
+        raise ValueError('请求次数不能少于分片数')
+    return spec
+
+def _share(total, count, index):
+    """把 total 平均分到 count 份，余数分给前面的分片"""
+    return total // count + (1 if index < total % count else 0)
+
+def shard_plan(kind, spec, shard_index, request_count):
+    """
+    计算单个分片的执行参数（下发给 worker）
+    worker 不区分任务类型：collect 转换为单并发、按请求列表顺序执行指定次数
+    """
+    options = get_load_options()
+    shards = spec['shards']
+    if kind == 'collect':
+        return {
+            'concurrency': 1,
+            'iterations': _share(spec['iterations'], shards, shard_index) * request_count,
+            'duration_seconds': options['max_duration_seconds'],
+            'rate': 0,
+            'timeout': spec['timeout']
+        }
+    return {
+        'concurrency': _share(spec['concurrency'], shards, shard_index),
+        'iterations': _share(spec['iterations'], shards, shard_index) if spec['iterations'] else 0,
+        'duration_seconds': spec['duration_seconds'] or options['max_duration_seconds'],
+        'rate': spec['rate'] / shards if spec['rate'] else 0,
+        'timeout': spec['timeout']
+    }
+
+def worker_request(request_info_id, method, url, headers, request_body):
+    """把准备好的请求转换为可 JSON 序列化的形式下发给 worker"""
+    headers = dict(headers or {})
+    if isinstance(request_body, bytes):
+        request_body = request_body.decode('utf-8', errors='replace')
+    elif request_body is not None and not isinstance(request_body, str):
+        request_body = json.dumps(request_body, ensure_ascii=False)
+    # 与 send_request 一致：有请求体但未设置 Content-Type 时按 JSON 发送
+    if method in ('POST', 'PUT', 'PATCH') and request_body and 'Content-Type' not in headers:
+        headers['Content-Type'] = 'application/json'
+    return {
+        'request_info_id': request_info_id,
+        'method': method,
+        'url': url,
+        'headers': {str(key): str(value) for key, value in headers.items()},
+        'body': request_body
+    }
@@ -0,0 +1,334 @@
+import os
+import json
+import time
+import bisect
+import threading
+from flask import request, g
+from config import config
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 多进程模式下快照文件的写入间隔（秒）
+DEFAULT_FLUSH_INTERVAL = 5
+# 来自用户输入的标签（如上游 host）最多保留的取值个数
+MAX_LABEL_VALUES = 200
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class Counter:
+    """只增计数器"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: value for labels, value in self._values.items()}
+
+    @staticmethod
+    def merge(left, right):
+        return left + right
+
+    def render(self, values):
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+class Histogram:
+    """分桶直方图，每个标签组合记录各桶计数、总和与次数"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: [list(state[0]), state[1], state[2]] for labels, state in self._values.items()}
+
+    @staticmethod
+    def merge(left, right):
+        return [[a + b for a, b in zip(left[0], right[0])], left[1] + right[1], left[2] + right[2]]
+
+    def render(self, values):
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, ("le", _format_value(bound)))} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}'
+
+class Gauge:
+    """采集时通过回调函数取值的仪表盘，回调返回数值或 {标签元组: 数值}"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def snapshot(self):
+        try:
+            value = self.callback()
+        except Exception as e:
+            log.error(f"采集指标 {self.name} 失败: {e}")
+            return {}
+        if isinstance(value, dict):
+            return value
+        return {(): value}
+
+    @staticmethod
+    def merge(left, right):
+        return left + right
+
+    render = Counter.render
+
+class BoundedLabel:
+    """
+    限制标签取值个数：前 limit 个取值原样保留，之后出现的新取值归入 other
+    用于 host 等由用户输入决定的标签，避免指标序列无限增长
+    """
+
+    def __init__(self, limit=MAX_LABEL_VALUES):
+        self.limit = limit
+        self._values = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        with self._lock:
+            if value in self._values:
+                return value
+            if len(self._values) < self.limit:
+                self._values.add(value)
+                return value
+        return 'other'
+
+class MetricsRegistry:
+    """
+    进程内指标注册表
+    指标更新只在内存中加锁累加；配置 metrics.multiprocess_dir 时，各进程定期把快照写入该目录，
+    采集时合并所有存活进程的快照，多 worker 部署下 /metrics 返回全局数据
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flush_thread = None
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback, labelnames=()):
+        return self.register(Gauge(name, documentation, callback, labelnames))
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    # ---------- 多进程支持 ----------
+
+    def multiprocess_dir(self):
+        return config.get('metrics.multiprocess_dir')
+
+    def start_flush_thread(self):
+        """启动快照写入线程（仅多进程模式）"""
+        if not self.multiprocess_dir() or (self._flush_thread is not None and self._flush_thread.is_alive()):
+            return
+        self._flush_thread = threading.Thread(target=self._flush_loop, name='xapi-metrics-flush', daemon=True)
+        self._flush_thread.start()
+
+    def _flush_loop(self):
+        interval = config.get('metrics.flush_interval', DEFAULT_FLUSH_INTERVAL)
+        while True:
+            time.sleep(interval)
+            self.write_snapshot()
+
+    def write_snapshot(self):
+        """把当前进程的指标快照写入 multiprocess_dir/metrics_<pid>.json"""
+        directory = self.multiprocess_dir()
+        if not directory:
+            return
+        try:
+            os.makedirs(directory, exist_ok=True)
+            data = {name: [[list(labels), value] for labels, value in values.items()]
+                    for name, values in self.snapshot().items()}
+            path = os.path.join(directory, f'metrics_{os.getpid()}.json')
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            log.error(f"写入指标快照失败: {e}")
+
+    def _read_snapshots(self):
+        directory = self.multiprocess_dir()
+        for filename in os.listdir(directory):
+            if not (filename.startswith('metrics_') and filename.endswith('.json')):
+                continue
+            try:
+                pid = int(filename[len('metrics_'):-len('.json')])
+                if pid != os.getpid():
+                    os.kill(pid, 0)
+                with open(os.path.join(directory, filename)) as f:
+                    data = json.load(f)
+            except (ValueError, OSError):
+                # 进程已退出或文件不完整，跳过
+                continue
+            yield {name: {tuple(labels): value for labels, value in values} for name, values in data.items()}
+
+    def collect(self):
+        """合并后的指标值 {name: {labels: value}}"""
+        if not self.multiprocess_dir():
+            return self.snapshot()
+        self.write_snapshot()
+        with self._lock:
+            metrics = dict(self._metrics)
+        merged = {}
+        for snapshot in self._read_snapshots():
+            for name, values in snapshot.items():
+                metric = metrics.get(name)
+                if metric is None:
+                    continue
+                target = merged.setdefault(name, {})
+                for labels, value in values.items():
+                    target[labels] = metric.merge(target[labels], value) if labels in target else value
+        return merged
+
+    def render(self):
+        """Prometheus 文本格式"""
+        values = self.collect()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render(values.get(metric.name, {})))
+        return '\n'.join(lines) + '\n'
+
+# 全局指标注册表
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter('xapi_http_requests_total', 'Flask 请求数', ('method', 'route', 'status'))
+HTTP_LATENCY = registry.histogram('xapi_http_request_duration_seconds', 'Flask 请求处理耗时', ('method', 'route'))
+UPSTREAM_REQUESTS = registry.counter('xapi_upstream_requests_total', '上游接口调用次数', ('host', 'outcome'))
+UPSTREAM_LATENCY = registry.histogram('xapi_upstream_request_duration_seconds', '上游接口收到响应头的耗时', ('host',))
+PRE_REQUESTS = registry.counter('xapi_pre_requests_total', '前置请求执行次数', ('outcome',))
+DB_CALLS = registry.counter('xapi_db_calls_total', 'db_orm 函数调用次数', ('function', 'outcome'))
+DB_CALL_LATENCY = registry.histogram('xapi_db_call_duration_seconds', 'db_orm 函数耗时', ('function',))
+DB_QUERIES = registry.counter('xapi_db_queries_total', 'SQL 语句执行次数（按 db_orm 函数）', ('function',))
+DB_QUERY_SECONDS = registry.counter('xapi_db_query_seconds_total', 'SQL 语句执行总耗时（按 db_orm 函数）', ('function',))
+
+_db_context = threading.local()
+
+def current_db_function():
+    """当前线程正在执行的 db_orm 函数名"""
+    stack = getattr(_db_context, 'stack', None)
+    return stack[-1] if stack else 'other'
+
+def observe_db_query(elapsed_seconds):
+    """记录一条 SQL 语句的耗时，归属到当前 db_orm 函数"""
+    function = current_db_function()
+    DB_QUERIES.inc(function)
+    DB_QUERY_SECONDS.inc(function, amount=elapsed_seconds)
+
+def track_db_function(func):
+    """统计 db_orm 函数的调用次数和耗时"""
+    name = func.__name__
+
+    def wrapper(*args, **kwargs):
+        stack = getattr(_db_context, 'stack', None)
+        if stack is None:
+            stack = _db_context.stack = []
+        stack.append(name)
+        started_at = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = func(*args, **kwargs)
+            outcome = 'ok'
+            return result
+        finally:
+            stack.pop()
+            DB_CALLS.inc(name, outcome)
+            DB_CALL_LATENCY.observe(time.perf_counter() - started_at, name)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = func.__doc__
+    wrapper.__wrapped__ = func
+    return wrapper
+
+# 上游 host 标签，外部请求相关指标共用
+host_label = BoundedLabel()
+
+def observe_upstream(host, elapsed_seconds, outcome):
+    host = host_label(host)
+    UPSTREAM_REQUESTS.inc(host, outcome)
+    UPSTREAM_LATENCY.observe(elapsed_seconds, host)
+
+def register_metrics(app):
+    """注册请求计数和耗时钩子"""
+    @app.before_request
+    def start_metrics_timer():
+        g.metrics_started_at = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started_at = g.get('metrics_started_at')
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUESTS.inc(request.method, route, str(response.status_code))
+        if started_at is not None:
+            HTTP_LATENCY.observe(time.perf_counter() - started_at, request.method, route)
+        return response
+
+    registry.start_flush_thread()
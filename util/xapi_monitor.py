@@ -0,0 +1,405 @@
+import os
+import re
+import json
+import uuid
+import time
+import socket
+import threading
+from datetime import datetime, timedelta
+from config import config
+from util.xapi_metrics import registry
+from util.xapi_events import publish, project_channel
+from util.xapi_background import PollingService
+from log_base import MyLog
+log = MyLog().my_logger()
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 调度默认参数
+DEFAULT_MONITOR_OPTIONS = {
+    'enabled': True,
+    'poll_interval': 5,                 # 检查到期任务的间隔（秒）
+    'max_workers': 4,                   # 同时执行的任务数
+    'lease_seconds': 300,               # 任务租约时长，调度器异常退出后租约过期的任务会被重新领取
+    'pre_request_cache_ttl': 300,       # 前置请求结果缓存时间（秒）
+    'max_requests_per_job': 100,        # 项目级任务最多执行的请求数
+    'max_assertion_body_bytes': 10 * 1024 * 1024    # json_path/body_contains 断言读取的响应体上限，超过时断言记为跳过
+}
+
+MONITOR_RUNS = registry.counter('xapi_monitor_runs_total', '定时监控请求执行次数', ('status',))
+
+def get_monitor_options():
+    return config.section('monitor', DEFAULT_MONITOR_OPTIONS)
+
+# ---------- cron 表达式 ----------
+
+_CRON_FIELDS = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 7)
+)
+_EVERY_PATTERN = re.compile(r'^@every\s+(\d+)\s*([smhd])$')
+_EVERY_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_CRON_ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *'
+}
+
+def _parse_cron_field(expression, low, high):
+    values = set()
+    for part in expression.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"步长必须大于0: {expression}")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_text, end_text = part.split('-', 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"取值超出范围 {low}-{high}: {expression}")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronSchedule:
+    """
+    cron 调度表达式
+    支持标准 5 段格式（分 时 日 月 周，周日为 0 或 7）、@hourly/@daily/@weekly/@monthly，
+    以及固定间隔 @every 30s / 5m / 1h / 1d
+    """
+
+    def __init__(self, expression):
+        self.expression = expression.strip()
+        text = _CRON_ALIASES.get(self.expression, self.expression)
+        self.interval = None
+        match = _EVERY_PATTERN.match(text)
+        if match:
+            self.interval = int(match.group(1)) * _EVERY_UNITS[match.group(2)]
+            if self.interval < 1:
+                raise ValueError('间隔必须大于0')
+            return
+        parts = text.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron 表达式应为 5 段: {expression}")
+        self.fields = {}
+        for (name, low, high), part in zip(_CRON_FIELDS, parts):
+            try:
+                self.fields[name] = _parse_cron_field(part, low, high)
+            except ValueError as e:
+                raise ValueError(f"cron 表达式字段 {name} 无效: {e}")
+        self.fields['weekday'] = {value % 7 for value in self.fields['weekday']}
+        # 日和周同时限定时满足其一即可（与标准 cron 一致）
+        self.day_restricted = parts[2] != '*'
+        self.weekday_restricted = parts[4] != '*'
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.fields['day']
+        weekday_ok = (moment.weekday() + 1) % 7 in self.fields['weekday']
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment):
+        """moment 之后的下一次执行时间"""
+        if self.interval is not None:
+            return moment.replace(microsecond=0) + timedelta(seconds=self.interval)
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.fields['month'] or not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.fields['hour']:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.fields['minute']:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"cron 表达式没有可执行时间: {self.expression}")
+
+def next_run_time(expression, moment=None):
+    """按 cron 表达式计算下一次执行时间（字符串）"""
+    return CronSchedule(expression).next_after(moment or datetime.now()).strftime(TIME_FORMAT)
+
+# ---------- 断言 ----------
+
+ASSERTION_TYPES = ('status', 'latency', 'json_path', 'header', 'body_contains')
+ASSERTION_OPS = ('eq', 'ne', 'lt', 'lte', 'gt', 'gte', 'contains', 'not_contains', 'exists', 'regex')
+# 未配置断言时默认检查状态码 < 400
+DEFAULT_ASSERTIONS = [{'type': 'status', 'op': 'lt', 'value': 400}]
+# 执行结果中 actual 字段的最大长度
+MAX_ACTUAL_LENGTH = 200
+# 需要读取响应体的断言类型
+BODY_ASSERTION_TYPES = ('json_path', 'body_contains')
+
+def validate_assertions(assertions):
+    """校验断言配置，返回错误信息，合法时返回 None"""
+    if not isinstance(assertions, list):
+        return '断言配置必须是数组'
+    for index, assertion in enumerate(assertions):
+        if not isinstance(assertion, dict):
+            return f'第{index + 1}条断言格式错误'
+        if assertion.get('type') not in ASSERTION_TYPES:
+            return f"第{index + 1}条断言类型不支持，可选: {', '.join(ASSERTION_TYPES)}"
+        op = assertion.get('op', 'contains' if assertion['type'] == 'body_contains' else 'eq')
+        if op not in ASSERTION_OPS:
+            return f"第{index + 1}条断言运算符不支持，可选: {', '.join(ASSERTION_OPS)}"
+        if assertion['type'] == 'json_path' and not assertion.get('path'):
+            return f'第{index + 1}条断言缺少 path'
+        if assertion['type'] == 'header' and not assertion.get('name'):
+            return f'第{index + 1}条断言缺少 name'
+        if op == 'regex':
+            try:
+                re.compile(str(assertion.get('value', '')))
+            except re.error as e:
+                return f'第{index + 1}条断言正则表达式错误: {e}'
+    return None
+
+_MISSING = object()
+
+def _json_path(data, path):
+    """按 a.b.0.c 形式取值，不存在时返回 _MISSING"""
+    current = data
+    for key in path.split('.'):
+        if isinstance(current, dict) and key in current:
+            current = current[key]
+        elif isinstance(current, list) and key.isdigit() and int(key) < len(current):
+            current = current[int(key)]
+        else:
+            return _MISSING
+    return current
+
+def _compare(actual, op, expected):
+    if op == 'exists':
+        return actual is not _MISSING
+    if actual is _MISSING:
+        return False
+    if op in ('eq', 'ne'):
+        equal = actual == expected or str(actual) == str(expected)
+        return equal if op == 'eq' else not equal
+    if op in ('lt', 'lte', 'gt', 'gte'):
+        try:
+            actual_number, expected_number = float(actual), float(expected)
+        except (TypeError, ValueError):
+            return False
+        return {
+            'lt': actual_number < expected_number,
+            'lte': actual_number <= expected_number,
+            'gt': actual_number > expected_number,
+            'gte': actual_number >= expected_number
+        }[op]
+    text = actual if isinstance(actual, str) else json.dumps(actual, ensure_ascii=False)
+    if op == 'contains':
+        return str(expected) in text
+    if op == 'not_contains':
+        return str(expected) not in text
+    if op == 'regex':
+        return re.search(str(expected), text) is not None
+    return False
+
+def assertion_body_limit(assertions):
+    """执行请求时需要完整读取的响应体上限：没有响应体断言时只需预览"""
+    if any(assertion['type'] in BODY_ASSERTION_TYPES for assertion in assertions or ()):
+        return get_monitor_options()['max_assertion_body_bytes']
+    return 0
+
+def evaluate_assertions(assertions, result):
+    """
+    对执行结果逐条断言，返回 (是否全部通过, 精简的断言结果列表)
+    响应体过大只有预览时（body_complete 为 False），响应体断言记为 skipped，不计入是否通过
+    """
+    parsed_body = _MISSING
+    outcomes = []
+    for assertion in assertions or DEFAULT_ASSERTIONS:
+        kind = assertion['type']
+        op = assertion.get('op', 'contains' if kind == 'body_contains' else 'eq')
+        if kind in BODY_ASSERTION_TYPES and not result.get('body_complete', True):
+            outcome = {'type': kind, 'op': op, 'passed': None, 'skipped': '响应体过大，只有预览，无法断言'}
+            for key in ('path', 'value'):
+                if key in assertion:
+                    outcome[key] = assertion[key]
+            outcomes.append(outcome)
+            continue
+        if kind == 'status':
+            actual = result['status']
+        elif kind == 'latency':
+            actual = result['response_time']
+        elif kind == 'header':
+            headers = {key.lower(): value for key, value in result['headers'].items()}
+            actual = headers.get(str(assertion['name']).lower(), _MISSING)
+        elif kind == 'json_path':
+            if parsed_body is _MISSING:
+                try:
+                    parsed_body = json.loads(result['text'])
+                except (TypeError, ValueError):
+                    parsed_body = None
+            actual = _json_path(parsed_body, assertion['path']) if parsed_body is not None else _MISSING
+        else:
+            actual = result['text']
+        passed = _compare(actual, op, assertion.get('value'))
+        outcome = {'type': kind, 'op': op, 'passed': passed}
+        for key in ('path', 'name', 'value'):
+            if key in assertion:
+                outcome[key] = assertion[key]
+        if kind != 'body_contains':
+            outcome['actual'] = None if actual is _MISSING else str(actual)[:MAX_ACTUAL_LENGTH]
+        outcomes.append(outcome)
+    return all(outcome['passed'] for outcome in outcomes if outcome['passed'] is not None), outcomes
+
+# ---------- 调度器 ----------
+
+class MonitorScheduler(PollingService):
+    """
+    定时监控调度器
+    后台线程定期从数据库领取到期任务（带租约，多进程部署时不会重复执行），交给有界线程池执行，
+    并为执行中的任务续租；执行结果只保存状态码、耗时、响应大小和断言结果
+    """
+
+    display_name = '定时监控调度器'
+    thread_name = 'xapi-monitor'
+
+    def __init__(self):
+        super().__init__()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # 执行中的任务：{任务ID: 租约丢失信号}
+        self._running_jobs = {}
+        self._inflight_lock = threading.Lock()
+        self._last_renewal = 0.0
+
+    def options(self):
+        return get_monitor_options()
+
+    def poll(self):
+        self.renew_leases()
+        self.dispatch_due_jobs()
+
+    def _lease_expires_at(self, now):
+        return (now + timedelta(seconds=get_monitor_options()['lease_seconds'])).strftime(TIME_FORMAT)
+
+    def renew_leases(self):
+        """每隔 lease_seconds 的三分之一为执行中的任务续租；已被其他调度器接管的任务在下一个请求前停止"""
+        from db_orm import renew_monitor_job_leases
+        if time.monotonic() - self._last_renewal < get_monitor_options()['lease_seconds'] / 3:
+            return
+        self._last_renewal = time.monotonic()
+        with self._inflight_lock:
+            running = dict(self._running_jobs)
+        if not running:
+            return
+        owned = renew_monitor_job_leases(self.owner, set(running), self._lease_expires_at(datetime.now()))
+        for job_id, lost in running.items():
+            if job_id not in owned:
+                lost.set()
+
+    def dispatch_due_jobs(self):
+        """领取到期任务并提交到线程池，线程池已满时本轮不再领取"""
+        from db_orm import claim_due_monitor_jobs
+        with self._inflight_lock:
+            capacity = self.max_workers - len(self._running_jobs)
+        if capacity <= 0:
+            return 0
+        now = datetime.now()
+        jobs = claim_due_monitor_jobs(self.owner, now.strftime(TIME_FORMAT), self._lease_expires_at(now), capacity)
+        for job in jobs:
+            lost = threading.Event()
+            with self._inflight_lock:
+                self._running_jobs[job['id']] = lost
+            self.submit(self._run_job_safely, job, lost)
+        return len(jobs)
+
+    def _run_job_safely(self, job, lost=None):
+        try:
+            self.run_job(job, lost)
+        except Exception as e:
+            log.error(f"定时监控任务执行失败 - job: {job['id']}, error: {e}")
+        finally:
+            with self._inflight_lock:
+                self._running_jobs.pop(job['id'], None)
+
+    def run_job(self, job, lost=None):
+        """执行一个监控任务的全部请求并保存结果"""
+        from db_orm import get_request_ids_by_project, get_request_info_by_id, check_request_in_project, finish_monitor_job
+        from api.api_server import execute_saved_request
+        options = get_monitor_options()
+        project_id = job['project_id']
+        if job['request_info_id']:
+            request_ids = [job['request_info_id']] if check_request_in_project(project_id, job['request_info_id']) else []
+        else:
+            request_ids = get_request_ids_by_project(project_id)[:options['max_requests_per_job']]
+
+        runs = []
+        started_at = datetime.now()
+        channels = [project_channel(project_id)]
+        progress = {'job_id': job['id'], 'name': job['name'], 'project_id': project_id, 'total': len(request_ids)}
+        publish(channels, 'run_progress', dict(progress, phase='started', completed=0))
+        for request_info_id in request_ids:
+            if lost is not None and lost.is_set():
+                # 租约已过期并被其他调度器领取，由对方完成本次执行
+                log.warning(f"定时监控任务租约已丢失，停止执行 - job: {job['id']}, completed: {len(runs)}")
+                return runs
+            run = {'project_id': project_id, 'request_info_id': request_info_id,
+                   'started_at': datetime.now().strftime(TIME_FORMAT)}
+            try:
+                request_info = get_request_info_by_id(request_info_id)
+                if not request_info:
+                    raise ValueError('请求不存在或已删除')
+                result = execute_saved_request(project_id, request_info, options['pre_request_cache_ttl'],
+                                               assertion_body_limit(job['assertions']))
+                passed, outcomes = evaluate_assertions(job['assertions'], result)
+                run.update({
+                    'status': 'passed' if passed else 'failed',
+                    'response_status': result['status'],
+                    'response_time': result['response_time'],
+                    'response_bytes': result['size'],
+                    'assertions': outcomes
+                })
+            except Exception as e:
+                run.update({'status': 'error', 'error': str(e)[:1000]})
+            MONITOR_RUNS.inc(run['status'])
+            runs.append(run)
+            publish(channels, 'run_progress', dict(
+                progress, phase='request', completed=len(runs), request_info_id=request_info_id,
+                status=run['status'], response_status=run.get('response_status'),
+                response_time=run.get('response_time'), error=run.get('error')
+            ))
+
+        if not runs:
+            last_status = 'error'
+        elif any(run['status'] == 'error' for run in runs):
+            last_status = 'error'
+        elif any(run['status'] == 'failed' for run in runs):
+            last_status = 'failed'
+        else:
+            last_status = 'passed'
+        try:
+            next_run_at = next_run_time(job['cron'], datetime.now())
+        except ValueError as e:
+            log.error(f"监控任务 cron 无效 - job: {job['id']}, error: {e}")
+            next_run_at = None
+        if not finish_monitor_job(job['id'], self.owner, runs, next_run_at, started_at.strftime(TIME_FORMAT), last_status):
+            log.warning(f"定时监控任务租约已失效，本次结果未保存 - job: {job['id']}")
+            return runs
+        publish(channels, 'run_progress', dict(
+            progress, phase='finished', completed=len(runs), status=last_status, next_run_at=next_run_at
+        ))
+        log.info(f"定时监控任务完成 - job: {job['id']}, requests: {len(runs)}, status: {last_status}")
+        return runs
+
+# 全局调度器
+monitor_scheduler = MonitorScheduler()
+
+def start_monitor_scheduler():
+    """按配置启动定时监控调度器，monitor 配置修改后自动启停"""
+    monitor_scheduler.apply_options()
+    config.subscribe(monitor_scheduler.apply_options, ('monitor',))
@@ -0,0 +1,502 @@
+import json
+import time
+import random
+import threading
+from collections import deque, OrderedDict
+from config import config
+from util.xapi_metrics import registry, host_label, BoundedLabel
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 外部请求限流、超时、重试和熔断默认参数，项目环境配置的 outbound 字段可覆盖
+DEFAULT_OUTBOUND_OPTIONS = {
+    'scope': 'host',            # host: 按目标 host 分别限流；project: 项目下所有外部请求共用一个限额
+    'rate': 0,                  # 每秒请求数上限（令牌桶速率），0 不限
+    'burst': 0,                 # 令牌桶容量，0 时等于 rate（至少为 1）
+    'max_concurrency': 0,       # 同时进行的请求数上限，0 不限
+    'max_wait_seconds': 30,     # 排队等待上限，超过时请求失败
+    'connect_timeout': 10,      # 建立连接超时（秒）
+    'read_timeout': 60,         # 读取超时（秒），即两次收到数据之间的最长间隔
+    'stream_read_timeout': 300, # 流式响应的读取超时（秒）
+    'retries': 0,               # 幂等方法（GET/HEAD/OPTIONS/PUT/DELETE）连接失败、超时或返回 retry_on_status 时的重试次数
+    'pre_request_retries': 2,   # 前置请求的重试次数（不区分方法）
+    'retry_backoff': 0.5,       # 第 n 次重试前随机等待 0 ~ retry_backoff * 2^(n-1) 秒
+    'retry_max_backoff': 5,
+    'retry_on_status': [502, 503, 504],
+    'breaker_failure_threshold': 5,     # 同一 host 连续失败（连接失败、超时、retry_on_status）达到该次数后熔断，0 不熔断
+    'breaker_reset_seconds': 30,        # 熔断持续时间，到期后放行一个试探请求，成功则恢复
+    'env_cache_ttl': 10,        # 项目环境配置的缓存时间（秒）
+    'max_tracked_targets': 1000,        # 进程内最多保留的限流器和熔断器个数，超过时淘汰最久未使用的
+    'hosts': {}                 # 按 host 覆盖上述参数，如 {"api.example.com": {"rate": 5}}
+}
+# 限流参数
+LIMIT_FIELDS = ('rate', 'burst', 'max_concurrency', 'max_wait_seconds')
+# 可以在项目环境和 hosts 中覆盖的参数
+POLICY_FIELDS = LIMIT_FIELDS + (
+    'connect_timeout', 'read_timeout', 'stream_read_timeout', 'retries', 'pre_request_retries',
+    'retry_backoff', 'retry_max_backoff', 'retry_on_status', 'breaker_failure_threshold', 'breaker_reset_seconds'
+)
+INTEGER_FIELDS = ('max_concurrency', 'retries', 'pre_request_retries', 'breaker_failure_threshold')
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+# 单个请求的重试次数和超时上限
+MAX_RETRIES = 5
+MAX_TIMEOUT = 3600
+
+OUTBOUND_WAIT = registry.histogram('xapi_outbound_limit_wait_seconds', '外部请求限流排队等待时间', ('target', 'limit'))
+OUTBOUND_REJECTED = registry.counter('xapi_outbound_limit_rejected_total', '外部请求排队超时次数', ('target', 'limit'))
+OUTBOUND_RETRIES = registry.counter('xapi_outbound_retries_total', '外部请求重试次数', ('host',))
+CIRCUIT_REJECTED = registry.counter('xapi_outbound_circuit_rejected_total', '熔断期间快速失败的外部请求数', ('host',))
+# 限流目标标签（含 host），与 host 标签一样限制取值个数
+target_label = BoundedLabel()
+
+def get_outbound_options():
+    return config.section('outbound', DEFAULT_OUTBOUND_OPTIONS)
+
+class OutboundLimitExceeded(Exception):
+    """排队等待超过 max_wait_seconds"""
+
+class CircuitOpen(Exception):
+    """目标 host 已熔断，请求未发送"""
+
+class FairTokenBucket:
+    """
+    先到先得的令牌桶
+    每次获取在锁内预约下一个令牌并计算需要等待的时间，等待在锁外进行；
+    预约按到达顺序排列，后到的请求不会插队
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(max(burst or rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        """预约一个令牌，返回需要等待的秒数；等待时间超过 max_wait 时不预约并返回 None"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+class FairSemaphore:
+    """先到先得的信号量：有等待者时新请求排到队尾，释放时直接把名额交给队首"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def acquire(self, timeout):
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return True
+            waiter = [threading.Event(), False]
+            self._waiters.append(waiter)
+        waiter[0].wait(max(timeout, 0))
+        with self._lock:
+            if waiter[1]:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # 名额直接交给队首，_active 不变
+                waiter = self._waiters.popleft()
+                waiter[1] = True
+                waiter[0].set()
+            else:
+                self._active -= 1
+
+def validate_outbound(outbound):
+    """
+    校验项目环境配置中的 outbound 字段，格式错误时抛出 ValueError
+    只允许 scope、hosts 和 POLICY_FIELDS 中的参数，hosts 中只允许 POLICY_FIELDS
+    """
+    if not isinstance(outbound, dict):
+        raise ValueError('outbound 必须是 JSON 对象')
+    unknown = set(outbound) - set(POLICY_FIELDS) - {'scope', 'hosts'}
+    if unknown:
+        raise ValueError(f"outbound 不支持的参数: {', '.join(sorted(unknown))}")
+    if outbound.get('scope', 'host') not in ('host', 'project'):
+        raise ValueError('outbound.scope 可选 host、project')
+    hosts = outbound.get('hosts') or {}
+    if not isinstance(hosts, dict):
+        raise ValueError('outbound.hosts 必须是 {host: 参数对象}')
+    overrides_list = [outbound]
+    for host, overrides in hosts.items():
+        if not isinstance(overrides, dict):
+            raise ValueError(f'outbound.hosts.{host} 必须是 JSON 对象')
+        unknown = set(overrides) - set(POLICY_FIELDS)
+        if unknown:
+            raise ValueError(f"outbound.hosts.{host} 不支持的参数: {', '.join(sorted(unknown))}")
+        overrides_list.append(overrides)
+    for overrides in overrides_list:
+        settings = dict(DEFAULT_OUTBOUND_OPTIONS)
+        settings.update({field: overrides[field] for field in POLICY_FIELDS if field in overrides})
+        if not isinstance(settings['retry_on_status'], (list, tuple)):
+            raise ValueError('outbound.retry_on_status 必须是状态码数组')
+        try:
+            normalized = OutboundLimiters._normalize(settings)
+        except (TypeError, ValueError):
+            raise ValueError('outbound 参数必须是数字')
+        if any(value < 0 for field, value in normalized.items() if field != 'retry_on_status'):
+            raise ValueError('outbound 参数不能为负数')
+
+class OutboundLimiter:
+    """一个限流目标（host 或项目）的令牌桶和并发信号量"""
+
+    def __init__(self, target, settings):
+        self.target = target
+        self.settings = settings
+        self.bucket = FairTokenBucket(settings['rate'], settings['burst']) if settings['rate'] > 0 else None
+        self.semaphore = FairSemaphore(settings['max_concurrency']) if settings['max_concurrency'] > 0 else None
+
+    def acquire(self):
+        """排队获取令牌和并发名额，返回 Permit；等待超过 max_wait_seconds 时抛出 OutboundLimitExceeded"""
+        max_wait = float(self.settings['max_wait_seconds'])
+        permit = Permit(self)
+        if self.bucket is not None:
+            wait = self.bucket.reserve(max_wait)
+            if wait is None:
+                OUTBOUND_REJECTED.inc(target_label(self.target), 'rate')
+                raise OutboundLimitExceeded(f"{self.target} 请求速率超过限制（{self.settings['rate']:g}/s），排队超过 {max_wait:g} 秒")
+            if wait > 0:
+                time.sleep(wait)
+            permit.rate_wait = wait
+            OUTBOUND_WAIT.observe(wait, target_label(self.target), 'rate')
+        if self.semaphore is not None:
+            started_at = time.monotonic()
+            acquired = self.semaphore.acquire(max_wait - permit.rate_wait)
+            permit.concurrency_wait = time.monotonic() - started_at
+            if not acquired:
+                OUTBOUND_REJECTED.inc(target_label(self.target), 'concurrency')
+                raise OutboundLimitExceeded(f"{self.target} 并发请求超过限制（{self.settings['max_concurrency']}），排队超过 {max_wait:g} 秒")
+            permit.holding = True
+            OUTBOUND_WAIT.observe(permit.concurrency_wait, target_label(self.target), 'concurrency')
+        return permit
+
+class Permit:
+    """已获取的限流许可，请求收到响应头后释放并发名额"""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.rate_wait = 0.0
+        self.concurrency_wait = 0.0
+        self.holding = False
+
+    def release(self):
+        if self.holding:
+            self.holding = False
+            self.limiter.semaphore.release()
+
+    def details(self):
+        """写入执行详情的限流信息"""
+        return {
+            'target': self.limiter.target,
+            'rateWaitMs': int(self.rate_wait * 1000),
+            'concurrencyWaitMs': int(self.concurrency_wait * 1000)
+        }
+
+class NoLimit:
+    """未配置限流时使用，不等待"""
+
+    def acquire(self):
+        return self
+
+    def release(self):
+        pass
+
+    def details(self):
+        return None
+
+_NO_LIMIT = NoLimit()
+
+class OutboundLimiters:
+    """
+    按限流目标维护限流器
+    参数来自配置 outbound 和项目环境配置的 outbound 字段（项目优先），项目环境按 env_cache_ttl 缓存；
+    参数变化后为该目标新建限流器，已在旧限流器中排队的请求不受影响；
+    目标个数超过 max_tracked_targets 时淘汰最久未使用的限流器
+    """
+
+    def __init__(self):
+        self._limiters = OrderedDict()
+        self._project_settings = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, project_id=None):
+        """项目环境配置修改后清除缓存，不指定 project_id 时全部清除"""
+        with self._lock:
+            if project_id is None:
+                self._project_settings.clear()
+            else:
+                self._project_settings.pop(int(project_id), None)
+
+    def _project_outbound(self, project_id):
+        """项目环境配置中的 outbound 字段（带缓存），未配置时返回 None"""
+        now = time.monotonic()
+        entry = self._project_settings.get(project_id)
+        if entry and entry[0] > now:
+            return entry[1]
+        from db_orm import get_project_env, release_db_connection
+        outbound = None
+        env = get_project_env(project_id)
+        # 查询后立即归还连接，避免外部请求期间占用连接池
+        release_db_connection()
+        try:
+            outbound = (json.loads(env['env']) if env and env['env'] else {}).get('outbound')
+        except (TypeError, ValueError, AttributeError) as e:
+            log.warning(f"项目 {project_id} 环境配置解析失败，不使用项目限流配置: {e}")
+        if outbound is not None and not isinstance(outbound, dict):
+            log.warning(f"项目 {project_id} 环境配置的 outbound 不是 JSON 对象，不使用项目配置")
+            outbound = None
+        with self._lock:
+            self._project_settings[project_id] = (now + get_outbound_options()['env_cache_ttl'], outbound)
+        return outbound
+
+    @staticmethod
+    def _overlay(settings, overrides, host, hostname):
+        if not overrides:
+            return
+        settings.update({field: overrides[field] for field in POLICY_FIELDS if field in overrides})
+        hosts = overrides.get('hosts') or {}
+        host_overrides = hosts.get(host) or hosts.get(hostname)
+        if isinstance(host_overrides, dict):
+            settings.update({field: host_overrides[field] for field in POLICY_FIELDS if field in host_overrides})
+
+    @staticmethod
+    def _normalize(settings):
+        normalized = {}
+        for field in POLICY_FIELDS:
+            if field == 'retry_on_status':
+                normalized[field] = tuple(int(status) for status in settings[field] or ())
+            elif field in INTEGER_FIELDS:
+                normalized[field] = int(settings[field] or 0)
+            else:
+                normalized[field] = float(settings[field] or 0)
+        return normalized
+
+    def resolve(self, project_id, host, hostname):
+        """计算 (限流目标, 参数)"""
+        options = get_outbound_options()
+        settings = {field: options[field] for field in POLICY_FIELDS}
+        self._overlay(settings, options, host, hostname)
+        project = self._project_outbound(int(project_id)) if project_id else None
+        scope = options['scope']
+        if project:
+            self._overlay(settings, project, host, hostname)
+            scope = project.get('scope', scope)
+        try:
+            settings = self._normalize(settings)
+        except (TypeError, ValueError):
+            log.warning(f"外部请求参数 outbound 无效，使用默认参数 - project: {project_id}, host: {host}")
+            settings = self._normalize(DEFAULT_OUTBOUND_OPTIONS)
+        if scope == 'project' and project_id:
+            target = f"project:{int(project_id)}"
+        elif project:
+            # 项目单独配置的 host 限额只约束本项目的请求
+            target = f"project:{int(project_id)}:{host}"
+        else:
+            target = host
+        return target, settings
+
+    def policy(self, project_id, host, hostname):
+        """返回 (限流器, 参数)，参数含超时、重试和熔断设置"""
+        target, settings = self.resolve(project_id, host, hostname)
+        limits = {field: settings[field] for field in LIMIT_FIELDS}
+        if limits['rate'] <= 0 and limits['max_concurrency'] <= 0:
+            return _NO_LIMIT, settings
+        with self._lock:
+            limiter = self._limiters.get(target)
+            if limiter is None or limiter.settings != limits:
+                limiter = self._limiters[target] = OutboundLimiter(target, limits)
+            self._limiters.move_to_end(target)
+            while len(self._limiters) > get_outbound_options()['max_tracked_targets']:
+                self._limiters.popitem(last=False)
+            return limiter, settings
+
+    def waiting(self):
+        """各目标排队等待并发名额的请求数"""
+        waiting = {}
+        with self._lock:
+            for target, limiter in self._limiters.items():
+                if limiter.semaphore is not None:
+                    label = (target_label(target),)
+                    waiting[label] = waiting.get(label, 0) + limiter.semaphore.waiting
+        return waiting
+
+outbound_limiters = OutboundLimiters()
+
+registry.gauge('xapi_outbound_limit_waiting', '排队等待并发名额的外部请求数', outbound_limiters.waiting, ('target',))
+
+# ---------- 超时、重试和熔断 ----------
+
+def parse_timeout(value):
+    """
+    校验单个请求指定的超时：数字表示读取超时，{"connect": 5, "read": 30} 分别指定
+    返回 (connect, read)，未指定的部分为 None；格式错误时抛出 ValueError
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, dict):
+        connect, read = value.get('connect'), value.get('read')
+    else:
+        connect, read = None, value
+    parsed = []
+    for item in (connect, read):
+        if item is None:
+            parsed.append(None)
+            continue
+        try:
+            item = float(item)
+        except (TypeError, ValueError):
+            raise ValueError('timeout 必须是数字或 {connect, read}')
+        if item <= 0 or item > MAX_TIMEOUT:
+            raise ValueError(f'timeout 取值范围 0-{MAX_TIMEOUT} 秒')
+        parsed.append(item)
+    return tuple(parsed)
+
+def parse_retries(value):
+    """校验单个请求指定的重试次数，未指定时返回 None"""
+    if value is None or value == '':
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('retries 必须是整数')
+    if value < 0 or value > MAX_RETRIES:
+        raise ValueError(f'retries 取值范围 0-{MAX_RETRIES}')
+    return value
+
+def request_timeout(settings, override=None, stream=False):
+    """requests 使用的 (连接超时, 读取超时)"""
+    connect = settings['connect_timeout']
+    read = settings['stream_read_timeout' if stream else 'read_timeout']
+    if override:
+        connect = override[0] or connect
+        read = override[1] or read
+    return min(connect, MAX_TIMEOUT) or None, min(read, MAX_TIMEOUT) or None
+
+def retry_count(settings, method, override=None, pre_request=False):
+    """最多重试次数：只重试幂等方法和前置请求"""
+    if pre_request:
+        count = settings['pre_request_retries']
+    elif str(method).upper() in IDEMPOTENT_METHODS:
+        count = settings['retries']
+    else:
+        return 0
+    if override is not None:
+        count = override
+    return min(max(count, 0), MAX_RETRIES)
+
+def retry_delay(settings, attempt):
+    """第 attempt 次失败后的等待时间：指数退避加全随机抖动，避免多个请求同时重试"""
+    ceiling = min(settings['retry_backoff'] * 2 ** (attempt - 1), settings['retry_max_backoff'])
+    return random.uniform(0, max(ceiling, 0))
+
+class CircuitBreaker:
+    """
+    单个 host 的熔断器
+    closed: 正常放行，连续失败达到阈值后 open；open: 直接拒绝，reset 时间到期后 half_open；
+    half_open: 只放行一个试探请求，成功后 closed，失败后重新 open
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.state = 'closed'
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_request(self, settings):
+        """请求前检查，熔断中抛出 CircuitOpen，返回放行时的状态"""
+        if settings['breaker_failure_threshold'] <= 0:
+            return 'disabled'
+        with self._lock:
+            if self.state == 'open':
+                remaining = self._opened_at + settings['breaker_reset_seconds'] - time.monotonic()
+                if remaining > 0:
+                    CIRCUIT_REJECTED.inc(host_label(self.host))
+                    raise CircuitOpen(f"{self.host} 连续失败 {self.failures} 次，已熔断，{remaining:.0f} 秒后重试")
+                self.state = 'half_open'
+            elif self.state == 'half_open' and self._trial:
+                CIRCUIT_REJECTED.inc(host_label(self.host))
+                raise CircuitOpen(f"{self.host} 已熔断，正在试探恢复")
+            if self.state == 'half_open':
+                self._trial = True
+            return self.state
+
+    def cancel(self):
+        """放行后请求未发送，或失败与上游是否可用无关（如 URL 格式错误）：不计入统计，只交还试探名额"""
+        with self._lock:
+            self._trial = False
+
+    def record(self, success, settings):
+        if settings['breaker_failure_threshold'] <= 0:
+            return
+        with self._lock:
+            self._trial = False
+            if success:
+                if self.state != 'closed':
+                    log.info(f"{self.host} 已恢复，解除熔断")
+                self.state = 'closed'
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= settings['breaker_failure_threshold']:
+                if self.state != 'open':
+                    log.warning(f"{self.host} 连续失败 {self.failures} 次，熔断 {settings['breaker_reset_seconds']:g} 秒")
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+class CircuitBreakers:
+    """
+    按 host 维护熔断器（host 不可用与项目无关，所有项目共用）
+    host 个数超过 max_tracked_targets 时淘汰最久未使用的熔断器
+    """
+
+    # 熔断状态指标取值
+    STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+    def __init__(self):
+        self._breakers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(host)
+            self._breakers.move_to_end(host)
+            while len(self._breakers) > get_outbound_options()['max_tracked_targets']:
+                self._breakers.popitem(last=False)
+            return breaker
+
+    def states(self):
+        """未处于正常状态的熔断器，正常的 host 不导出，避免指标随 host 个数增长"""
+        states = {}
+        with self._lock:
+            for host, breaker in self._breakers.items():
+                if breaker.state != 'closed':
+                    label = (host_label(host),)
+                    states[label] = max(states.get(label, 0), self.STATE_VALUES[breaker.state])
+        return states
+
+circuit_breakers = CircuitBreakers()
+
+registry.gauge('xapi_outbound_circuit_state', '外部请求熔断状态（1 试探，2 熔断，正常的 host 不导出）', circuit_breakers.states, ('host',))
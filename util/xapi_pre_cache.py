@@ -0,0 +1,88 @@
+import time
+import threading
+from flask import g, has_request_context
+from util.xapi_metrics import registry
+
+PRE_REQUEST_CACHE = registry.counter('xapi_pre_request_cache_total', '前置请求结果缓存命中情况', ('result',))
+
+class PreRequestCache:
+    """
+    前置请求结果缓存（按项目和前置请求范围缓存，进程内有效）
+    同一个 key 同时只有一个线程执行前置请求，其他线程等待并复用结果，避免定时监控并发时重复登录
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def get_or_execute(self, key, ttl, execute, cacheable=None):
+        """
+        ttl 秒内返回缓存结果，否则调用 execute() 并缓存
+        ttl <= 0 时不使用缓存；结果为空或 cacheable(结果) 为 False 时不缓存
+        """
+        if not ttl or ttl <= 0:
+            return execute()
+        value = self._lookup(key)
+        if value is not None:
+            PRE_REQUEST_CACHE.inc('hit')
+            return value
+        with self._key_lock(key):
+            value = self._lookup(key)
+            if value is not None:
+                PRE_REQUEST_CACHE.inc('hit')
+                return value
+            PRE_REQUEST_CACHE.inc('miss')
+            value = execute()
+            if value and (cacheable is None or cacheable(value)):
+                with self._lock:
+                    self._entries[key] = (time.monotonic() + ttl, value)
+            return value
+
+    def invalidate(self, project_id=None):
+        """清除缓存，指定 project_id 时只清除该项目"""
+        with self._lock:
+            if project_id is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[1] == project_id]:
+                    del self._entries[key]
+
+    def invalidate_after_commit(self, project_id=None):
+        """
+        请求内的配置变更在工作单元提交后再清除缓存，避免提交前有其他线程读到旧配置并重新写入缓存
+        请求上下文之外直接清除
+        """
+        if not has_request_context():
+            return self.invalidate(project_id)
+        pending = g.get('pending_cache_invalidations')
+        if pending is None:
+            pending = g.pending_cache_invalidations = []
+        pending.append(project_id)
+        return None
+
+# 全局前置请求缓存
+pre_request_cache = PreRequestCache()
+
+def register_pre_request_cache(app):
+    """注册请求结束时清除前置请求缓存的钩子，需在 db_orm.init_app 之前注册（after_request 倒序执行）"""
+    @app.after_request
+    def flush_pending_invalidations(response):
+        pending = g.pop('pending_cache_invalidations', None)
+        if pending and not (g.get('db_commit_failed') or g.get('db_unit_rolled_back')):
+            for project_id in pending:
+                pre_request_cache.invalidate(project_id)
+        return response
@@ -0,0 +1,218 @@
+import io
+import os
+import marshal
+import sys
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from flask import request, g
+from config import config
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 触发单请求 cProfile 的请求头
+PROFILE_HEADER = 'X-XAPI-Profile'
+# 返回 profile id 的响应头
+PROFILE_ID_HEADER = 'X-XAPI-Profile-Id'
+# 内存中保留的单请求 profile 数量
+DEFAULT_MAX_PROFILES = 20
+# 采样间隔（秒）和最多保留的不同调用栈数量
+DEFAULT_SAMPLE_INTERVAL = 0.02
+DEFAULT_MAX_STACKS = 10000
+
+def _is_admin_token():
+    """按请求头中的 token 判断是否为管理员，在视图鉴权之前调用"""
+    from auth import verify_token
+    auth_header = request.headers.get('Authorization', '')
+    token_type, _, token = auth_header.partition(' ')
+    if token_type.lower() != 'bearer' or not token:
+        return False
+    payload = verify_token(token)
+    return bool(payload) and not payload.get('scope') and payload.get('role') == 'admin'
+
+class ProfileStore:
+    """单请求 cProfile 结果，按时间保留最近 max_profiles 条"""
+
+    def __init__(self):
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile, meta):
+        profile_id = uuid.uuid4().hex
+        max_profiles = config.get('profiling.max_profiles', DEFAULT_MAX_PROFILES)
+        with self._lock:
+            self._profiles[profile_id] = (pstats.Stats(profile), meta)
+            while len(self._profiles) > max_profiles:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def list(self):
+        with self._lock:
+            return [dict(meta, id=profile_id) for profile_id, (_, meta) in reversed(self._profiles.items())]
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def summary(self, profile_id, sort='cumulative', limit=50):
+        """pstats 文本摘要"""
+        item = self.get(profile_id)
+        if item is None:
+            return None
+        stats, _ = item
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def dump(self, profile_id):
+        """pstats 二进制数据，可用 snakeviz 等工具打开"""
+        item = self.get(profile_id)
+        if item is None:
+            return None
+        stats, _ = item
+        # 与 pstats.Stats.dump_stats 写出的文件格式相同
+        return marshal.dumps(stats.stats)
+
+class SamplingProfiler:
+    """
+    低频采样分析器
+    后台线程按固定间隔读取正在处理请求的线程调用栈，按折叠栈（collapsed stack）格式聚合，
+    结果可直接用 flamegraph.pl / speedscope 生成火焰图
+    """
+
+    def __init__(self):
+        self._stacks = {}
+        self._active_threads = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.started_at = None
+        self.samples = 0
+        self.dropped = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        if self.running:
+            return False
+        self.interval = interval or config.get('profiling.sample_interval', DEFAULT_SAMPLE_INTERVAL)
+        self.max_stacks = config.get('profiling.max_stacks', DEFAULT_MAX_STACKS)
+        self._stop.clear()
+        self.started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._thread = threading.Thread(target=self._run, name='xapi-sampling-profiler', daemon=True)
+        self._thread.start()
+        log.info(f"采样分析器已启动 - interval: {self.interval}s")
+        return True
+
+    def stop(self):
+        if not self.running:
+            return False
+        self._stop.set()
+        self._thread.join(timeout=5)
+        log.info(f"采样分析器已停止 - samples: {self.samples}")
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._stacks = {}
+            self.samples = 0
+            self.dropped = 0
+
+    def enter_request(self):
+        if self.running:
+            with self._lock:
+                self._active_threads.add(threading.get_ident())
+
+    def exit_request(self):
+        if self._active_threads:
+            with self._lock:
+                self._active_threads.discard(threading.get_ident())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                active = set(self._active_threads)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for thread_id in active:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._record(frame)
+
+    def _record(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        stack = ';'.join(reversed(names))
+        with self._lock:
+            self.samples += 1
+            if stack in self._stacks:
+                self._stacks[stack] += 1
+            elif len(self._stacks) < self.max_stacks:
+                self._stacks[stack] = 1
+            else:
+                self.dropped += 1
+
+    def collapsed(self):
+        """折叠栈文本，每行“栈 次数”"""
+        with self._lock:
+            stacks = sorted(self._stacks.items(), key=lambda item: item[1], reverse=True)
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def status(self):
+        with self._lock:
+            distinct = len(self._stacks)
+        return {
+            'running': self.running,
+            'started_at': self.started_at,
+            'interval': getattr(self, 'interval', None),
+            'samples': self.samples,
+            'distinct_stacks': distinct,
+            'dropped': self.dropped
+        }
+
+# 全局实例
+profile_store = ProfileStore()
+sampling_profiler = SamplingProfiler()
+
+def register_profiler(app):
+    """注册分析钩子：管理员请求携带 X-XAPI-Profile 头时对该请求做 cProfile"""
+    @app.before_request
+    def start_request_profile():
+        sampling_profiler.enter_request()
+        if request.headers.get(PROFILE_HEADER) and _is_admin_token():
+            g.request_profile = cProfile.Profile()
+            g.request_profile_started_at = time.perf_counter()
+            g.request_profile.enable()
+
+    @app.after_request
+    def finish_request_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile.disable()
+            profile_id = profile_store.add(profile, {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - g.request_profile_started_at) * 1000, 2),
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+            response.headers[PROFILE_ID_HEADER] = profile_id
+        return response
+
+    @app.teardown_request
+    def leave_sampling(exc=None):
+        sampling_profiler.exit_request()
+
+    if config.get('profiling.sampling_enabled', False):
+        sampling_profiler.start()
@@ -33,7 +33,7 @@ def replace_variables(data, pre_request_results):
             request_id = match.group(2)    # 请求ID
             data_type = match.group(3)     # body 或 header
             path = match.group(4)          # 属性路径
-            log.info(f"request_type: {request_type}, request_id: {request_id}, data_type: {data_type}, path: {path}")
+            log.debug("request_type: %s, request_id: %s, data_type: %s, path: %s", request_type, request_id, data_type, path)
             try:
                 # 从 pre_request_results 中获取数据
                 if request_type in pre_request_results and request_id in pre_request_results[request_type]:
@@ -0,0 +1,273 @@
+import os
+import re
+import gzip
+import hashlib
+import posixpath
+import mimetypes
+import threading
+from flask import request, Response, abort, send_from_directory
+from config import config
+from util.xapi_conditional import etag_matches
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 优先生成 brotli 压缩版本，未安装 brotli 时只生成 gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_STATIC_OPTIONS = {
+    'fingerprint': True,            # 为 js/ 下的资源生成带内容哈希的地址
+    'compress_min_bytes': 1024,     # 小于该大小的文件不压缩
+    'gzip_level': 9,
+    'brotli_quality': 11,
+    'cache_dir': 'static_cache',    # 压缩结果按内容哈希缓存，重启时不必重新压缩，留空则不缓存
+    'auto_reload': False            # 开发时打开，文件修改后自动重新构建
+}
+
+# 带指纹的资源内容不会变化，允许浏览器和代理长期缓存；其他资源每次通过 ETag 协商
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+_COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+_EXTRA_MIMETYPES = {
+    '.js': 'application/javascript',
+    '.css': 'text/css',
+    '.svg': 'image/svg+xml',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+    '.ttf': 'font/ttf',
+    '.eot': 'application/vnd.ms-fontobject'
+}
+# HTML 中引用 js/ 目录资源的 src/href，兼容 "/js/..." 和 "../js/..." 两种写法
+_HTML_ASSET_PATTERN = re.compile(r'''((?:src|href)=["'])(?:\.\./|/)(js/[^"'?#]+)([^"']*)(["'])''')
+# CSS 中的 url(...) 引用
+_CSS_URL_PATTERN = re.compile(r'''url\((["']?)([^"')?#]+)([^"')]*)\1\)''')
+
+def get_static_options():
+    return config.section('static', DEFAULT_STATIC_OPTIONS)
+
+def _guess_mimetype(path):
+    extension = os.path.splitext(path)[1].lower()
+    mimetype = _EXTRA_MIMETYPES.get(extension) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if mimetype.startswith('text/') or mimetype == 'application/javascript':
+        mimetype += '; charset=utf-8'
+    return mimetype
+
+def _fingerprinted_path(path, digest):
+    """js/layui@2.11.5/layui.js -> js/layui@2.11.5/layui.<hash>.js"""
+    base, extension = posixpath.splitext(path)
+    return f"{base}.{digest[:12]}{extension}"
+
+class StaticAsset:
+    """一个静态资源：原始内容、预压缩版本和缓存校验信息"""
+
+    def __init__(self, path, content, mtime, fingerprint=False):
+        self.path = path
+        self.content = content
+        self.mtime = mtime
+        self.mimetype = _guess_mimetype(path)
+        self.digest = hashlib.sha256(content).hexdigest()
+        self.url_path = _fingerprinted_path(path, self.digest) if fingerprint else path
+        self.immutable = fingerprint
+        # 编码 -> 压缩后的内容，'identity' 为原始内容
+        self.variants = {'identity': content}
+
+    def etag(self, encoding):
+        """强 ETag，不同编码的表示使用不同的 ETag"""
+        suffix = '' if encoding == 'identity' else f"-{encoding}"
+        return f'"{self.digest[:16]}{suffix}"'
+
+    @property
+    def compressible(self):
+        return self.mimetype.startswith(_COMPRESSIBLE_TYPES)
+
+class StaticAssets:
+    """
+    静态资源管道
+    启动时读取 js/ 和 html/ 下的文件，为 js/ 下的资源生成内容哈希地址，把 CSS 和 HTML 中的引用改写为带哈希的地址，
+    并预先生成 gzip/brotli 压缩版本；请求时按 Accept-Encoding 选择版本，支持 If-None-Match 返回 304
+    """
+
+    def __init__(self, root=ROOT_DIR, asset_dir='js', page_dir='html'):
+        self.root = root
+        self.asset_dir = asset_dir
+        self.page_dir = page_dir
+        self._assets = {}       # 原始路径 -> StaticAsset
+        self._urls = {}         # 带哈希的路径 -> StaticAsset
+        self._pages = {}        # html/xxx.html -> StaticAsset
+        self._built = False
+        self._lock = threading.Lock()
+
+    def _scan(self, directory):
+        """返回目录下所有文件的 (相对路径, 绝对路径)"""
+        result = []
+        for current, _, files in os.walk(os.path.join(self.root, directory)):
+            for name in sorted(files):
+                full_path = os.path.join(current, name)
+                result.append((os.path.relpath(full_path, self.root).replace(os.sep, '/'), full_path))
+        return sorted(result)
+
+    def _read(self, full_path):
+        with open(full_path, 'rb') as f:
+            return f.read(), os.path.getmtime(full_path)
+
+    def _rewrite_css(self, path, content, assets):
+        """把 CSS 中对其他资源的相对引用改写为带哈希的文件名"""
+        directory = posixpath.dirname(path)
+
+        def replace(match):
+            quote, target, suffix = match.groups()
+            if target.startswith(('data:', 'http:', 'https:', '//', '/')):
+                return match.group(0)
+            asset = assets.get(posixpath.normpath(posixpath.join(directory, target)))
+            if asset is None or not asset.immutable:
+                return match.group(0)
+            rewritten = posixpath.relpath(asset.url_path, directory)
+            return f"url({quote}{rewritten}{suffix}{quote})"
+
+        return _CSS_URL_PATTERN.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+    def _rewrite_html(self, content, assets):
+        """把页面中 js/ 资源的引用改写为带哈希的绝对地址"""
+        def replace(match):
+            prefix, target, suffix, quote = match.groups()
+            asset = assets.get(target)
+            if asset is None:
+                return match.group(0)
+            return f"{prefix}/{asset.url_path}{suffix}{quote}"
+
+        return _HTML_ASSET_PATTERN.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+    def _compress(self, asset, options):
+        """生成压缩版本，结果比原文件小时才保留"""
+        if not asset.compressible or len(asset.content) < options['compress_min_bytes']:
+            return
+        encoders = {'gzip': lambda data: gzip.compress(data, compresslevel=options['gzip_level'], mtime=0)}
+        if brotli is not None:
+            encoders['br'] = lambda data: brotli.compress(data, quality=options['brotli_quality'])
+        cache_dir = options['cache_dir']
+        if cache_dir and not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(self.root, cache_dir)
+        for encoding, encode in encoders.items():
+            cache_path = os.path.join(cache_dir, f"{asset.digest}.{encoding}") if cache_dir else None
+            data = None
+            if cache_path and os.path.exists(cache_path):
+                with open(cache_path, 'rb') as f:
+                    data = f.read()
+            if data is None:
+                data = encode(asset.content)
+                if cache_path:
+                    try:
+                        os.makedirs(cache_dir, exist_ok=True)
+                        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+                        with open(temp_path, 'wb') as f:
+                            f.write(data)
+                        os.replace(temp_path, cache_path)
+                    except OSError as e:
+                        log.warning(f"静态资源压缩缓存写入失败: {e}")
+            if len(data) < len(asset.content):
+                asset.variants[encoding] = data
+
+    def build(self):
+        """构建资源清单：先处理普通资源，再处理引用它们的 CSS，最后处理页面"""
+        options = get_static_options()
+        assets, urls, pages = {}, {}, {}
+        css_files = []
+        for path, full_path in self._scan(self.asset_dir):
+            if path.endswith('.css'):
+                css_files.append((path, full_path))
+                continue
+            content, mtime = self._read(full_path)
+            assets[path] = StaticAsset(path, content, mtime, options['fingerprint'])
+        for path, full_path in css_files:
+            content, mtime = self._read(full_path)
+            if options['fingerprint']:
+                content = self._rewrite_css(path, content, assets)
+            assets[path] = StaticAsset(path, content, mtime, options['fingerprint'])
+        for path, full_path in self._scan(self.page_dir):
+            content, mtime = self._read(full_path)
+            if options['fingerprint'] and path.endswith('.html'):
+                content = self._rewrite_html(content, assets)
+            pages[path] = StaticAsset(path, content, mtime)
+
+        original_size = compressed_size = 0
+        for asset in list(assets.values()) + list(pages.values()):
+            self._compress(asset, options)
+            urls[asset.url_path] = asset
+            original_size += len(asset.content)
+            compressed_size += min(len(data) for data in asset.variants.values())
+        self._assets, self._urls, self._pages = assets, urls, pages
+        self._built = True
+        log.info(f"静态资源构建完成 - 文件: {len(assets) + len(pages)}, 原始: {original_size} 字节, "
+                 f"压缩后: {compressed_size} 字节, brotli: {'是' if brotli else '否'}")
+
+    def _changed(self):
+        for asset in list(self._assets.values()) + list(self._pages.values()):
+            try:
+                if os.path.getmtime(os.path.join(self.root, asset.path)) != asset.mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _ensure_built(self):
+        if self._built and not (get_static_options()['auto_reload'] and self._changed()):
+            return
+        with self._lock:
+            if not self._built or self._changed():
+                self.build()
+
+    def url_for(self, path):
+        """资源的访问地址（带哈希），path 如 js/jquery-3.7.1.min.js"""
+        self._ensure_built()
+        asset = self._assets.get(path)
+        return f"/{asset.url_path if asset else path}"
+
+    def send_asset(self, filename):
+        """/js/<filename>：带哈希的地址长期缓存，原始地址每次协商"""
+        self._ensure_built()
+        path = f"{self.asset_dir}/{filename}"
+        asset = self._urls.get(path) or self._assets.get(path)
+        if asset is None:
+            # 启动后新增的文件不在清单中，按原方式直接发送
+            return send_from_directory(os.path.join(self.root, self.asset_dir), filename)
+        return self.send(asset, immutable=asset.immutable and path == asset.url_path)
+
+    def send_page(self, path):
+        """html/ 下的页面，内容随版本变化，每次通过 ETag 协商"""
+        self._ensure_built()
+        asset = self._pages.get(path)
+        if asset is None:
+            abort(404)
+        return self.send(asset, immutable=False)
+
+    @staticmethod
+    def _choose_encoding(asset):
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.variants and accepted[encoding] > 0:
+                return encoding
+        return 'identity'
+
+    def send(self, asset, immutable=False):
+        encoding = self._choose_encoding(asset)
+        etag = asset.etag(encoding)
+        headers = {
+            'ETag': etag,
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            'Vary': 'Accept-Encoding'
+        }
+        if etag_matches(etag):
+            return Response(status=304, headers=headers)
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(asset.variants[encoding], content_type=asset.mimetype, headers=headers)
+
+# 全局静态资源管道
+static_assets = StaticAssets()
+# static 配置修改后按新配置重新构建
+config.subscribe(lambda changed: static_assets.build(), ('static',))
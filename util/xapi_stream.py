@@ -0,0 +1,132 @@
+import time
+import threading
+from config import config
+from log_base import MyLog
+log = MyLog().my_logger()
+
+# 流式响应历史记录中保留的最大字节数
+DEFAULT_STREAM_CAPTURE_BYTES = 256 * 1024
+# 非 chunked 响应的读取块大小
+DEFAULT_STREAM_CHUNK_SIZE = 1024
+
+# 转发给客户端时去掉的响应头：iter_content 已解压内容，长度和传输编码由 WSGI 服务器重新决定
+SKIPPED_STREAM_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+def stream_response_headers(response):
+    """过滤上游响应头，用于流式转发"""
+    return {key: value for key, value in response.headers.items() if key.lower() not in SKIPPED_STREAM_HEADERS}
+
+class StreamTee:
+    """
+    流式响应转发器
+    把上游数据块原样转发给客户端，同时复制到有界缓冲区用于历史记录，并统计首包时间、块数和总字节数
+    流结束（包括客户端提前断开、WSGI 服务器未开始迭代就调用 close()）时关闭上游响应，并只调用一次 on_complete(tee)
+    """
+
+    def __init__(self, response, start_time, on_complete=None, capture_bytes=None):
+        self.response = response
+        self.start_time = start_time
+        self.on_complete = on_complete
+        self.capture_bytes = capture_bytes if capture_bytes is not None else config.get('stream.capture_bytes', DEFAULT_STREAM_CAPTURE_BYTES)
+        self.captured = bytearray()
+        self.capture_truncated = False
+        self.chunk_count = 0
+        self.total_bytes = 0
+        self.first_chunk_ms = None
+        self.duration_ms = None
+        self.client_disconnected = False
+        self.error = None
+        self._finished = False
+        self._finish_lock = threading.Lock()
+
+    def _iter_upstream(self):
+        """
+        按数据到达的节奏读取上游响应，避免 SSE 事件在缓冲区中等待凑满一个读取块
+        chunked 响应按到达的数据块读取；其他响应（Content-Length 或连接关闭结束）每次读取当前已到达的数据，最多 chunk_size 字节
+        """
+        headers = self.response.headers
+        if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            return self.response.iter_content(chunk_size=None)
+        chunk_size = config.get('stream.chunk_size', DEFAULT_STREAM_CHUNK_SIZE)
+        raw = self.response.raw
+        if hasattr(raw, 'read1'):
+            # urllib3 2.x 自带按已到达数据读取并解压
+            return self._read_available(lambda: raw.read1(chunk_size, decode_content=True))
+        fp = getattr(raw, '_fp', None)
+        encoding = headers.get('Content-Encoding', '').strip().lower()
+        if fp is None or not hasattr(fp, 'read1') or encoding not in ('', 'identity'):
+            # 压缩的响应需要 urllib3 解压，按固定大小的块读取
+            return self.response.iter_content(chunk_size=chunk_size)
+        # http.client 的 read1 按 Content-Length 或连接关闭判断结束，只等待有数据到达，不等待凑满 chunk_size
+        return self._read_available(lambda: fp.read1(chunk_size))
+
+    @staticmethod
+    def _read_available(read):
+        while True:
+            chunk = read()
+            if not chunk:
+                return
+            yield chunk
+
+    def __iter__(self):
+        try:
+            for chunk in self._iter_upstream():
+                if not chunk:
+                    continue
+                if self.first_chunk_ms is None:
+                    self.first_chunk_ms = int((time.time() - self.start_time) * 1000)
+                self.chunk_count += 1
+                self.total_bytes += len(chunk)
+                room = self.capture_bytes - len(self.captured)
+                if room > 0:
+                    self.captured.extend(chunk[:room])
+                if len(chunk) > room:
+                    self.capture_truncated = True
+                yield chunk
+        except GeneratorExit:
+            self.client_disconnected = True
+            raise
+        except Exception as e:
+            self.error = str(e)
+            log.error(f"流式响应转发异常: {e}")
+        finally:
+            self._finish()
+
+    def close(self):
+        """WSGI 服务器结束响应时调用；流尚未读完时按客户端断开处理，记录已读取的部分"""
+        if not self._finished:
+            self.client_disconnected = True
+        self._finish()
+
+    def _finish(self):
+        with self._finish_lock:
+            if self._finished:
+                return
+            self._finished = True
+        self.duration_ms = int((time.time() - self.start_time) * 1000)
+        try:
+            self.response.close()
+        except Exception as e:
+            log.error(f"关闭上游流式响应失败: {e}")
+        if self.on_complete:
+            try:
+                self.on_complete(self)
+            except Exception as e:
+                log.error(f"流式响应结束回调失败: {e}")
+
+    def captured_text(self):
+        """缓冲区内容解码后的文本"""
+        return self.captured.decode(self.response.encoding or 'utf-8', errors='replace')
+
+    def metrics(self):
+        """流式统计信息，写入历史记录 execution_details"""
+        return {
+            'firstChunkMs': self.first_chunk_ms,
+            'durationMs': self.duration_ms,
+            'chunkCount': self.chunk_count,
+            'totalBytes': self.total_bytes,
+            'capturedBytes': len(self.captured),
+            'captureTruncated': self.capture_truncated,
+            'clientDisconnected': self.client_disconnected,
+            'error': self.error
+        }
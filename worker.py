@@ -0,0 +1,293 @@
+"""
+分布式压测 worker
+
+向 XAPI-Tester 服务端注册后循环领取压测分片，按分片计划在本机并发发送请求，
+定期把耗时直方图、状态码计数等统计的增量上报给服务端合并。可在多台机器上运行，也可在本机启动多个进程。
+worker 不连接数据库，前置请求和变量替换由服务端完成。
+
+    python worker.py --server http://xapi-host:5000 --token <load_workers.registration_token>
+    python worker.py --server http://localhost:5000 --token secret --processes 4 --capacity 200
+"""
+import os
+import sys
+import time
+import uuid
+import socket
+import signal
+import logging
+import argparse
+import itertools
+import threading
+import multiprocessing
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from util.xapi_histogram import RequestStats
+
+log = logging.getLogger('xapi-worker')
+
+class ShardLost(Exception):
+    """分片已被取消领取或重新分配给其他 worker"""
+
+class ServerError(Exception):
+    """服务端返回错误"""
+
+class ServerClient:
+    """与服务端通信：注册、领取分片、获取执行计划、上报结果；worker token 失效时自动重新注册"""
+
+    def __init__(self, server, registration_token, worker_key, name, capacity, timeout=30):
+        self.server = server.rstrip('/')
+        self.registration_token = registration_token
+        self.worker_key = worker_key
+        self.name = name
+        self.capacity = capacity
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.worker_id = None
+        self.token = None
+        self.poll_interval = 2
+        self.report_interval = 2
+
+    def register(self):
+        response = self.session.post(f"{self.server}/api/load/workers/register", json={
+            'worker_key': self.worker_key,
+            'name': self.name,
+            'hostname': socket.gethostname(),
+            'pid': os.getpid(),
+            'capacity': self.capacity
+        }, headers={'X-Worker-Token': self.registration_token}, timeout=self.timeout)
+        data = self._parse(response)
+        self.worker_id = data['worker_id']
+        self.token = data['token']
+        self.poll_interval = data.get('poll_interval', self.poll_interval)
+        self.report_interval = data.get('report_interval', self.report_interval)
+        log.info(f"已注册 - worker: {self.worker_id}, key: {self.worker_key}")
+
+    @staticmethod
+    def _parse(response):
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        if response.status_code == 409:
+            raise ShardLost(payload.get('error'))
+        if response.status_code >= 400:
+            raise ServerError(f"{response.status_code} {payload.get('error') or response.text[:200]}")
+        return payload.get('data')
+
+    def call(self, method, path, payload=None):
+        """调用 worker 接口，返回 data 字段；401 时重新注册后重试一次"""
+        if self.token is None:
+            self.register()
+        for attempt in range(2):
+            response = self.session.request(method, f"{self.server}{path}", json=payload, timeout=self.timeout,
+                                            headers={'Authorization': f"Bearer {self.token}"})
+            if response.status_code == 401 and attempt == 0:
+                self.register()
+                continue
+            return self._parse(response)
+
+class ShardRunner:
+    """
+    执行一个分片
+    concurrency 个线程按轮询顺序取请求执行，直到到达时长、总次数、被取消或进程停止；
+    主线程每隔 report_interval 秒把新增的统计上报给服务端，服务端返回 cancelled 时停止
+    """
+
+    def __init__(self, client, plan, stop_event, capacity):
+        self.client = client
+        self.plan = plan
+        self.requests = plan['requests']
+        self.concurrency = plan['concurrency']
+        if self.concurrency > capacity:
+            log.warning(f"分片并发 {self.concurrency} 超过本 worker 容量 {capacity}，按容量执行")
+            self.concurrency = capacity
+        self.iterations = plan['iterations']
+        self.interval = 1.0 / plan['rate'] if plan.get('rate') else 0
+        self.stop_event = stop_event
+        self.cancelled = threading.Event()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._started_at = None
+        self._deadline = None
+
+    def _stopped(self):
+        return self.cancelled.is_set() or self.stop_event.is_set()
+
+    def _next(self):
+        """下一次要执行的 (请求, 计划开始时间)，已结束时返回 None"""
+        if self._stopped() or time.monotonic() >= self._deadline:
+            return None
+        sequence = next(self._sequence)
+        if self.iterations and sequence >= self.iterations:
+            return None
+        scheduled = self._started_at + sequence * self.interval if self.interval else None
+        return self.requests[sequence % len(self.requests)], scheduled
+
+    def _record(self, request_info_id, elapsed_ms, status=None, size=0, error=None):
+        with self._lock:
+            stats = self._stats.get(request_info_id)
+            if stats is None:
+                stats = self._stats[request_info_id] = RequestStats()
+            stats.record(elapsed_ms, status, size, error)
+
+    def _execute(self, session, item):
+        body = item.get('body')
+        started_at = time.perf_counter()
+        try:
+            response = session.request(item['method'], item['url'], headers=item['headers'],
+                                       data=body.encode('utf-8') if body else None,
+                                       timeout=self.plan['timeout'], stream=True)
+            try:
+                size = sum(len(chunk) for chunk in response.iter_content(65536))
+            finally:
+                response.close()
+            self._record(str(item['request_info_id']), (time.perf_counter() - started_at) * 1000,
+                         response.status_code, size)
+        except requests.RequestException as e:
+            self._record(str(item['request_info_id']), (time.perf_counter() - started_at) * 1000,
+                         error=type(e).__name__)
+
+    def _loop(self):
+        session = requests.Session()
+        try:
+            while True:
+                item = self._next()
+                if item is None:
+                    return
+                request_item, scheduled = item
+                if scheduled is not None:
+                    delay = scheduled - time.monotonic()
+                    if delay > 0 and self.stop_event.wait(delay):
+                        return
+                self._execute(session, request_item)
+        finally:
+            session.close()
+
+    def _take_delta(self):
+        with self._lock:
+            delta, self._stats = self._stats, {}
+        return delta
+
+    def _restore(self, delta):
+        """上报失败时把增量放回，下次一起上报"""
+        with self._lock:
+            for key, stats in delta.items():
+                current = self._stats.get(key)
+                self._stats[key] = stats if current is None else stats.merge(current)
+
+    def report(self, final=False, error=None):
+        delta = self._take_delta()
+        payload = {'results': {key: stats.to_dict() for key, stats in delta.items()}, 'final': final, 'error': error}
+        attempts = 3 if final else 1
+        for attempt in range(attempts):
+            try:
+                data = self.client.call('POST', f"/api/load/shards/{self.plan['shard_id']}/results", payload)
+                if data and data.get('cancelled'):
+                    self.cancelled.set()
+                return
+            except ShardLost:
+                # 租约已过期并被重新分配，本 worker 的结果不再计入
+                log.warning(f"分片 {self.plan['shard_id']} 已重新分配，停止执行")
+                self.cancelled.set()
+                return
+            except (requests.RequestException, ServerError) as e:
+                log.error(f"上报结果失败 - shard: {self.plan['shard_id']}, error: {e}")
+                if attempt + 1 < attempts:
+                    time.sleep(1)
+        self._restore(delta)
+
+    def run(self):
+        self._started_at = time.monotonic()
+        self._deadline = self._started_at + self.plan['duration_seconds']
+        threads = [threading.Thread(target=self._loop, name=f"xapi-load-{index}", daemon=True)
+                   for index in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        interval = self.plan.get('report_interval') or self.client.report_interval
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=interval / len(threads))
+            if any(thread.is_alive() for thread in threads):
+                self.report()
+        if self.stop_event.is_set():
+            # 进程停止时不结束分片，租约过期后由其他 worker 重新执行
+            return
+        self.report(final=True)
+
+def run_worker(args, index=0):
+    """注册并循环领取分片，直到进程收到中断信号"""
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s [worker-{index}] %(levelname)s %(message)s')
+    # SIGTERM 与 Ctrl-C 相同处理：停止领取新分片，执行中的分片不结束，租约过期后由其他 worker 重新执行
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    hostname = socket.gethostname()
+    client = ServerClient(args.server, args.token, f"{hostname}:{os.getpid()}:{uuid.uuid4().hex[:8]}",
+                          args.name or hostname, args.capacity)
+    stop_event = threading.Event()
+    try:
+        while not stop_event.is_set():
+            try:
+                shard = client.call('POST', '/api/load/workers/claim')
+            except (requests.RequestException, ServerError) as e:
+                log.error(f"领取分片失败: {e}")
+                stop_event.wait(client.poll_interval)
+                continue
+            if not shard:
+                stop_event.wait(client.poll_interval)
+                continue
+            shard_id = shard['shard_id']
+            try:
+                plan = client.call('GET', f"/api/load/shards/{shard_id}/plan")
+            except ShardLost:
+                continue
+            except (requests.RequestException, ServerError) as e:
+                log.error(f"获取执行计划失败 - shard: {shard_id}, error: {e}")
+                try:
+                    client.call('POST', f"/api/load/shards/{shard_id}/results", {'final': True, 'error': str(e)})
+                except (requests.RequestException, ServerError, ShardLost):
+                    pass
+                continue
+            log.info(f"开始执行 - job: {plan['job_id']}, shard: {shard_id}, kind: {plan['kind']}, "
+                     f"concurrency: {plan['concurrency']}, iterations: {plan['iterations']}, "
+                     f"duration: {plan['duration_seconds']}s, rate: {plan['rate']}")
+            runner = ShardRunner(client, plan, stop_event, args.capacity)
+            runner.run()
+            log.info(f"执行结束 - job: {plan['job_id']}, shard: {shard_id}, cancelled: {runner.cancelled.is_set()}")
+    except KeyboardInterrupt:
+        stop_event.set()
+        log.info('worker 已停止')
+
+def main():
+    parser = argparse.ArgumentParser(description='XAPI-Tester 分布式压测 worker')
+    parser.add_argument('--server', required=True, help='服务端地址，如 http://localhost:5000')
+    parser.add_argument('--token', default=os.environ.get('XAPI_WORKER_TOKEN', ''),
+                        help='注册口令（load_workers.registration_token），默认读取环境变量 XAPI_WORKER_TOKEN')
+    parser.add_argument('--name', help='worker 名称，默认为主机名')
+    parser.add_argument('--capacity', type=int, default=100, help='单个进程的最大并发')
+    parser.add_argument('--processes', type=int, default=1, help='本机启动的 worker 进程数')
+    args = parser.parse_args()
+    if not args.token:
+        parser.error('缺少注册口令 --token')
+
+    if args.processes <= 1:
+        run_worker(args)
+        return
+    processes = [multiprocessing.Process(target=run_worker, args=(args, index), name=f"xapi-worker-{index}")
+                 for index in range(args.processes)]
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # 终端 Ctrl-C 时子进程也会收到中断信号；父进程单独被停止时转发给子进程
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=10)
+
+if __name__ == '__main__':
+    main()